@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Différences entre deux exports d'aides, pour ne retraiter que ce qui a changé
+
+Un manifeste garde, pour chaque id d'aide, sa date_updated et une empreinte
+stable de l'enregistrement (JSON à clés triées, cf. record_digest). Un nouvel
+export est comparé au manifeste en flux :
+- added.ndjson    : aides nouvelles
+- modified.ndjson : aides dont l'empreinte a changé
+- removed.ndjson  : {"id", "date_updated"} des aides disparues
+puis le manifeste est mis à jour.
+
+Les convertisseurs s'en servent pour leur option --incremental (cf.
+write_incremental_csv) : les lignes des aides inchangées sont copiées du
+fichier précédent, seules les aides ajoutées ou modifiées sont remises en forme.
+L'export est tout de même relu et empreinté en entier, et le CSV réécrit en entier
+(par copie d'octets) : le coût évité est celui de la mise en forme, pas celui de la lecture.
+
+Exemple :
+    python aid_diff.py aides.json --manifest aides.manifest.json -o changements/
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+from contextlib import nullcontext
+
+from aides_reader import iter_aids
+from atomic_files import atomic_open
+
+MANIFEST_VERSION = 1
+DEFAULT_MANIFEST = 'aides.manifest.json'
+STATUSES = ('added', 'modified', 'removed', 'unchanged')
+STATUS_LABELS = {'added': 'ajoutée(s)', 'modified': 'modifiée(s)', 'removed': 'supprimée(s)',
+                 'unchanged': 'inchangée(s)'}
+
+
+def record_digest(aid):
+    """Empreinte stable : indépendante de l'ordre des clés et de la mise en forme du JSON"""
+    # Échappement ASCII : plus rapide que ensure_ascii=False et sans souci d'encodage
+    canonical = json.dumps(aid, sort_keys=True, separators=(',', ':'))
+    return hashlib.blake2b(canonical.encode('ascii'), digest_size=16).hexdigest()
+
+
+def load_manifest(path):
+    """
+    Manifeste : {"version", "aids": {id (str): [date_updated, empreinte, ...]}, ...}
+    Vide si le fichier n'existe pas.
+    """
+    if not path or not os.path.exists(path):
+        return {'version': MANIFEST_VERSION, 'aids': {}}
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise Exception(f"Manifeste {path} : version {manifest.get('version')} non prise en charge")
+    return manifest
+
+
+def save_manifest(path, entries, **extra):
+    with atomic_open(path) as f:
+        json.dump({'version': MANIFEST_VERSION, **extra, 'aids': entries}, f, separators=(',', ':'))
+
+
+class SnapshotDiff:
+    """Compare un flux d'aides au manifeste précédent, aide par aide"""
+
+    def __init__(self, previous):
+        self.previous = previous
+        self.entries = {}
+        self.counts = dict.fromkeys(STATUSES, 0)
+
+    def classify(self, aid):
+        """'added', 'modified' ou 'unchanged' ; enregistre l'aide dans le nouveau manifeste"""
+        key = str(aid.get('id'))
+        entry = [aid.get('date_updated'), record_digest(aid)]
+        before = self.previous.get(key)
+        if before is None:
+            status = 'added'
+        elif before[1] != entry[1]:
+            status = 'modified'
+        else:
+            status = 'unchanged'
+        self.entries[key] = entry
+        self.counts[status] += 1
+        return status
+
+    def removed(self):
+        """Ids du manifeste précédent absents du flux (à appeler une fois le flux consommé)"""
+        removed = [(key, entry[0]) for key, entry in self.previous.items() if key not in self.entries]
+        self.counts['removed'] = len(removed)
+        return removed
+
+    def summary(self):
+        return ', '.join(f"{self.counts[status]} {STATUS_LABELS[status]}" for status in STATUSES)
+
+
+# --- Mode --incremental des convertisseurs ---
+
+def manifest_path_for(output_file):
+    return f"{output_file}.manifest.json"
+
+
+def discard_manifest(output_file):
+    """À appeler après une conversion complète : le manifeste ne décrit plus le fichier"""
+    try:
+        os.remove(manifest_path_for(output_file))
+    except FileNotFoundError:
+        pass
+
+
+def _file_signature(path):
+    """Taille et date de modification (ns) du fichier produit, gardées dans le manifeste"""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def write_incremental_csv(aids, output_file, schema, make_writer):
+    """
+    Écrit le CSV de `aids` en reprenant, octet pour octet, les lignes des aides
+    inchangées depuis la conversion précédente. Le manifeste <sortie>.manifest.json
+    garde la position de chaque ligne dans le fichier : une ligne reprise est une
+    simple copie, sans relecture ni remise en forme du CSV.
+    Les lignes ne sont reprises que si le CSV sur disque est bien celui que décrit le
+    manifeste (même en-tête, même taille, même date de modification) ; sinon tout est
+    remis en forme. Tout l'export est relu et tout le fichier réécrit : seule la mise
+    en forme des aides inchangées est évitée.
+    Le fichier produit est identique à une conversion complète. Renvoie le SnapshotDiff.
+    """
+    manifest_path = manifest_path_for(output_file)
+    manifest = load_manifest(manifest_path)
+    previous = manifest['aids']
+    diff = SnapshotDiff(previous)
+    header = list(schema.header)
+    # Colonnes différentes (autre schéma, --backers...) ou fichier remplacé depuis
+    # (conversion complète, modification à la main) : aucune ligne n'est reprise
+    reuse = (manifest.get('header') == header and os.path.exists(output_file)
+             and manifest.get('output') == _file_signature(output_file))
+
+    buffer = io.StringIO(newline='')
+    writer = make_writer(buffer)
+
+    def render(row):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(row)
+        return buffer.getvalue().encode('utf-8')
+
+    with open(output_file, 'rb') if reuse else nullcontext() as old, atomic_open(output_file, 'wb') as out:
+        position = out.write(render(header))
+        for aid in aids:
+            key = str(aid.get('id'))
+            status = diff.classify(aid)
+            before = previous.get(key)
+            data = None
+            if reuse and status == 'unchanged' and len(before) == 4:
+                old.seek(before[2])
+                data = old.read(before[3])
+                if len(data) != before[3]:
+                    # Lecture incomplète : le fichier ne correspond pas au manifeste
+                    data = None
+            if data is None:
+                data = render(schema.row(aid))
+            diff.entries[key] += [position, len(data)]
+            position += out.write(data)
+    diff.removed()
+    save_manifest(manifest_path, diff.entries, header=header, output=_file_signature(output_file))
+    return diff
+
+
+def write_changes(aids, manifest_path, output_dir, update_manifest=True):
+    """Écrit added/modified/removed.ndjson en flux ; renvoie le SnapshotDiff"""
+    os.makedirs(output_dir, exist_ok=True)
+    diff = SnapshotDiff(load_manifest(manifest_path)['aids'])
+    paths = {status: os.path.join(output_dir, f"{status}.ndjson") for status in ('added', 'modified', 'removed')}
+    with atomic_open(paths['added']) as added, atomic_open(paths['modified']) as modified:
+        outputs = {'added': added, 'modified': modified}
+        for aid in aids:
+            status = diff.classify(aid)
+            if status in outputs:
+                outputs[status].write(json.dumps(aid, ensure_ascii=False) + '\n')
+    with atomic_open(paths['removed']) as removed:
+        for key, date_updated in diff.removed():
+            aid_id = int(key) if key.isdigit() else key
+            removed.write(json.dumps({'id': aid_id, 'date_updated': date_updated}) + '\n')
+    if update_manifest:
+        save_manifest(manifest_path, diff.entries)
+    return diff
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare un export d'aides au précédent et écrit les changements")
+    parser.add_argument('input_file', help='Nouvel export JSON')
+    parser.add_argument('--manifest', default=DEFAULT_MANIFEST,
+                        help=f"Manifeste de l'export précédent, mis à jour (défaut : {DEFAULT_MANIFEST})")
+    parser.add_argument('-o', '--output-dir', default='changes', help='Répertoire des changements (défaut : changes)')
+    parser.add_argument('--dry-run', action='store_true', help='Ne met pas à jour le manifeste')
+    args = parser.parse_args()
+
+    try:
+        diff = write_changes(iter_aids(args.input_file), args.manifest, args.output_dir, not args.dry_run)
+    except FileNotFoundError as e:
+        print(f"❌ Erreur: Fichier non trouvé: {e.filename}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"❌ Erreur: {e}")
+        sys.exit(1)
+    print(f"📊 {diff.summary()}")
+    print(f"✅ Changements écrits dans {args.output_dir}/")
+    if not args.dry_run:
+        print(f"✅ Manifeste mis à jour : {args.manifest}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Présélection structurée des aides (publics, thématiques, types d'aide, échelle,
+date limite, appel à projets, taux de subvention) sans appel à l'API
+
+Construit une fois sur le catalogue (cf. aid_store.AidStore) :
+- un ensemble de bits par valeur catégorielle ("Commune", "Subvention"...) :
+  le bit i vaut 1 si l'aide i porte cette valeur. Les critères se combinent
+  par &, | et ~ sur des entiers Python, soit quelques microsecondes par opération
+- des colonnes NumPy pour les dates et les taux (comparaisons vectorisées) ;
+  sans NumPy, les comparaisons passent par les valeurs distinctes de la colonne
+
+Critères (JSON) :
+    {"field": "targeted_audiences", "in": ["Commune", "Intercommunalité / Pays"]}
+    {"field": "categories", "all": ["Mobilité", "Vélo"]}
+    {"field": "is_call_for_project", "eq": false}
+    {"field": "submission_deadline", "gte": "today", "missing": true}
+    {"field": "subvention_rate_upper_bound", "gte": 50}
+    {"all": [...]}, {"any": [...]}, {"not": {...}}
+"missing": true retient aussi les aides sans valeur (aides permanentes sans date limite...).
+Les libellés sont comparés sans tenir compte de la casse ni des accents.
+
+Exemple :
+    python aid_filter.py aides.json --criteria '{"field": "targeted_audiences", "in": ["Commune"]}'
+    python aid_filter.py aides.json --profiles profils.json
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+from datetime import date
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from aid_store import AidStore, BOOL_FIELDS, FLOAT_FIELDS
+from perimeter_index import normalize
+
+SET_FIELDS = (
+    'targeted_audiences', 'categories', 'aid_types', 'destinations', 'financers', 'programs',
+    'perimeter_scale', 'perimeter', 'recurrence',
+)
+DATE_FIELDS = ('submission_deadline', 'start_date', 'predeposit_date', 'date_created', 'date_updated')
+RANGE_OPERATORS = {
+    'gt': lambda column, value: column > value,
+    'gte': lambda column, value: column >= value,
+    'lt': lambda column, value: column < value,
+    'lte': lambda column, value: column <= value,
+}
+
+
+def _ordinal(value):
+    """'2025-07-01' ou '2025-05-04T00:02:07+00:00' -> numéro de jour (float), NaN si invalide"""
+    if not value:
+        return math.nan
+    if value == 'today':
+        return float(date.today().toordinal())
+    try:
+        return float(date.fromisoformat(str(value)[:10]).toordinal())
+    except ValueError:
+        return math.nan
+
+
+class _BitmapBuilder:
+    """Construit un entier-bitset à partir de positions, en O(positions + taille / 8)"""
+
+    def __init__(self, size):
+        self.bitmap = bytearray((size + 7) // 8)
+
+    def add(self, position):
+        self.bitmap[position >> 3] |= 1 << (position & 7)
+
+    def value(self):
+        return int.from_bytes(self.bitmap, 'little')
+
+
+class AidFilter:
+    """Moteur de filtres sur un catalogue figé"""
+
+    def __init__(self, store):
+        self.size = len(store)
+        self.all = (1 << self.size) - 1
+        self.ids = store.ids()
+        self.bitsets = {}      # champ -> {valeur normalisée: bitset}
+        self.present = {}      # champ -> bitset des aides ayant une valeur
+        self.ranges = {}       # champ -> (valeurs distinctes, bitset par valeur) pour le repli sans NumPy
+        self.columns = {}      # champ -> colonne NumPy float64, NaN si absent
+
+        for field in SET_FIELDS:
+            self._index_values(store, field)
+        for field in BOOL_FIELDS:
+            builders = {True: _BitmapBuilder(self.size), False: _BitmapBuilder(self.size)}
+            for index, value in enumerate(store.bools[field]):
+                if value >= 0:
+                    builders[bool(value)].add(index)
+            self.bitsets[field] = {value: builder.value() for value, builder in builders.items()}
+            self.present[field] = self.bitsets[field][True] | self.bitsets[field][False]
+        for field in DATE_FIELDS:
+            column = store.categories[field]
+            ordinals = [_ordinal(value) for value in column.dictionary.values]
+            self._index_range(field, array_values=[ordinals[code] for code in column.codes],
+                              codes=column.codes, distinct=ordinals)
+        for field in FLOAT_FIELDS:
+            self._index_range(field, array_values=store.floats[field])
+        if np is not None:
+            # Les ids d'un type inattendu ("12", None...) sont rendus tels quels
+            numeric = all(isinstance(aid_id, int) and not isinstance(aid_id, bool) for aid_id in self.ids)
+            self.id_array = np.array(self.ids, dtype=np.int64 if numeric else object)
+
+    # --- Construction ---
+
+    def _index_values(self, store, field):
+        builders = {}
+        present = _BitmapBuilder(self.size)
+        if field in store.category_lists:
+            column = store.category_lists[field]
+            codes, offsets = column.codes, column.offsets
+            for index in range(self.size):
+                for code in codes[offsets[index]:offsets[index + 1]]:
+                    builders.setdefault(code, _BitmapBuilder(self.size)).add(index)
+                    present.add(index)
+        else:
+            column = store.categories[field]
+            for index, code in enumerate(column.codes):
+                if code:
+                    builders.setdefault(code, _BitmapBuilder(self.size)).add(index)
+                    present.add(index)
+        bitsets = {}
+        for code, builder in builders.items():
+            key = normalize(column.dictionary.values[code])
+            bitsets[key] = bitsets.get(key, 0) | builder.value()
+        self.bitsets[field] = bitsets
+        self.present[field] = present.value()
+
+    def _index_range(self, field, array_values, codes=None, distinct=None):
+        if np is not None:
+            self.columns[field] = np.asarray(array_values, dtype=np.float64)
+            return
+        # Sans NumPy : un bitset par valeur distincte, combinés au moment de la requête
+        builders = {}
+        if codes is None:
+            for index, value in enumerate(array_values):
+                if not math.isnan(value):
+                    builders.setdefault(value, _BitmapBuilder(self.size)).add(index)
+        else:
+            for index, code in enumerate(codes):
+                value = distinct[code]
+                if not math.isnan(value):
+                    builders.setdefault(value, _BitmapBuilder(self.size)).add(index)
+        values = {value: builder.value() for value, builder in builders.items()}
+        present = 0
+        for bits in values.values():
+            present |= bits
+        self.ranges[field] = values
+        self.present[field] = present
+
+    @classmethod
+    def load(cls, filepath):
+        return cls(AidStore.load(filepath))
+
+    # --- Évaluation ---
+
+    def _range_mask(self, field, operator, bound):
+        bound = _ordinal(bound) if field in DATE_FIELDS else float(bound)
+        if np is not None:
+            column = self.columns[field]
+            # NaN (valeur absente) échoue à toute comparaison
+            matches = RANGE_OPERATORS[operator](column, bound)
+            return int.from_bytes(np.packbits(matches, bitorder='little').tobytes(), 'little')
+        compare = RANGE_OPERATORS[operator]
+        mask = 0
+        for value, bits in self.ranges[field].items():
+            if compare(value, bound):
+                mask |= bits
+        return mask
+
+    def _present(self, field):
+        if field not in self.present:
+            mask = int.from_bytes(np.packbits(~np.isnan(self.columns[field]), bitorder='little').tobytes(), 'little')
+            self.present[field] = mask
+        return self.present[field]
+
+    def mask(self, criterion):
+        """Bitset des aides satisfaisant le critère"""
+        if 'all' in criterion and 'field' not in criterion:
+            mask = self.all
+            for child in criterion['all']:
+                mask &= self.mask(child)
+                if not mask:
+                    break
+            return mask
+        if 'any' in criterion and 'field' not in criterion:
+            mask = 0
+            for child in criterion['any']:
+                mask |= self.mask(child)
+            return mask
+        if 'not' in criterion:
+            return self.all & ~self.mask(criterion['not'])
+
+        field = criterion.get('field')
+        if field in self.bitsets:
+            values = self.bitsets[field]
+            if 'eq' in criterion:
+                wanted = criterion['eq']
+                return values.get(wanted if field in BOOL_FIELDS else normalize(wanted), 0)
+            if 'in' in criterion:
+                mask = 0
+                for value in criterion['in']:
+                    mask |= values.get(normalize(value), 0)
+                return mask
+            if 'all' in criterion:
+                mask = self.all
+                for value in criterion['all']:
+                    mask &= values.get(normalize(value), 0)
+                return mask
+        elif field in DATE_FIELDS or field in FLOAT_FIELDS:
+            mask = self.all
+            for operator in RANGE_OPERATORS:
+                if operator in criterion:
+                    mask &= self._range_mask(field, operator, criterion[operator])
+            if criterion.get('missing'):
+                mask |= self.all & ~self._present(field)
+            return mask
+        raise ValueError(f"Critère invalide : {json.dumps(criterion, ensure_ascii=False)}")
+
+    def ids_of(self, mask):
+        """Identifiants des aides d'un bitset, dans l'ordre du catalogue"""
+        if not mask:
+            return []
+        if np is not None:
+            bits = np.unpackbits(np.frombuffer(mask.to_bytes((self.size + 7) // 8, 'little'), dtype=np.uint8),
+                                 bitorder='little')[:self.size]
+            return self.id_array[np.flatnonzero(bits)].tolist()
+        ids = []
+        for byte_index, byte in enumerate(mask.to_bytes((self.size + 7) // 8, 'little')):
+            while byte:
+                low = byte & -byte
+                ids.append(self.ids[byte_index * 8 + low.bit_length() - 1])
+                byte ^= low
+        return ids
+
+    def select(self, criterion):
+        """Identifiants des aides satisfaisant le critère"""
+        return self.ids_of(self.mask(criterion))
+
+    def count(self, criterion):
+        return bin(self.mask(criterion)).count('1')
+
+    def screen(self, profiles):
+        """Un critère par profil de projet -> liste d'identifiants par profil"""
+        return [self.select(criterion) for criterion in profiles]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Filtre les aides sur des critères structurés, hors ligne')
+    parser.add_argument('input_file', help='Fichier JSON des aides')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--criteria', help='Critère JSON')
+    group.add_argument('--profiles', help='Fichier JSON : liste de critères (un par profil de projet)')
+    parser.add_argument('--ids', action='store_true', help='Affiche les identifiants retenus')
+    args = parser.parse_args()
+
+    try:
+        started = time.perf_counter()
+        engine = AidFilter.load(args.input_file)
+        print(f"🔄 {engine.size} aides indexées en {time.perf_counter() - started:.2f} s "
+              f"({'NumPy' if np is not None else 'sans NumPy'})")
+        if args.criteria:
+            profiles = [json.loads(args.criteria)]
+        else:
+            with open(args.profiles, encoding='utf-8') as f:
+                profiles = json.load(f)
+
+        started = time.perf_counter()
+        results = engine.screen(profiles)
+        elapsed = time.perf_counter() - started
+        for position, ids in enumerate(results):
+            print(f"📊 Profil {position + 1} : {len(ids)} aide(s)")
+            if args.ids:
+                print('   ' + ', '.join(str(aid_id) for aid_id in ids))
+        print(f"✅ {len(profiles)} profil(s) en {elapsed * 1000:.1f} ms ({len(profiles) / max(elapsed, 1e-9):.0f} profils/s)")
+    except FileNotFoundError as e:
+        print(f"❌ Erreur: Fichier non trouvé: {e.filename}")
+        sys.exit(1)
+    except (ValueError, KeyError) as e:
+        print(f"❌ Erreur: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Schéma déclaratif des colonnes CSV des aides
+Chaque colonne indique son nom, le champ source et la transformation à appliquer.
+Le schéma est compilé une seule fois en un tuple de fonctions spécialisées :
+produire une ligne revient à appeler ces fonctions, sans test sur les noms de
+colonnes ni chaîne d'isinstance pour chaque cellule.
+
+Transformations :
+- value  : valeur brute (None écrit comme une cellule vide)
+- names  : liste de chaînes ou d'objets {"name": ...} jointe par "; "
+- html   : HTML nettoyé (cf. html_cleaner)
+- flatten: valeur scalaire, ou liste aplatie comme flatten_value si elle en contient une
+- name_list : comme names, mais garde une vraie liste (exports colonnes, cf. columnar_export)
+"""
+
+from collections import namedtuple
+
+from html_cleaner import clean_html
+
+Column = namedtuple('Column', ['name', 'source', 'transform'])
+
+
+def extract_list_items(items_list, key='name'):
+    """Extrait les éléments d'une liste et les joint par des virgules"""
+    if not items_list:
+        return ""
+    if isinstance(items_list[0], dict):
+        return "; ".join([item.get(key, '') for item in items_list])
+    else:
+        return "; ".join(items_list)
+
+
+def flatten_value(value):
+    """
+    Convertit une valeur pour l'écriture CSV.
+    Les listes sont jointes par '; '.
+    Les listes d'objets avec une clé 'name' sont jointes par leurs noms.
+    Les booléens sont convertis en chaînes.
+    Les valeurs None deviennent des chaînes vides.
+    """
+    if isinstance(value, list):
+        if not value:
+            return ""
+        # Vérifier si c'est une liste d'objets avec une clé 'name' (comme financers_full, aid_types_full)
+        if all(isinstance(item, dict) and 'name' in item for item in value):
+            return "; ".join(str(item.get('name', '')) if item else '' for item in value)
+        # Sinon, joindre les éléments (en s'assurant qu'ils sont des chaînes)
+        return "; ".join(str(v) if v is not None else "" for v in value)
+    elif isinstance(value, bool):
+        return str(value)
+    elif value is None:
+        return ""
+    return str(value)
+
+
+# --- Fabriques d'extracteurs, une par transformation ---
+
+def _value(source):
+    def extract(aid):
+        return aid.get(source, '')
+    return extract
+
+
+def _names(source):
+    def extract(aid):
+        return extract_list_items(aid.get(source, []))
+    return extract
+
+
+def _html(source):
+    def extract(aid):
+        return clean_html(aid.get(source, ''))
+    return extract
+
+
+def _flatten(source):
+    # csv.writer écrit None comme '' et convertit les scalaires avec str() :
+    # seules les listes ont besoin de flatten_value
+    def extract(aid):
+        value = aid.get(source)
+        if value.__class__ is list:
+            return flatten_value(value)
+        return value
+    return extract
+
+
+def _name_list(source):
+    def extract(aid):
+        items = aid.get(source) or []
+        return [item.get('name', '') if isinstance(item, dict) else item for item in items]
+    return extract
+
+
+TRANSFORMS = {
+    'value': _value,
+    'names': _names,
+    'html': _html,
+    'flatten': _flatten,
+    'name_list': _name_list,
+}
+
+
+class RowExtractor:
+    """Schéma compilé : en-tête et extracteurs spécialisés"""
+
+    def __init__(self, columns):
+        unknown = {column.transform for column in columns} - set(TRANSFORMS)
+        if unknown:
+            raise ValueError(f"Transformation(s) inconnue(s) : {', '.join(sorted(unknown))}")
+        self.columns = tuple(columns)
+        self.header = [column.name for column in self.columns]
+        self.extractors = tuple(TRANSFORMS[column.transform](column.source) for column in self.columns)
+
+    def row(self, aid):
+        """Ligne prête pour csv.writer"""
+        return [extract(aid) for extract in self.extractors]
+
+    def rows(self, aids):
+        extractors = self.extractors
+        for aid in aids:
+            yield [extract(aid) for extract in extractors]
+
+
+def compile_schema(columns):
+    return RowExtractor(columns)
+
+
+def _columns(spec):
+    """Raccourci : (nom, transformation) ou (nom, source, transformation)"""
+    return [Column(item[0], item[0], item[1]) if len(item) == 2 else Column(*item) for item in spec]
+
+
+# Colonnes de json_to_csv_converter.py : textes nettoyés, listes jointes
+CLEAN_COLUMNS = _columns([
+    ('id', 'value'), ('name', 'value'), ('name_initial', 'value'), ('short_title', 'value'),
+    ('slug', 'value'), ('url', 'value'),
+    ('financers', 'names'), ('instructors', 'names'), ('programs', 'names'),
+    ('description_clean', 'description', 'html'), ('eligibility_clean', 'eligibility', 'html'),
+    ('perimeter', 'value'), ('perimeter_scale', 'value'),
+    ('categories', 'names'), ('targeted_audiences', 'names'), ('aid_types', 'names'), ('destinations', 'names'),
+    ('is_call_for_project', 'value'), ('is_charged', 'value'),
+    ('start_date', 'value'), ('predeposit_date', 'value'), ('submission_deadline', 'value'),
+    ('subvention_rate_lower_bound', 'value'), ('subvention_rate_upper_bound', 'value'),
+    ('loan_amount', 'value'), ('recoverable_advance_amount', 'value'),
+    ('contact_clean', 'contact', 'html'), ('origin_url', 'value'), ('application_url', 'value'),
+])
+
+# Colonnes de convert_aides_to_csv.py : valeurs brutes aplaties
+RAW_COLUMNS = _columns([(name, 'flatten') for name in [
+    'id', 'name', 'name_initial', 'short_title', 'slug', 'url',
+    'financers', 'instructors', 'programs',
+    'description', 'eligibility',
+    'perimeter', 'perimeter_scale',
+    'categories', 'targeted_audiences', 'aid_types', 'destinations',
+    'is_call_for_project', 'is_charged',
+    'start_date', 'predeposit_date', 'submission_deadline',
+    'subvention_rate_lower_bound', 'subvention_rate_upper_bound', 'subvention_comment',
+    'loan_amount', 'recoverable_advance_amount',
+    'contact', 'recurrence', 'project_examples',
+    'origin_url', 'application_url',
+    'import_data_url', 'import_data_mention', 'import_share_licence',
+    'date_created', 'date_updated', 'project_references', 'european_aid', 'is_live',
+]])
+
+# Mêmes colonnes que CLEAN_COLUMNS, listes conservées telles quelles
+LIST_COLUMNS = [column._replace(transform='name_list') if column.transform == 'names' else column
+                for column in CLEAN_COLUMNS]
+
+# Colonnes ajoutées par l'option --backers (cf. backer_index.BackerIndex.enrich)
+BACKER_COLUMNS = _columns([('financer_backer_ids', 'names'), ('financer_group_ids', 'names')])
+
+CLEAN_SCHEMA = compile_schema(CLEAN_COLUMNS)
+CLEAN_BACKER_SCHEMA = compile_schema(CLEAN_COLUMNS + BACKER_COLUMNS)
+RAW_SCHEMA = compile_schema(RAW_COLUMNS)
+LIST_SCHEMA = compile_schema(LIST_COLUMNS)
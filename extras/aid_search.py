@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Index plein texte BM25 des aides, pour présélectionner localement les meilleures
+candidates avant le filtre LLM (filterAidesPass1 du backend)
+
+- texte indexé : nom (poids 3), description et conditions d'éligibilité nettoyées
+  (cf. html_cleaner, ou colonnes *_clean d'un CSV de json_to_csv_converter.py)
+- analyse française : mots vides, élisions, racinisation Snowball si le paquet
+  snowballstemmer est installé, sinon racinisation légère intégrée ; accents ignorés
+- index inversé persistant dans SQLite, mis à jour aide par aide : une aide
+  dont le texte n'a pas changé n'est pas réindexée, une aide disparue peut être supprimée
+
+Exemple :
+    python aid_search.py index aides.json
+    python aid_search.py search "rénovation énergétique école" -k 30
+"""
+
+import argparse
+import csv
+import hashlib
+import heapq
+import json
+import math
+import re
+import sqlite3
+import sys
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+
+try:
+    import snowballstemmer
+except ImportError:
+    snowballstemmer = None
+
+from aides_reader import iter_aids
+from html_cleaner import clean_html
+
+DEFAULT_DB = 'aides_search.sqlite'
+STATUS_LABELS = {'added': 'ajoutées', 'updated': 'mises à jour', 'unchanged': 'inchangées',
+                 'deleted': 'supprimées', 'skipped': 'ignorées (sans id)'}
+# Paramètres BM25 usuels
+K1 = 1.2
+B = 0.75
+FIELD_WEIGHTS = (('name', 3), ('description', 1), ('eligibility', 1))
+
+STOPWORDS = frozenset("""
+a afin ai aie ainsi alors au aucun aucune aupres auquel aura aurait aussi autre autres aux auxquels avant avec avoir
+c ca car ce ceci cela celle celles celui cependant ces cet cette ceux chaque chez ci comme comment d dans de des
+deja depuis dont du elle elles en encore entre est et etaient etait etant ete etre eu eux fait faire font hors il
+ils j je jusqu l la laquelle le lequel les lesquels leur leurs lors lui m ma mais me meme memes mes moi moins mon n
+ne ni non nos notre nous on ont or ou par parce pas peu peut peuvent plus pour pourquoi qu quand que quel quelle
+quelles quels qui quoi s sa sans se selon ses si sien soit son sont sous sur t ta te tel telle telles tels tes toi
+ton tous tout toute toutes tres tu un une unes uns vers via vos votre vous y
+""".split())
+
+_WORD_RE = re.compile(r"\w+")
+# Mots distincts dont le terme est mémorisé (le vocabulaire du catalogue y tient)
+TERM_CACHE_SIZE = 256 * 1024
+
+# Suffixes retirés par la racinisation légère, du plus long au plus court
+_LIGHT_SUFFIXES = (
+    'issements', 'issement', 'atrices', 'atrice', 'ateurs', 'ateur', 'ations', 'ation',
+    'ements', 'ement', 'ances', 'ance', 'ences', 'ence', 'ismes', 'isme', 'istes', 'iste',
+    'ables', 'able', 'iques', 'ique', 'euses', 'euse', 'ments', 'ment', 'ites', 'ite',
+    'ives', 'ive', 'eurs', 'eur', 'aux', 'eux', 'ees', 'ee', 'es', 'e', 's', 'x',
+)
+
+
+def _fold(word):
+    return ''.join(char for char in unicodedata.normalize('NFKD', word) if not unicodedata.combining(char))
+
+
+def _light_stem(word):
+    for suffix in _LIGHT_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+if snowballstemmer is not None:
+    ANALYZER = 'snowball-fr'
+    _stem = snowballstemmer.stemmer('french').stemWord
+else:
+    ANALYZER = 'light-fr'
+    _stem = None
+
+
+@lru_cache(maxsize=TERM_CACHE_SIZE)
+def _term(word):
+    """Terme d'un mot en minuscules, ou None pour un mot ignoré"""
+    folded = _fold(word)
+    if len(folded) < 2 or folded in STOPWORDS or folded.isdigit():
+        return None
+    if _stem is not None:
+        return _fold(_stem(word))
+    return _light_stem(folded)
+
+
+def analyze(text):
+    """Texte -> liste de termes (minuscules, sans mots vides, racinisés, sans accents)"""
+    # Le vocabulaire est réduit : chaque mot distinct n'est raciné qu'une fois,
+    # à l'indexation comme à la recherche
+    terms = []
+    for word in _WORD_RE.findall(text.lower()):
+        term = _term(word)
+        if term is not None:
+            terms.append(term)
+    return terms
+
+
+def _document(aid):
+    """Champs textuels nettoyés d'une aide (JSON brut ou ligne de CSV nettoyé)"""
+    return {
+        'name': aid.get('name') or '',
+        'description': aid['description_clean'] if 'description_clean' in aid else clean_html(aid.get('description')),
+        'eligibility': aid['eligibility_clean'] if 'eligibility_clean' in aid else clean_html(aid.get('eligibility')),
+    }
+
+
+def load_aids(filepath):
+    """Aides d'un export JSON (lecture tolérante) ou d'un CSV de json_to_csv_converter.py"""
+    if filepath.endswith('.csv'):
+        with open(filepath, encoding='utf-8', newline='') as f:
+            yield from csv.DictReader(f, delimiter=';')
+    else:
+        yield from iter_aids(filepath)
+
+
+class AidSearchIndex:
+    """Index BM25 persistant ; les écritures sont validées par add_many/delete"""
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS docs (
+                aid_id INTEGER PRIMARY KEY,
+                length INTEGER NOT NULL,
+                name TEXT,
+                digest TEXT
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT,
+                aid_id INTEGER,
+                tf INTEGER,
+                PRIMARY KEY (term, aid_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_by_aid ON postings (aid_id);
+        """)
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'analyzer'").fetchone()
+        if row is None:
+            self.db.execute("INSERT INTO meta VALUES ('analyzer', ?)", (ANALYZER,))
+            self.db.commit()
+        elif row[0] != ANALYZER:
+            self.db.close()
+            raise Exception(f"{path} a été construit avec l'analyseur {row[0]}, "
+                            f"celui-ci utilise {ANALYZER} : reconstruisez l'index")
+        self._lengths = None
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    # --- Écriture ---
+
+    def _delete(self, aid_id):
+        self.db.execute("DELETE FROM postings WHERE aid_id = ?", (aid_id,))
+        return self.db.execute("DELETE FROM docs WHERE aid_id = ?", (aid_id,)).rowcount > 0
+
+    def _add(self, aid):
+        aid_id = int(aid['id'])
+        document = _document(aid)
+        digest = hashlib.blake2b(json.dumps(document, sort_keys=True).encode('utf-8'), digest_size=16).hexdigest()
+        row = self.db.execute("SELECT digest FROM docs WHERE aid_id = ?", (aid_id,)).fetchone()
+        if row and row[0] == digest:
+            return 'unchanged'
+        if row:
+            self._delete(aid_id)
+        frequencies = Counter()
+        length = 0
+        for field, weight in FIELD_WEIGHTS:
+            terms = analyze(document[field])
+            length += len(terms) * weight
+            for term in terms:
+                frequencies[term] += weight
+        self.db.execute("INSERT INTO docs VALUES (?, ?, ?, ?)", (aid_id, length, document['name'], digest))
+        self.db.executemany("INSERT INTO postings VALUES (?, ?, ?)",
+                            ((term, aid_id, tf) for term, tf in frequencies.items()))
+        return 'updated' if row else 'added'
+
+    def add(self, aid):
+        """Indexe ou réindexe une aide ; renvoie 'added', 'updated' ou 'unchanged'"""
+        return next(iter(self.add_many([aid])))
+
+    def add_many(self, aids, prune=False):
+        """
+        Indexe des aides en une transaction ; renvoie les statuts comptés.
+        Avec `prune`, les aides indexées absentes de `aids` sont supprimées
+        (mise à jour depuis un export complet).
+        """
+        counts = Counter()
+        seen = set()
+        with self.db:
+            for aid in aids:
+                if aid.get('id') in (None, ''):
+                    counts['skipped'] += 1
+                    continue
+                counts[self._add(aid)] += 1
+                seen.add(int(aid['id']))
+            if prune:
+                stale = [aid_id for (aid_id,) in self.db.execute("SELECT aid_id FROM docs") if aid_id not in seen]
+                for aid_id in stale:
+                    self._delete(aid_id)
+                counts['deleted'] += len(stale)
+        self._lengths = None
+        return counts
+
+    def delete(self, aid_id):
+        """Retire une aide de l'index ; renvoie False si elle n'y était pas"""
+        with self.db:
+            deleted = self._delete(int(aid_id))
+        self._lengths = None
+        return deleted
+
+    # --- Recherche ---
+
+    def _doc_lengths(self):
+        # Chargées une fois par session de recherche, invalidées par les écritures
+        if self._lengths is None:
+            self._lengths = dict(self.db.execute("SELECT aid_id, length FROM docs"))
+        return self._lengths
+
+    def search(self, query, k=20):
+        """Les `k` aides les plus pertinentes : liste de (id, score, nom)"""
+        lengths = self._doc_lengths()
+        if not lengths:
+            return []
+        count = len(lengths)
+        average = sum(lengths.values()) / count
+        scores = Counter()
+        for term, query_tf in Counter(analyze(query)).items():
+            postings = self.db.execute("SELECT aid_id, tf FROM postings WHERE term = ?", (term,)).fetchall()
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for aid_id, tf in postings:
+                norm = K1 * (1 - B + B * lengths[aid_id] / average)
+                scores[aid_id] += query_tf * idf * tf * (K1 + 1) / (tf + norm)
+        best = heapq.nlargest(k, scores.items(), key=lambda item: (item[1], -item[0]))
+        names = dict(self.db.execute(
+            f"SELECT aid_id, name FROM docs WHERE aid_id IN ({','.join('?' * len(best))})",
+            [aid_id for aid_id, _ in best]
+        )) if best else {}
+        return [(aid_id, score, names.get(aid_id)) for aid_id, score in best]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Index plein texte BM25 des aides')
+    parser.add_argument('--db', default=DEFAULT_DB, help=f'Fichier SQLite de l\'index (défaut : {DEFAULT_DB})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    index = subparsers.add_parser('index', help='Indexe (ou met à jour) les aides d\'un export JSON ou CSV')
+    index.add_argument('input_file')
+    index.add_argument('--prune', action='store_true', help="Supprime les aides indexées absentes de l'export")
+
+    search = subparsers.add_parser('search', help='Recherche les aides les plus pertinentes')
+    search.add_argument('query')
+    search.add_argument('-k', type=int, default=20, help='Nombre de résultats (défaut : 20)')
+    search.add_argument('--json', action='store_true', help='Sortie JSON (id, score, nom)')
+
+    delete = subparsers.add_parser('delete', help="Retire des aides de l'index")
+    delete.add_argument('aid_ids', nargs='+', type=int)
+    args = parser.parse_args()
+
+    try:
+        with AidSearchIndex(args.db) as search_index:
+            if args.command == 'index':
+                counts = search_index.add_many(load_aids(args.input_file), prune=args.prune)
+                print(f"✅ {len(search_index)} aides indexées dans {args.db} ({ANALYZER}) : "
+                      + ', '.join(f"{count} {STATUS_LABELS[status]}" for status, count in sorted(counts.items())))
+            elif args.command == 'search':
+                results = search_index.search(args.query, args.k)
+                if args.json:
+                    print(json.dumps([{'id': aid_id, 'score': round(score, 4), 'name': name}
+                                      for aid_id, score, name in results], ensure_ascii=False))
+                else:
+                    for aid_id, score, name in results:
+                        print(f"{score:7.3f}  {aid_id}  {name}")
+            else:
+                for aid_id in args.aid_ids:
+                    if search_index.delete(aid_id):
+                        print(f"✅ Aide {aid_id} retirée")
+                    else:
+                        print(f"⚠️ Aide {aid_id} absente de l'index")
+    except FileNotFoundError as e:
+        print(f"❌ Erreur: Fichier non trouvé: {e.filename}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"❌ Erreur: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Stockage compact en colonnes d'un catalogue d'aides, pour l'analyse hors ligne
+Au lieu d'une liste de dictionnaires JSON, chaque champ devient une colonne :
+- catégories (financeurs, thématiques, publics, échelle de périmètre, dates...)
+  encodées par dictionnaire : chaque valeur distincte n'est stockée qu'une fois,
+  la colonne ne contient que des codes entiers dans un array
+- listes de catégories stockées à plat (codes + offsets, format CSR)
+- champs numériques (taux de subvention, montants) dans des array('d'), NaN pour None ;
+  un octet par aide indique si la valeur d'origine était un entier (80 ou 80.0)
+- booléens dans un array('b'), -1 pour None
+- objets *_full (financeur avec id/nom/logo...) dédupliqués : une seule instance par objet distinct
+- textes libres (nom, description...) gardés tels quels, seuls champs réellement uniques
+
+Les aides se lisent à la demande via des vues légères (__slots__).
+
+Exemple :
+    store = AidStore.load('aides.json')
+    aide = store.get(164898)
+    aide.financers, aide['subvention_rate_upper_bound']
+"""
+
+import argparse
+import json
+import math
+import sys
+import tracemalloc
+from array import array
+
+from aides_reader import iter_aids
+
+INT_FIELDS = ('id',)
+FLOAT_FIELDS = (
+    'subvention_rate_lower_bound', 'subvention_rate_upper_bound',
+    'loan_amount', 'recoverable_advance_amount',
+)
+BOOL_FIELDS = ('is_call_for_project', 'is_charged', 'is_live')
+CATEGORY_FIELDS = (
+    'perimeter', 'perimeter_scale', 'recurrence', 'european_aid',
+    'start_date', 'predeposit_date', 'submission_deadline', 'date_created', 'date_updated',
+    'import_share_licence', 'import_data_mention',
+)
+CATEGORY_LIST_FIELDS = (
+    'financers', 'instructors', 'programs', 'categories', 'targeted_audiences',
+    'aid_types', 'destinations', 'mobilization_steps', 'project_references',
+)
+OBJECT_LIST_FIELDS = ('financers_full', 'instructors_full', 'aid_types_full')
+TEXT_FIELDS = (
+    'slug', 'url', 'name', 'name_initial', 'short_title', 'description', 'eligibility',
+    'contact', 'subvention_comment', 'project_examples', 'origin_url', 'application_url',
+    'import_data_url',
+)
+
+MISSING_INT = -(2 ** 63)
+
+
+class Dictionary:
+    """Encodage par dictionnaire : valeur <-> code entier"""
+
+    __slots__ = ('codes', 'values')
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def __len__(self):
+        return len(self.values)
+
+
+class CategoryColumn:
+    """Colonne catégorielle scalaire ; le code 0 est réservé à None"""
+
+    def __init__(self):
+        self.dictionary = Dictionary()
+        self.dictionary.encode(None)
+        self.codes = array('I')
+
+    def append(self, value):
+        self.codes.append(self.dictionary.encode(value))
+
+    def __getitem__(self, index):
+        return self.dictionary.values[self.codes[index]]
+
+
+class CategoryListColumn:
+    """Colonne de listes catégorielles, à plat : codes + offsets de début de chaque aide"""
+
+    def __init__(self, key=None):
+        self.dictionary = Dictionary()
+        self.codes = array('I')
+        self.offsets = array('Q', [0])
+        # Pour les objets (dictionnaires), la clé de dédoublonnage est leur forme JSON canonique
+        self.key = key
+
+    def append(self, values):
+        encode = self.dictionary.encode
+        if self.key is None:
+            self.codes.extend(encode(value) for value in values or ())
+        else:
+            objects = self.dictionary
+            for value in values or ():
+                key = self.key(value)
+                code = objects.codes.get(key)
+                if code is None:
+                    code = objects.codes[key] = len(objects.values)
+                    objects.values.append(value)
+                self.codes.append(code)
+        self.offsets.append(len(self.codes))
+
+    def __getitem__(self, index):
+        values = self.dictionary.values
+        return [values[code] for code in self.codes[self.offsets[index]:self.offsets[index + 1]]]
+
+    def codes_of(self, index):
+        return self.codes[self.offsets[index]:self.offsets[index + 1]]
+
+
+def _hashable(value):
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+def _object_key(value):
+    return json.dumps(value, sort_keys=True, ensure_ascii=False)
+
+
+class AidView:
+    """Vue paresseuse sur une aide du store : les champs sont décodés à l'accès"""
+
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    def __getitem__(self, field):
+        return self.store.value(self.index, field)
+
+    def __getattr__(self, field):
+        try:
+            return self.store.value(self.index, field)
+        except KeyError:
+            raise AttributeError(field) from None
+
+    def get(self, field, default=None):
+        try:
+            return self.store.value(self.index, field)
+        except KeyError:
+            return default
+
+    def to_dict(self):
+        return self.store.to_dict(self.index)
+
+    def __repr__(self):
+        return f"<AidView {self.store.value(self.index, 'id')} {self.store.value(self.index, 'name')!r}>"
+
+
+class AidStore:
+    """Catalogue d'aides stocké en colonnes"""
+
+    def __init__(self):
+        self.size = 0
+        self.ints = {field: array('q') for field in INT_FIELDS}
+        self.floats = {field: array('d') for field in FLOAT_FIELDS}
+        # 1 si la valeur d'origine était un entier : 80 est relu 80, 50.0 est relu 50.0
+        self.integral = {field: array('b') for field in FLOAT_FIELDS}
+        self.bools = {field: array('b') for field in BOOL_FIELDS}
+        self.categories = {field: CategoryColumn() for field in CATEGORY_FIELDS}
+        self.category_lists = {field: CategoryListColumn() for field in CATEGORY_LIST_FIELDS}
+        self.object_lists = {field: CategoryListColumn(_object_key) for field in OBJECT_LIST_FIELDS}
+        self.texts = {field: [] for field in TEXT_FIELDS}
+        # Champs non prévus par le schéma, conservés pour ne rien perdre : {index: {champ: valeur}}
+        self.others = {}
+        self._index_by_id = None
+
+    # --- Construction ---
+
+    @classmethod
+    def from_aids(cls, aids):
+        store = cls()
+        for aid in aids:
+            store.append(aid)
+        return store
+
+    @classmethod
+    def load(cls, filepath):
+        """Charge un export JSON (tous formats acceptés par aides_reader) en flux"""
+        return cls.from_aids(iter_aids(filepath))
+
+    def append(self, aid):
+        others = {field: value for field, value in aid.items() if field not in FIELDS}
+        # Une valeur d'un type inattendu ("164898", "50 %"...) est conservée telle quelle
+        # dans `others` ; la colonne typée reçoit la valeur manquante
+        for field, column in self.ints.items():
+            value = aid.get(field)
+            if isinstance(value, int) and not isinstance(value, bool):
+                column.append(value)
+            else:
+                column.append(MISSING_INT)
+                if value is not None:
+                    others[field] = value
+        for field, column in self.floats.items():
+            value = aid.get(field)
+            # Un entier non représentable exactement en flottant est aussi conservé à part
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and float(value) == value:
+                column.append(float(value))
+                self.integral[field].append(isinstance(value, int))
+            else:
+                column.append(math.nan)
+                self.integral[field].append(0)
+                if value is not None:
+                    others[field] = value
+        for field, column in self.bools.items():
+            value = aid.get(field)
+            if isinstance(value, bool):
+                column.append(int(value))
+            else:
+                column.append(-1)
+                if value is not None:
+                    others[field] = value
+        # De même, un objet dans une colonne catégorielle, ou une liste qui n'en est pas
+        # une, est conservé dans `others` plutôt que d'interrompre le chargement
+        for field, column in self.categories.items():
+            value = aid.get(field)
+            if _hashable(value):
+                column.append(value)
+            else:
+                column.append(None)
+                others[field] = value
+        for field, column in self.category_lists.items():
+            value = aid.get(field)
+            if value is None or isinstance(value, list) and all(_hashable(item) for item in value):
+                column.append(value)
+            else:
+                column.append(None)
+                others[field] = value
+        for field, column in self.object_lists.items():
+            value = aid.get(field)
+            if value is None or isinstance(value, list):
+                column.append(value)
+            else:
+                column.append(None)
+                others[field] = value
+        for field, column in self.texts.items():
+            column.append(aid.get(field))
+        if others:
+            self.others[self.size] = others
+        self.size += 1
+        self._index_by_id = None
+
+    # --- Lecture ---
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        return AidView(self, index)
+
+    def __iter__(self):
+        for index in range(self.size):
+            yield AidView(self, index)
+
+    def ids(self):
+        """Identifiant de chaque aide, dans l'ordre ; un id d'un type inattendu est lu dans `others`"""
+        ids = [None if value == MISSING_INT else value for value in self.ints['id']]
+        for index, others in self.others.items():
+            if 'id' in others:
+                ids[index] = others['id']
+        return ids
+
+    def get(self, aid_id):
+        """Aide par identifiant, ou None"""
+        if self._index_by_id is None:
+            self._index_by_id = {aid_id: index for index, aid_id in enumerate(self.ids())
+                                 if aid_id is not None and not isinstance(aid_id, (dict, list))}
+        index = self._index_by_id.get(aid_id)
+        return None if index is None else AidView(self, index)
+
+    def value(self, index, field):
+        others = self.others.get(index)
+        if others and field in others:
+            return others[field]
+        if field in self.texts:
+            return self.texts[field][index]
+        if field in self.categories:
+            return self.categories[field][index]
+        if field in self.category_lists:
+            return self.category_lists[field][index]
+        if field in self.object_lists:
+            return self.object_lists[field][index]
+        if field in self.floats:
+            value = self.floats[field][index]
+            if math.isnan(value):
+                return None
+            return int(value) if self.integral[field][index] else value
+        if field in self.bools:
+            value = self.bools[field][index]
+            return None if value < 0 else bool(value)
+        if field in self.ints:
+            value = self.ints[field][index]
+            return None if value == MISSING_INT else value
+        raise KeyError(field)
+
+    def to_dict(self, index):
+        aid = {field: self.value(index, field) for field in FIELDS}
+        aid.update(self.others.get(index, {}))
+        return aid
+
+    def distinct(self, field):
+        """Valeurs distinctes d'une colonne catégorielle"""
+        column = self.categories.get(field) or self.category_lists.get(field)
+        return [value for value in column.dictionary.values if value is not None]
+
+    def stats(self):
+        """Nombre de valeurs distinctes par colonne catégorielle"""
+        columns = {**self.categories, **self.category_lists, **self.object_lists}
+        return {field: len(column.dictionary) for field, column in columns.items()}
+
+
+FIELDS = frozenset(INT_FIELDS + FLOAT_FIELDS + BOOL_FIELDS + CATEGORY_FIELDS
+                   + CATEGORY_LIST_FIELDS + OBJECT_LIST_FIELDS + TEXT_FIELDS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Charge un export d'aides en mémoire compacte et compare l'empreinte mémoire")
+    parser.add_argument('input_file', help='Fichier JSON source')
+    args = parser.parse_args()
+
+    try:
+        tracemalloc.start()
+        aids = list(iter_aids(args.input_file))
+        dict_bytes = tracemalloc.get_traced_memory()[0]
+        del aids
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        store = AidStore.load(args.input_file)
+        store_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    except FileNotFoundError:
+        print(f"❌ Erreur: Fichier non trouvé: {args.input_file}")
+        sys.exit(1)
+
+    print(f"📊 {len(store)} aides")
+    print(f"   liste de dictionnaires : {dict_bytes / 1e6:.1f} Mo")
+    print(f"   AidStore               : {store_bytes / 1e6:.1f} Mo ({store_bytes / max(dict_bytes, 1):.0%})")
+    for field, count in sorted(store.stats().items()):
+        print(f"   {field}: {count} valeurs distinctes")
+
+
+if __name__ == '__main__':
+    main()
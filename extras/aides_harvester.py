@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+Moissonneur paginé pour l'API Aides-Territoires
+Remplace fetch_perimeters.py et les scripts fetch_*.sh :
+- token obtenu via /connexion/ (clé AIDES_TERRITOIRES_API_KEY) et mis en cache, comme getAidesToken
+- page 1 lue d'abord pour connaître "count", les pages suivantes en parallèle
+- connexions HTTP réutilisées (keep-alive) via une Session partagée
+- nouvelles tentatives avec attente exponentielle sur les erreurs 5xx/429
+- limitation de débit par seau à jetons
+- journal de reprise : chaque page est ajoutée sur disque dès réception, une
+  relance reprend après la dernière page validée ; la sortie finale est écrite
+  de façon atomique
+- cache HTTP sur disque avec revalidation conditionnelle (cf. http_cache.py)
+
+Exemples :
+    python aides_harvester.py perimeters -p scale=adhoc -o adhoc_perimeters.json
+    python aides_harvester.py backers -o all_backers.json
+    python aides_harvester.py aids -p category_ids=50 -p organization_type_slugs=association
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from atomic_files import atomic_open
+from http_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, ResponseCache
+
+API_BASE = os.environ.get('AIDES_TERRITOIRES_API_BASE', 'https://aides-territoires.beta.gouv.fr/api')
+
+ENDPOINTS = {
+    'perimeters': '/perimeters/',
+    'backers': '/backers/',
+    'backer-groups': '/backer-groups/',
+    'aids': '/aids/',
+}
+
+# Expiration dans 23 heures pour forcer un renouvellement avant l'expiration réelle de 24h
+TOKEN_TTL = 23 * 60 * 60
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class HarvestError(Exception):
+    """Erreur définitive lors de la récupération d'une page"""
+
+
+class TokenBucket:
+    """Limiteur de débit : `rate` requêtes par seconde, rafales jusqu'à `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class AidesTerritoiresClient:
+    """Client HTTP partagé par tous les fils de téléchargement"""
+
+    def __init__(self, base_url=API_BASE, api_key=None, workers=8, rate=10,
+                 retries=5, backoff=0.5, timeout=30, cache=None):
+        self.base_url = base_url.rstrip('/')
+        self.cache = cache
+        self.api_key = api_key or os.environ.get('AIDES_TERRITOIRES_API_KEY')
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['Accept'] = 'application/json'
+
+        self._token = None
+        self._token_expiry = 0
+        self._token_lock = threading.Lock()
+
+        # Compteurs lus par --stats (cf. run_stats.py), partagés entre les fils
+        self.stats = dict.fromkeys(('requests', 'retries', 'token_refreshes', 'cache_hits',
+                                    'not_modified', 'bytes'), 0)
+        self.latencies = []
+        self._stats_lock = threading.Lock()
+
+    # --- Authentification ---
+
+    def get_token(self, force=False):
+        """Renvoie le bearer token, en le renouvelant via /connexion/ si nécessaire"""
+        with self._token_lock:
+            if not force and self._token and time.time() < self._token_expiry:
+                return self._token
+            if not self.api_key:
+                raise HarvestError("La clé API Aides-Territoires n'est pas configurée (AIDES_TERRITOIRES_API_KEY).")
+            response = self.session.post(f"{self.base_url}/connexion/",
+                                         headers={'X-AUTH-TOKEN': self.api_key},
+                                         timeout=self.timeout)
+            if not response.ok:
+                raise HarvestError(f"Impossible d'obtenir le token Aides-Territoires. Statut: {response.status_code}")
+            token = response.json().get('token')
+            if not token:
+                raise HarvestError("Réponse invalide de l'API de connexion Aides-Territoires.")
+            self._token = token
+            self._token_expiry = time.time() + TOKEN_TTL
+            return token
+
+    # --- Requêtes ---
+
+    def _count(self, name, value=1):
+        with self._stats_lock:
+            self.stats[name] += value
+
+    def stats_snapshot(self):
+        """Compteurs et latences par page (secondes, nouvelles tentatives comprises)"""
+        with self._stats_lock:
+            return {**self.stats, 'latencies': list(self.latencies)}
+
+    def url_for(self, endpoint):
+        path = ENDPOINTS.get(endpoint, endpoint)
+        if path.startswith('http'):
+            return path
+        return self.base_url + path
+
+    def page_url(self, endpoint, params, page):
+        """URL complète d'une page, conservée dans le journal comme curseur"""
+        request = requests.Request('GET', self.url_for(endpoint), params={**expand_params(params), 'page': page})
+        return request.prepare().url
+
+    def get(self, endpoint, params=None):
+        """GET avec cache, limitation de débit, nouvelles tentatives et renouvellement du token"""
+        started = time.perf_counter()
+        data = self._get(endpoint, params)
+        with self._stats_lock:
+            self.latencies.append(time.perf_counter() - started)
+        return data
+
+    def _get(self, endpoint, params):
+        url = self.url_for(endpoint)
+        entry = self.cache.lookup(url, params) if self.cache else None
+        if entry and (self.cache.cache_only or self.cache.is_fresh(entry)):
+            body = self.cache.read(entry)
+            if body is not None:
+                self._count('cache_hits')
+                return json.loads(body)
+            # Corps évincé depuis lookup() : la page est redemandée entièrement
+            entry = None
+        if self.cache and self.cache.cache_only:
+            raise HarvestError(f"{url}: absent du cache (mode hors ligne)")
+
+        token_refreshed = False
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            headers = {'Authorization': f"Bearer {self.get_token()}"}
+            if entry:
+                headers.update(self.cache.conditional_headers(entry))
+            self._count('requests')
+            try:
+                response = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.retries:
+                    raise HarvestError(f"{url}: {e}") from e
+                self._count('retries')
+                self._sleep(attempt)
+                attempt += 1
+                continue
+
+            if response.status_code == 401 and not token_refreshed:
+                # Token expiré côté serveur : on en redemande un une seule fois
+                self._count('token_refreshes')
+                self.get_token(force=True)
+                token_refreshed = True
+                continue
+            if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                self._count('retries')
+                self._sleep(attempt, response.headers.get('Retry-After'))
+                attempt += 1
+                continue
+            if response.status_code == 304 and entry:
+                body = self.cache.read(entry)
+                if body is None:
+                    # Corps évincé pendant la requête : on la refait sans en-têtes conditionnels
+                    entry = None
+                    continue
+                self._count('not_modified')
+                self.cache.revalidated(entry)
+                return json.loads(body)
+            if not response.ok:
+                raise HarvestError(f"{url}: statut {response.status_code}")
+            self._count('bytes', len(response.content))
+            if self.cache:
+                self.cache.store(url, params, response.content, response.headers)
+            return response.json()
+
+    def _sleep(self, attempt, retry_after=None):
+        delay = self.backoff * (2 ** attempt)
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        time.sleep(delay)
+
+    # --- Pagination ---
+
+    def iter_pages(self, endpoint, params=None, start_page=1):
+        """
+        Génère les pages dans l'ordre.
+        La première page donne "count" et la taille de page ; les suivantes sont
+        téléchargées en parallèle, avec au plus 2 x `workers` pages en avance.
+        """
+        params = expand_params(params)
+        first = self.get(endpoint, {**params, 'page': start_page})
+        yield start_page, first
+        if not first.get('next'):
+            return
+
+        page_size = len(first.get('results') or [])
+        count = first.get('count')
+        if not page_size or not isinstance(count, int):
+            # Pas de total exploitable : on suit les liens "next" un par un
+            page, data = start_page, first
+            while data.get('next'):
+                page += 1
+                data = self.get(data['next'])
+                yield page, data
+            return
+
+        last_page = math.ceil(count / page_size)
+        pages = iter(range(start_page + 1, last_page + 1))
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = deque()
+            for page in pages:
+                pending.append((page, executor.submit(self.get, endpoint, {**params, 'page': page})))
+                if len(pending) >= self.workers * 2:
+                    break
+            while pending:
+                page, future = pending.popleft()
+                yield page, future.result()
+                next_page = next(pages, None)
+                if next_page is not None:
+                    pending.append((next_page, executor.submit(self.get, endpoint, {**params, 'page': next_page})))
+
+    def iter_records(self, endpoint, params=None, journal_path=None):
+        """
+        Génère tous les résultats d'un endpoint paginé.
+        Avec `journal_path`, les pages déjà journalisées sont relues depuis le disque
+        et seules les pages manquantes sont téléchargées.
+        """
+        journal = PageJournal(journal_path, endpoint, params) if journal_path else None
+        start_page = 1
+        if journal:
+            pages = journal.load()
+            if pages:
+                print(f"♻️ Reprise depuis le journal : {len(pages)} page(s) déjà récupérée(s)")
+            for entry in pages:
+                yield from entry['records']
+            start_page = len(pages) + 1
+            if pages and not pages[-1]['has_next']:
+                return
+
+        for page, data in self.iter_pages(endpoint, params, start_page):
+            records = data.get('results') or []
+            print(f"📄 Page {page} : {len(records)} résultats")
+            if journal:
+                journal.append(page, self.page_url(endpoint, params, page), records, bool(data.get('next')))
+            yield from records
+
+    def fetch_all(self, endpoint, params=None, journal_path=None):
+        """Récupère tous les résultats d'un endpoint paginé"""
+        return list(self.iter_records(endpoint, params, journal_path))
+
+
+class PageJournal:
+    """
+    Journal NDJSON des pages reçues : une ligne d'en-tête (endpoint, paramètres)
+    puis une ligne par page {"page", "url", "has_next", "records"}, synchronisée
+    sur disque avant de passer à la suivante.
+    """
+
+    def __init__(self, path, endpoint, params=None):
+        self.path = path
+        self.header = {'endpoint': endpoint, 'params': expand_params(params)}
+
+    def load(self):
+        """Relit les pages validées ; une dernière ligne incomplète (crash) est tronquée"""
+        if not os.path.exists(self.path):
+            self._write_header()
+            return []
+        pages = []
+        valid_size = 0
+        with open(self.path, 'rb') as f:
+            for index, line in enumerate(f):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b'\n'):
+                    break
+                if index == 0:
+                    if entry != self.header:
+                        raise HarvestError(f"Le journal {self.path} correspond à une autre requête ({entry}).")
+                elif entry.get('page') != len(pages) + 1:
+                    break
+                else:
+                    pages.append(entry)
+                valid_size += len(line)
+        if valid_size == 0:
+            self._write_header()
+            return []
+        with open(self.path, 'r+b') as f:
+            f.truncate(valid_size)
+        return pages
+
+    def _write_header(self):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(self.header, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def append(self, page, url, records, has_next):
+        line = json.dumps({'page': page, 'url': url, 'has_next': has_next, 'records': records},
+                          ensure_ascii=False)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def expand_params(params):
+    """Les listes sont envoyées sous la forme key[]=a&key[]=b, comme côté backend"""
+    expanded = {}
+    for key, value in (params or {}).items():
+        if isinstance(value, (list, tuple)) and not key.endswith('[]'):
+            expanded[f"{key}[]"] = list(value)
+        else:
+            expanded[key] = value
+    return expanded
+
+
+def parse_param(text):
+    key, sep, value = text.partition('=')
+    if not sep:
+        raise argparse.ArgumentTypeError(f"paramètre attendu sous la forme clé=valeur : {text}")
+    return key, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Récupère toutes les pages d'un endpoint Aides-Territoires")
+    parser.add_argument('endpoint', choices=sorted(ENDPOINTS), help='Endpoint à moissonner')
+    parser.add_argument('-p', '--param', action='append', type=parse_param, default=[],
+                        help='Paramètre de requête clé=valeur (répétable)')
+    parser.add_argument('-o', '--output', help='Fichier JSON de sortie (défaut : <endpoint>.json)')
+    parser.add_argument('--base-url', default=API_BASE, help="URL de base de l'API")
+    parser.add_argument('--workers', type=int, default=8, help='Nombre de téléchargements simultanés')
+    parser.add_argument('--rate', type=float, default=10, help='Requêtes par seconde au maximum (0 = illimité)')
+    parser.add_argument('--retries', type=int, default=5, help='Nouvelles tentatives sur erreur 5xx/429')
+    parser.add_argument('--journal', help='Journal de reprise (défaut : <sortie>.journal)')
+    parser.add_argument('--fresh', action='store_true', help='Ignore un journal existant et repart de la page 1')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='Répertoire du cache HTTP')
+    parser.add_argument('--no-cache', action='store_true', help='Désactive le cache HTTP')
+    parser.add_argument('--cache-only', action='store_true', help="Hors ligne : n'utilise que le cache, sans requête réseau")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help='Taille maximale du cache en Mo')
+    parser.add_argument('--ttl', action='append', type=parse_param, default=[],
+                        help='Durée de vie en secondes pour un endpoint, ex. --ttl aids=3600 (répétable)')
+
+    args = parser.parse_args()
+
+    params = {}
+    for key, value in args.param:
+        # Une clé répétée devient une liste
+        if key in params:
+            params[key] = params[key] if isinstance(params[key], list) else [params[key]]
+            params[key].append(value)
+        else:
+            params[key] = value
+
+    output_file = args.output or f"{args.endpoint}.json"
+    journal_path = args.journal or f"{output_file}.journal"
+    if args.fresh and os.path.exists(journal_path):
+        os.remove(journal_path)
+    cache = None
+    if not args.no_cache:
+        cache = ResponseCache(args.cache_dir, args.cache_size * 1024 * 1024,
+                              {key: float(value) for key, value in args.ttl}, args.cache_only)
+    client = AidesTerritoiresClient(args.base_url, workers=args.workers, rate=args.rate,
+                                    retries=args.retries, cache=cache)
+
+    try:
+        print(f"🔄 Récupération de {client.url_for(args.endpoint)}...")
+        results = client.fetch_all(args.endpoint, params, journal_path)
+        with atomic_open(output_file) as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        PageJournal(journal_path, args.endpoint, params).remove()
+        print(f"✅ {len(results)} résultats sauvegardés sous {output_file}")
+    except HarvestError as e:
+        print(f"❌ Erreur: {e}")
+        print(f"💾 Les pages déjà reçues sont conservées dans {journal_path} ; relancez pour reprendre.")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
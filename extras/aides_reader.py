@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+Lecteur en flux des exports Aides-Territoires
+Produit les aides une par une, sans charger tout le fichier en mémoire.
+
+Formats supportés :
+- export classique {"count": ..., "results": [...]}
+- plusieurs pages collées les unes aux autres ({...}{...} ou une page par ligne)
+- NDJSON (une aide par ligne)
+- liste simple [...] ou listes de pages imbriquées [[...], [...]]
+
+En mode tolérant (par défaut), le lecteur récupère toutes les aides complètes
+d'un fichier tronqué ou corrompu (virgules finales, déchets injectés comme les
+"xxxxx" de aides-sample.json) en une seule passe, et note les zones ignorées
+sous forme d'intervalles d'octets (début, fin).
+"""
+
+import json
+import re
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = ' \t\n\r'
+VALUE_START = '{["-0123456789tfnNI'
+# Au-delà de cette taille, une valeur "incomplète" est considérée comme invalide
+MAX_VALUE_SIZE = 64 * 1024 * 1024
+
+_decoder = json.JSONDecoder()
+_stop_patterns = {}
+
+
+class TruncatedJSON(json.JSONDecodeError):
+    """Fin de fichier atteinte au milieu d'une valeur"""
+
+    start = None
+    recorded = False
+
+
+def _stop_pattern(stops):
+    pattern = _stop_patterns.get(stops)
+    if pattern is None:
+        pattern = _stop_patterns[stops] = re.compile('[' + re.escape(stops) + ']')
+    return pattern
+
+
+def _is_incomplete(error, buf):
+    """Distingue une valeur coupée par la fin du bloc d'une vraie erreur de syntaxe"""
+    if len(buf) - error.pos > MAX_VALUE_SIZE:
+        return False
+    return error.msg.startswith('Unterminated string') or len(buf) - error.pos <= 16
+
+
+class StreamBuffer:
+    """Fenêtre glissante sur un flux texte, rechargée par blocs"""
+
+    def __init__(self, stream, chunk_size=CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.offset = 0  # position absolue (en caractères) de buf[0]
+        self.eof = False
+        # Curseur de conversion caractères -> octets, avancé de façon incrémentale
+        self._byte_char = 0
+        self._byte_pos = 0
+
+    def fill(self, size=None):
+        """Lit un bloc supplémentaire ; renvoie False en fin de flux"""
+        if self.eof:
+            return False
+        # Libère la partie déjà consommée pour garder une mémoire constante
+        if self.pos > len(self.buf) // 2:
+            self.byte_at(self.offset + self.pos)
+            self.offset += self.pos
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        chunk = self.stream.read(size or self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf += chunk
+        return True
+
+    def tell(self):
+        return self.offset + self.pos
+
+    def byte_at(self, char_pos):
+        """
+        Position en octets (UTF-8) d'une position absolue en caractères.
+        Les appels doivent être croissants : chaque caractère n'est encodé qu'une fois.
+        """
+        if char_pos > self._byte_char:
+            start = self._byte_char - self.offset
+            self._byte_pos += len(self.buf[start:char_pos - self.offset].encode('utf-8', 'surrogateescape'))
+            self._byte_char = char_pos
+        return self._byte_pos
+
+    def byte_end(self):
+        """Position en octets de la fin des données lues"""
+        return self.byte_at(self.offset + len(self.buf))
+
+    def skip_ws(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf) or not self.fill():
+                return
+
+    def peek(self):
+        """Premier caractère non blanc, ou '' en fin de flux"""
+        self.skip_ws()
+        if self.pos < len(self.buf):
+            return self.buf[self.pos]
+        return ''
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            error = TruncatedJSON if not found else json.JSONDecodeError
+            raise error(f"'{char}' attendu", self.buf, self.pos)
+        self.pos += 1
+
+    def decode(self):
+        """Décode une valeur JSON complète à la position courante"""
+        self.skip_ws()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                if not _is_incomplete(e, self.buf):
+                    raise
+                # Valeur coupée par la fin du bloc : on double la fenêtre
+                # pour que le coût total reste linéaire
+                if not self.fill(max(self.chunk_size, len(self.buf) - self.pos)):
+                    # Fin de fichier : seule une erreur en bout de données est une troncature,
+                    # les autres ("[1,2,]" près de la fin) relèvent de l'analyseur tolérant
+                    if self.buf[e.pos:].strip() and not e.msg.startswith('Unterminated string'):
+                        raise
+                    raise TruncatedJSON(e.msg, e.doc, e.pos) from None
+                continue
+            # Un nombre peut être coupé en fin de bloc ("12" puis "34")
+            if end == len(self.buf) and not self.eof and self.buf[self.pos] not in '{["':
+                if self.fill():
+                    continue
+            self.pos = end
+            return value
+
+    def skip_until(self, stops):
+        """Avance jusqu'au prochain caractère de `stops` (au moins un caractère sauté)"""
+        pattern = _stop_pattern(stops)
+        search_from = self.pos + 1
+        while True:
+            match = pattern.search(self.buf, search_from)
+            if match:
+                self.pos = match.start()
+                return
+            # Tout le bloc est sauté : on le consomme avant d'en lire un autre
+            self.pos = len(self.buf)
+            if not self.fill():
+                raise TruncatedJSON('fin de fichier dans une zone corrompue', self.buf, self.pos)
+            search_from = self.pos
+
+
+class _Garbage(Exception):
+    """Caractère inattendu là où une valeur était attendue"""
+
+
+class AidStreamParser:
+    """Parcourt un flux JSON et produit les aides qu'il contient"""
+
+    def __init__(self, stream, meta=None, tolerant=True, chunk_size=CHUNK_SIZE):
+        self.reader = StreamBuffer(stream, chunk_size)
+        self.meta = meta if meta is not None else {}
+        self.tolerant = tolerant
+        self.skipped = self.meta.setdefault('skipped', [])
+
+    # --- Signalement des zones ignorées ---
+
+    def _record(self, start, end):
+        if end > start:
+            self.skipped.append((start, end))
+
+    def _recover(self, message, stops):
+        """Saute une zone corrompue, ou lève une erreur en mode strict"""
+        reader = self.reader
+        if not self.tolerant:
+            raise json.JSONDecodeError(message, reader.buf, reader.pos)
+        start = reader.byte_at(reader.tell())
+        try:
+            reader.skip_until(stops)
+        except TruncatedJSON as e:
+            e.start = start
+            raise
+        self._record(start, reader.byte_at(reader.tell()))
+
+    # --- Niveau supérieur : pages, listes, NDJSON ---
+
+    def __iter__(self):
+        reader = self.reader
+        while True:
+            try:
+                char = reader.peek()
+                if not char:
+                    return
+                if char == '{':
+                    yield from self._iter_object()
+                elif char == '[':
+                    yield from self._iter_array()
+                else:
+                    self._recover('objet ou liste attendu', '{[')
+            except TruncatedJSON as e:
+                if not self.tolerant:
+                    raise
+                if not e.recorded:
+                    start = e.start if e.start is not None else reader.byte_at(reader.tell())
+                    self._record(start, reader.byte_end())
+                return
+
+    def _iter_array(self):
+        reader = self.reader
+        reader.expect('[')
+        expect_value = True
+        after_comma = False
+        while True:
+            char = reader.peek()
+            if char == ']':
+                if after_comma and not self.tolerant:
+                    raise json.JSONDecodeError('virgule finale', reader.buf, reader.pos)
+                reader.pos += 1
+                return
+            if not char:
+                raise TruncatedJSON("']' attendu", reader.buf, reader.pos)
+            if not expect_value:
+                if char == ',':
+                    reader.pos += 1
+                    expect_value = after_comma = True
+                elif char in '{[' and self.tolerant:
+                    # Virgule manquante entre deux éléments : rien à sauter
+                    expect_value = True
+                    after_comma = False
+                else:
+                    self._recover("',' ou ']' attendu", ',]{[')
+                    expect_value = reader.buf[reader.pos] in '{['
+                continue
+            if char == ',':
+                self._recover('valeur attendue', ']{["')
+                continue
+            if char == '{':
+                yield from self._iter_element()
+            elif char == '[':
+                yield from self._iter_array()
+            elif char in VALUE_START:
+                # Valeur scalaire égarée : ignorée
+                try:
+                    reader.decode()
+                except TruncatedJSON:
+                    raise
+                except json.JSONDecodeError:
+                    if not self.tolerant:
+                        raise
+                    self._recover('valeur invalide', ',]{[')
+                    continue
+            else:
+                self._recover('valeur attendue', ',]{[')
+                continue
+            expect_value = after_comma = False
+
+    def _iter_element(self):
+        """Élément d'une liste : une aide, ou une page rangée dans une liste"""
+        reader = self.reader
+        try:
+            value = reader.decode()
+        except TruncatedJSON as e:
+            e.start = reader.byte_at(reader.tell())
+            raise
+        except json.JSONDecodeError:
+            if not self.tolerant:
+                raise
+            value = self._tolerant_aid()
+        if isinstance(value, dict) and isinstance(value.get('results'), list):
+            self._count_page(value)
+            for aid in value['results']:
+                if isinstance(aid, dict):
+                    yield aid
+        elif isinstance(value, dict):
+            yield value
+
+    def _tolerant_aid(self):
+        """Relit une aide corrompue avec l'analyseur tolérant"""
+        reader = self.reader
+        start = reader.byte_at(reader.tell())
+        try:
+            return self._tolerant_value()
+        except TruncatedJSON as e:
+            # L'aide entière est perdue, pas seulement la zone où le fichier s'arrête
+            self.skipped[:] = [zone for zone in self.skipped if zone[0] < start]
+            self._record(start, reader.byte_end())
+            e.recorded = True
+            raise
+
+    def _iter_object(self):
+        """Objet de premier niveau : une page (clé "results") ou directement une aide"""
+        reader = self.reader
+        reader.expect('{')
+        fields = {}
+        is_page = False
+        while True:
+            char = reader.peek()
+            if char == '}':
+                reader.pos += 1
+                break
+            if not char:
+                raise TruncatedJSON("'}' attendu", reader.buf, reader.pos)
+            if char == ',' and fields:
+                reader.pos += 1
+                continue
+            if char != '"':
+                self._recover('clé attendue', ',}"')
+                continue
+            try:
+                key = reader.decode()
+            except TruncatedJSON:
+                raise
+            except json.JSONDecodeError:
+                if not self.tolerant:
+                    raise
+                self._recover('clé invalide', ',}')
+                continue
+            if reader.peek() != ':':
+                self._recover("':' attendu", ':,}"')
+                if reader.buf[reader.pos] != ':':
+                    continue
+            reader.pos += 1
+            if key == 'results' and reader.peek() == '[':
+                is_page = True
+                yield from self._iter_array()
+            else:
+                try:
+                    fields[key] = self._value()
+                except _Garbage:
+                    self._recover('valeur attendue', ',}')
+                    continue
+            char = reader.peek()
+            if char == ',':
+                reader.pos += 1
+                if not self.tolerant and reader.peek() == '}':
+                    raise json.JSONDecodeError('virgule finale', reader.buf, reader.pos)
+            elif char != '}' and (char != '"' or not self.tolerant):
+                self._recover("',' ou '}' attendu", ',}"')
+        if is_page:
+            self._count_page(fields)
+        else:
+            yield fields
+
+    def _count_page(self, page):
+        self.meta['pages'] = self.meta.get('pages', 0) + 1
+        if isinstance(page.get('count'), int):
+            self.meta['count'] = self.meta.get('count', 0) + page['count']
+
+    # --- Analyseur tolérant, utilisé seulement sur les valeurs corrompues ---
+
+    def _value(self):
+        reader = self.reader
+        char = reader.peek()
+        if not char:
+            raise TruncatedJSON('valeur attendue', reader.buf, reader.pos)
+        if not self.tolerant:
+            return reader.decode()
+        if char not in VALUE_START:
+            raise _Garbage(char)
+        try:
+            return reader.decode()
+        except TruncatedJSON:
+            raise
+        except json.JSONDecodeError:
+            return self._tolerant_value()
+
+    def _tolerant_value(self):
+        reader = self.reader
+        char = reader.peek()
+        if not char:
+            raise TruncatedJSON('valeur attendue', reader.buf, reader.pos)
+        if char == '{':
+            return self._tolerant_object()
+        if char == '[':
+            return self._tolerant_array()
+        if char not in VALUE_START:
+            raise _Garbage(char)
+        try:
+            return reader.decode()
+        except TruncatedJSON:
+            raise
+        except json.JSONDecodeError:
+            raise _Garbage(char) from None
+
+    def _tolerant_object(self):
+        reader = self.reader
+        reader.expect('{')
+        obj = {}
+        while True:
+            char = reader.peek()
+            if char == '}':
+                reader.pos += 1
+                return obj
+            if not char:
+                raise TruncatedJSON("'}' attendu", reader.buf, reader.pos)
+            if char == ',':
+                reader.pos += 1
+                continue
+            if char != '"':
+                self._recover('clé attendue', ',}"')
+                continue
+            try:
+                key = reader.decode()
+            except TruncatedJSON:
+                raise
+            except json.JSONDecodeError:
+                self._recover('clé invalide', ',}')
+                continue
+            if reader.peek() != ':':
+                self._recover("':' attendu", ':,}"')
+                if reader.buf[reader.pos] != ':':
+                    continue
+            reader.pos += 1
+            try:
+                obj[key] = self._tolerant_value()
+            except _Garbage:
+                self._recover('valeur attendue', ',}')
+                continue
+            if reader.peek() not in ',}"':
+                self._recover("',' ou '}' attendu", ',}"')
+
+    def _tolerant_array(self):
+        reader = self.reader
+        reader.expect('[')
+        items = []
+        while True:
+            char = reader.peek()
+            if char == ']':
+                reader.pos += 1
+                return items
+            if not char:
+                raise TruncatedJSON("']' attendu", reader.buf, reader.pos)
+            if char == ',':
+                reader.pos += 1
+                continue
+            try:
+                items.append(self._tolerant_value())
+            except _Garbage:
+                self._recover('valeur attendue', ',]{["')
+                continue
+            if reader.peek() not in ',]':
+                self._recover("',' ou ']' attendu", ',]{["')
+
+
+def iter_aids_from_stream(stream, meta=None, chunk_size=CHUNK_SIZE, tolerant=True):
+    """
+    Génère les aides contenues dans un flux texte.
+    Si `meta` est fourni, il reçoit le nombre de pages, le total annoncé ("count")
+    et la liste des zones ignorées ("skipped", intervalles d'octets).
+    """
+    return iter(AidStreamParser(stream, meta, tolerant, chunk_size))
+
+
+def iter_aids(filepath, meta=None, chunk_size=CHUNK_SIZE, tolerant=True):
+    """Génère les aides d'un fichier une par une"""
+    # newline='' et surrogateescape : les positions en octets restent exactes
+    with open(filepath, 'r', encoding='utf-8', errors='surrogateescape', newline='') as f:
+        yield from iter_aids_from_stream(f, meta, chunk_size, tolerant)
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Écriture atomique de fichiers
+Le contenu est écrit dans un fichier temporaire du même répertoire, puis renommé
+d'un coup : un crash ne laisse jamais de fichier de sortie à moitié écrit.
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+
+
+def _default_mode():
+    # mkstemp crée le fichier en 0600 : on rétablit les droits habituels
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+@contextmanager
+def atomic_open(path, mode='w', encoding='utf-8', newline=None, buffering=-1):
+    """
+    Ouvre un fichier temporaire à la place de `path` ; il remplace `path`
+    seulement si le bloc `with` se termine sans erreur.
+    """
+    path = os.fspath(path)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix='.tmp', dir=directory)
+    binary = 'b' in mode
+    try:
+        with os.fdopen(fd, mode, buffering, encoding=None if binary else encoding,
+                       newline=None if binary else newline) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, _default_mode())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
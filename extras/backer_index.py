@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Index hors ligne des porteurs d'aides (financeurs) et de leurs groupes
+Les aides ne portent que le nom de leurs financeurs ; cet index les relie
+à l'identifiant du porteur et à son groupe sans appel à /api/backers/.
+
+Construction à partir des exports :
+- all_backers.json : pages de porteurs imbriquées ([[{...}, ...], [...]])
+- backer_groups.csv (ou all_group_backers.json) : id et nom des groupes
+
+Les noms sont normalisés (minuscules, sans accents ni ponctuation, cf.
+perimeter_index.normalize) : "Ademe — Direction régionale — Corse" et
+"ADEME - Direction regionale - Corse" désignent le même porteur. Sont aussi
+reconnus le slug, l'identifiant, le sigle entre parenthèses ("MIQCP") et le
+nom des groupes, suffixe " - GENERIQUE" compris ("ADEME - GENERIQUE" -> ADEME).
+
+Exemple :
+    python backer_index.py build                      # -> backers_index.json
+    python backer_index.py resolve "ADEME - GENERIQUE"
+"""
+
+import argparse
+import csv
+import json
+import re
+import sys
+from collections import namedtuple
+
+from aides_reader import iter_aids
+from atomic_files import atomic_open
+from perimeter_index import normalize
+
+DEFAULT_INDEX = 'backers_index.json'
+GENERIC_SUFFIX = ' generique'
+_ACRONYM_RE = re.compile(r'\(([^()]{2,12})\)\s*$')
+
+Backer = namedtuple('Backer', ['backer_id', 'slug_id', 'name', 'group_id', 'group_name'])
+
+
+def _numeric_id(value):
+    """'22-ademe' -> 22 ; 22 -> 22"""
+    if isinstance(value, int):
+        return value
+    head = str(value or '').split('-', 1)[0]
+    return int(head) if head.isdigit() else None
+
+
+def load_backers(filepath):
+    """Porteurs à plat, quel que soit le découpage en pages de l'export"""
+    return list(iter_aids(filepath))
+
+
+def load_groups(filepath):
+    """{id de groupe: nom} depuis backer_groups.csv ou un export JSON des groupes"""
+    if filepath.endswith('.csv'):
+        with open(filepath, encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+    else:
+        rows = list(iter_aids(filepath))
+    return {int(row['id']): row['name'] for row in rows if str(row.get('id') or '').isdigit()}
+
+
+def build_index(backers, groups=None):
+    """
+    Construit l'index sérialisable :
+        backers : {id: [slug-id, nom, id de groupe]}
+        groups  : {id: nom}
+        names   : {nom normalisé: [id de porteur ou None, id de groupe]}
+    En cas d'homonymes, le porteur de plus petit identifiant l'emporte.
+    """
+    groups = dict(groups or {})
+    entries = {}
+    for backer in backers:
+        backer_id = _numeric_id(backer.get('id'))
+        if backer_id is None:
+            continue
+        group = backer.get('group') or {}
+        group_id = group.get('id')
+        if group_id is not None:
+            groups.setdefault(group_id, group.get('name'))
+        entries[backer_id] = [str(backer.get('id')), backer.get('text') or backer.get('name'), group_id]
+
+    names = {}
+    ambiguous = 0
+
+    def add(key, value):
+        if key and key not in names:
+            names[key] = value
+
+    for backer_id in sorted(entries):
+        slug_id, name, group_id = entries[backer_id]
+        key = normalize(name)
+        if key in names:
+            ambiguous += 1
+        add(key, [backer_id, group_id])
+    # Alias, seulement s'ils ne masquent pas un nom de porteur
+    for backer_id in sorted(entries):
+        slug_id, name, group_id = entries[backer_id]
+        add(normalize(slug_id.split('-', 1)[-1]), [backer_id, group_id])
+        acronym = _ACRONYM_RE.search(name or '')
+        if acronym:
+            add(normalize(acronym.group(1)), [backer_id, group_id])
+    for group_id, group_name in sorted(groups.items()):
+        key = normalize(group_name)
+        base = key[:-len(GENERIC_SUFFIX)] if key.endswith(GENERIC_SUFFIX) else key
+        backer = names.get(base)
+        # "ADEME - GENERIQUE" désigne le porteur générique du groupe s'il existe
+        add(key, backer if backer and backer[1] == group_id else [None, group_id])
+
+    return {
+        'backers': {str(backer_id): entry for backer_id, entry in sorted(entries.items())},
+        'groups': {str(group_id): name for group_id, name in sorted(groups.items())},
+        'names': names,
+        'ambiguous': ambiguous,
+    }
+
+
+def write_index(index, path=DEFAULT_INDEX):
+    with atomic_open(path) as f:
+        json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+
+
+class BackerIndex:
+    """Résolution nom ou identifiant -> porteur et groupe, en O(1)"""
+
+    def __init__(self, index):
+        self.backers = {int(backer_id): entry for backer_id, entry in index['backers'].items()}
+        self.groups = {int(group_id): name for group_id, name in index['groups'].items()}
+        self.names = index['names']
+        self._memo = {}
+
+    @classmethod
+    def load(cls, path=DEFAULT_INDEX):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    @classmethod
+    def from_exports(cls, backers_file, groups_file=None):
+        groups = load_groups(groups_file) if groups_file else None
+        return cls(build_index(load_backers(backers_file), groups))
+
+    def _backer(self, backer_id, group_id=None):
+        entry = self.backers.get(backer_id)
+        if entry is None:
+            return Backer(None, None, None, group_id, self.groups.get(group_id))
+        slug_id, name, group_id = entry
+        return Backer(backer_id, slug_id, name, group_id, self.groups.get(group_id))
+
+    def by_id(self, backer_id):
+        """Porteur par identifiant numérique ou slug-id, ou None"""
+        backer_id = _numeric_id(backer_id)
+        return self._backer(backer_id) if backer_id in self.backers else None
+
+    def resolve(self, name):
+        """Porteur (ou seulement groupe, backer_id à None) désigné par un nom, ou None"""
+        if name in self._memo:
+            return self._memo[name]
+        found = self.names.get(normalize(name))
+        backer = self._backer(*found) if found else None
+        self._memo[name] = backer
+        return backer
+
+    def enrich(self, aid):
+        """
+        Ajoute à l'aide les listes financer_backer_ids et financer_group_ids,
+        alignées sur `financers` ('' si le financeur est inconnu).
+        Les identifiants de financers_full sont utilisés quand ils sont présents.
+        """
+        full = aid.get('financers_full') or []
+        backer_ids = []
+        group_ids = []
+        for position, financer in enumerate(aid.get('financers') or []):
+            backer = None
+            if position < len(full) and isinstance(full[position], dict):
+                backer = self.by_id(full[position].get('id'))
+            if backer is None:
+                backer = self.resolve(financer.get('name') if isinstance(financer, dict) else financer)
+            backer_ids.append('' if backer is None or backer.backer_id is None else str(backer.backer_id))
+            group_ids.append('' if backer is None or backer.group_id is None else str(backer.group_id))
+        aid['financer_backer_ids'] = backer_ids
+        aid['financer_group_ids'] = group_ids
+        return aid
+
+    def enrich_all(self, aids):
+        for aid in aids:
+            yield self.enrich(aid)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Construit ou interroge l'index des porteurs d'aides")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build = subparsers.add_parser('build', help="Construit l'index depuis les exports des porteurs et des groupes")
+    build.add_argument('--backers', default='all_backers.json', help='Export des porteurs (défaut : all_backers.json)')
+    build.add_argument('--groups', default='backer_groups.csv', help='Export des groupes (défaut : backer_groups.csv)')
+    build.add_argument('-o', '--output', default=DEFAULT_INDEX, help=f"Fichier d'index (défaut : {DEFAULT_INDEX})")
+
+    resolve = subparsers.add_parser('resolve', help='Résout des noms de financeurs')
+    resolve.add_argument('names', nargs='+')
+    resolve.add_argument('--index', default=DEFAULT_INDEX, help=f"Fichier d'index (défaut : {DEFAULT_INDEX})")
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'build':
+            index = build_index(load_backers(args.backers), load_groups(args.groups))
+            write_index(index, args.output)
+            print(f"✅ {len(index['backers'])} porteurs, {len(index['groups'])} groupes, "
+                  f"{len(index['names'])} noms indexés dans {args.output}")
+            if index['ambiguous']:
+                print(f"⚠️ {index['ambiguous']} nom(s) partagé(s) par plusieurs porteurs : le plus ancien est retenu")
+            return
+
+        index = BackerIndex.load(args.index)
+        unresolved = 0
+        for name in args.names:
+            backer = index.resolve(name)
+            if backer is None:
+                unresolved += 1
+                print(f"❌ {name} : inconnu")
+            else:
+                print(f"✅ {name} : porteur {backer.backer_id} ({backer.name}), groupe {backer.group_id} ({backer.group_name})")
+        if unresolved:
+            sys.exit(1)
+    except FileNotFoundError as e:
+        print(f"❌ Erreur: Fichier non trouvé: {e.filename}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Mesures de performance des scripts d'extras, sur données synthétiques (cf. synthetic_data.py)
+
+Étapes mesurées, de 1k à 1M aides :
+    parse_json_file              lecture tolérante d'un export propre (json_to_csv_converter)
+    parse_multiple_json_objects  pages de l'API collées, en mémoire
+    fix_json                     export abîmé (virgules finales, déchets, fin tronquée), en mémoire
+    clean_html                   nettoyage des descriptions et conditions d'éligibilité
+    convert_to_csv               JSON -> CSV nettoyé, en flux (json_to_csv_converter)
+    convert_to_csv_list          idem, aides déjà chargées en liste
+    convert_to_csv_dict          idem, réponse {"count", "results"} déjà chargée
+    convert_json_to_csv          JSON -> CSV brut (convert_aides_to_csv)
+    fetch_all_adhoc_perimeters   moissonnage d'une API paginée locale, avec erreurs 503
+
+Pour chaque étape : débit (enregistrements/s, Mo/s), latences p50/p95/p99 (par appel
+pour clean_html, par requête pour le moissonnage, par exécution sinon) et pic de mémoire
+résidente. Chaque exécution tourne dans un processus neuf : les pics ne se cumulent
+pas d'une étape à l'autre et aucun mémo n'est partagé.
+
+Les résultats sont comparés à la référence benchmark_baseline.json, livrée à côté de
+ce script et produite avec la graine par défaut (--save-baseline pour la remplacer) :
+un débit plus faible, une latence p95 ou une mémoire plus élevées au-delà de la
+tolérance font échouer la commande (code de sortie 1), de même qu'une référence
+absente ou sans aucune mesure comparable.
+
+Exemple :
+    python benchmark.py --sizes 1k,10k --save-baseline
+    python benchmark.py --sizes 1k,10k                  # échoue en cas de régression
+    python benchmark.py --sizes 100k --stages convert_to_csv,clean_html --repeat 3
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from atomic_files import atomic_open
+from run_stats import peak_rss_mb, percentiles
+from synthetic_data import SEED, StubApi, SyntheticData, write_aids
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+DEFAULT_WORKDIR = 'bench_data'
+DEFAULT_SIZES = '1k,10k'
+DEFAULT_TOLERANCE = 0.25
+BASELINE_VERSION = 1
+API_PAGE_SIZE = 100
+# Indicateur -> sens de l'amélioration
+METRICS = {'records_per_s': 'higher', 'p95_ms': 'lower', 'peak_rss_mb': 'lower'}
+
+
+def parse_size(text):
+    """'10k' -> 10000, '1m' -> 1000000"""
+    text = text.strip().lower()
+    factor = {'k': 1000, 'm': 1000000}.get(text[-1:], 1)
+    return int(float(text.rstrip('km')) * factor)
+
+
+def format_size(size):
+    if size >= 1000000 and size % 1000000 == 0:
+        return f"{size // 1000000}m"
+    if size >= 1000 and size % 1000 == 0:
+        return f"{size // 1000}k"
+    return str(size)
+
+
+# --- Étapes : préparation hors chronomètre, puis une fonction mesurée ---
+# Chaque étape renvoie (fonction, octets lus) ; la fonction renvoie
+# (enregistrements traités, latences unitaires ou None, compteurs supplémentaires)
+
+def _read(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+@contextlib.contextmanager
+def _stage_parse_json_file(files, size, options):
+    from json_to_csv_converter import parse_json_file
+
+    def run():
+        data = parse_json_file(files['clean'])
+        return len(data['results']), None, {}
+    yield run, os.path.getsize(files['clean'])
+
+
+@contextlib.contextmanager
+def _stage_parse_multiple_json_objects(files, size, options):
+    from json_to_csv_converter import parse_multiple_json_objects
+    content = _read(files['pages'])
+
+    def run():
+        data = parse_multiple_json_objects(content)
+        return len(data['results']), None, {}
+    yield run, os.path.getsize(files['pages'])
+
+
+@contextlib.contextmanager
+def _stage_fix_json(files, size, options):
+    from json_to_csv_converter import fix_json
+    content = _read(files['corrupted'])
+
+    def run():
+        data = fix_json(content)
+        return len(data['results']), None, {'recovered': len(data['results']), 'skipped_zones': len(data['skipped'])}
+    yield run, os.path.getsize(files['corrupted'])
+
+
+@contextlib.contextmanager
+def _stage_clean_html(files, size, options):
+    from html_cleaner import clean_html
+    texts = []
+    for aid in SyntheticData(options['seed']).aids(size):
+        texts.append(aid['description'])
+        texts.append(aid['eligibility'])
+
+    def run():
+        latencies = []
+        clock = time.perf_counter
+        for text in texts:
+            started = clock()
+            clean_html(text)
+            latencies.append(clock() - started)
+        return len(texts), latencies, {}
+    yield run, sum(len(text.encode('utf-8')) for text in texts)
+
+
+@contextlib.contextmanager
+def _stage_convert_to_csv(files, size, options):
+    from aides_reader import iter_aids
+    from json_to_csv_converter import convert_to_csv
+    output = os.path.join(options['workdir'], 'convert_to_csv.csv')
+
+    def run():
+        meta = {}
+        convert_to_csv(iter_aids(files['clean'], meta), output, meta)
+        return size, None, {'bytes_written': os.path.getsize(output)}
+    yield run, os.path.getsize(files['clean'])
+    os.remove(output)
+
+
+def _convert_loaded(files, size, options, name, shape):
+    """convert_to_csv sur des aides déjà en mémoire (liste ou dictionnaire de l'API)"""
+    from json_to_csv_converter import convert_to_csv
+    with open(files['clean'], encoding='utf-8') as f:
+        data = json.load(f)
+    output = os.path.join(options['workdir'], f"{name}.csv")
+
+    def run():
+        convert_to_csv(shape(data), output)
+        return size, None, {'bytes_written': os.path.getsize(output)}
+    return run, output
+
+
+@contextlib.contextmanager
+def _stage_convert_to_csv_list(files, size, options):
+    run, output = _convert_loaded(files, size, options, 'convert_to_csv_list', lambda data: data['results'])
+    yield run, os.path.getsize(files['clean'])
+    os.remove(output)
+
+
+@contextlib.contextmanager
+def _stage_convert_to_csv_dict(files, size, options):
+    run, output = _convert_loaded(files, size, options, 'convert_to_csv_dict', lambda data: data)
+    yield run, os.path.getsize(files['clean'])
+    os.remove(output)
+
+
+@contextlib.contextmanager
+def _stage_convert_json_to_csv(files, size, options):
+    from convert_aides_to_csv import convert_json_to_csv
+    output = os.path.join(options['workdir'], 'convert_json_to_csv.csv')
+
+    def run():
+        convert_json_to_csv(files['clean'], output)
+        return size, None, {'bytes_written': os.path.getsize(output)}
+    yield run, os.path.getsize(files['clean'])
+    os.remove(output)
+
+
+@contextlib.contextmanager
+def _stage_fetch_all_adhoc_perimeters(files, size, options):
+    from aides_harvester import AidesTerritoiresClient
+    from fetch_perimeters import fetch_all_adhoc_perimeters
+    perimeters = SyntheticData(options['seed']).perimeters(size)
+    with StubApi({'perimeters': perimeters}, API_PAGE_SIZE, options['failure_rate'], seed=options['seed']) as api:
+        client = AidesTerritoiresClient(api.base_url, api_key='benchmark', rate=0, backoff=0)
+
+        def run():
+            records = fetch_all_adhoc_perimeters(client, journal_path=None)
+            snapshot = client.stats_snapshot()
+            return len(records), snapshot['latencies'], {'requests': snapshot['requests'], 'retries': snapshot['retries']}
+        yield run, 0
+
+
+STAGES = {
+    'parse_json_file': _stage_parse_json_file,
+    'parse_multiple_json_objects': _stage_parse_multiple_json_objects,
+    'fix_json': _stage_fix_json,
+    'clean_html': _stage_clean_html,
+    'convert_to_csv': _stage_convert_to_csv,
+    'convert_to_csv_list': _stage_convert_to_csv_list,
+    'convert_to_csv_dict': _stage_convert_to_csv_dict,
+    'convert_json_to_csv': _stage_convert_json_to_csv,
+    'fetch_all_adhoc_perimeters': _stage_fetch_all_adhoc_perimeters,
+}
+
+
+def _run_stage(stage, files, size, options):
+    """Exécuté dans un processus neuf : une mesure d'une étape"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        with STAGES[stage](files, size, options) as (run, bytes_read):
+            started = time.perf_counter()
+            records, latencies, extra = run()
+            seconds = time.perf_counter() - started
+    return {'seconds': seconds, 'records': records, 'bytes_read': bytes_read,
+            'latencies': percentiles(latencies) if latencies else None,
+            'peak_rss_mb': peak_rss_mb(), 'extra': extra}
+
+
+def measure(stage, files, size, options, repeat=1):
+    """Mesure une étape `repeat` fois (médianes) ; un processus par exécution"""
+    runs = []
+    context = multiprocessing.get_context('spawn')
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            runs.append(executor.submit(_run_stage, stage, files, size, options).result())
+    seconds = statistics.median(run['seconds'] for run in runs)
+    records = runs[0]['records']
+    if runs[0]['latencies']:
+        latencies = {key: statistics.median(run['latencies'][key] for run in runs) for key in runs[0]['latencies']}
+    else:
+        latencies = percentiles([run['seconds'] for run in runs])
+    peaks = [run['peak_rss_mb'] for run in runs if run['peak_rss_mb'] is not None]
+    return {
+        'stage': stage,
+        'size': size,
+        'records': records,
+        'seconds': round(seconds, 4),
+        'records_per_s': round(records / seconds, 1) if seconds else None,
+        'mb_per_s': round(runs[0]['bytes_read'] / 1e6 / seconds, 2) if runs[0]['bytes_read'] and seconds else None,
+        **latencies,
+        'peak_rss_mb': max(peaks) if peaks else None,
+        **runs[-1]['extra'],
+    }
+
+
+def prepare_files(workdir, size, seed):
+    """Fichiers d'aides de la taille demandée, générés une fois puis réutilisés"""
+    os.makedirs(workdir, exist_ok=True)
+    files = {}
+    for variant in ('clean', 'pages', 'corrupted'):
+        path = os.path.join(workdir, f"aides-{format_size(size)}-{seed}-{variant}.json")
+        if not os.path.exists(path):
+            print(f"🔄 Génération de {path}...")
+            write_aids(path, size, seed, variant)
+        files[variant] = path
+    return files
+
+
+# --- Référence ---
+
+def _key(result):
+    return f"{result['stage']}@{format_size(result['size'])}"
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('version') != BASELINE_VERSION:
+        raise Exception(f"Référence {path} : version {baseline.get('version')} non prise en charge")
+    return baseline['results']
+
+
+def save_baseline(path, results):
+    with atomic_open(path) as f:
+        json.dump({'version': BASELINE_VERSION, 'python': sys.version.split()[0], 'platform': sys.platform,
+                   'results': {_key(result): {metric: result[metric] for metric in METRICS}
+                               for result in results}}, f, indent=2)
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Régressions par rapport à la référence : liste de (clé, indicateur, référence, mesure),
+    et clés mesurées absentes de la référence
+    """
+    regressions = []
+    missing = []
+    for result in results:
+        reference = baseline.get(_key(result))
+        if not reference:
+            missing.append(_key(result))
+            continue
+        for metric, better in METRICS.items():
+            before, after = reference.get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+            if better == 'higher' and after < before * (1 - tolerance):
+                regressions.append((_key(result), metric, before, after))
+            elif better == 'lower' and after > before * (1 + tolerance):
+                regressions.append((_key(result), metric, before, after))
+    return regressions, missing
+
+
+def _print_result(result):
+    rate = f"{result['records_per_s']:>10.0f}/s" if result['records_per_s'] else f"{'-':>12}"
+    throughput = f"{result['mb_per_s']:>7.1f} Mo/s" if result['mb_per_s'] else f"{'':>12}"
+    latency = (f"p50 {result['p50_ms']:.3g} ms  p95 {result['p95_ms']:.3g} ms  p99 {result['p99_ms']:.3g} ms"
+               if result['p95_ms'] is not None else '')
+    memory = f"{result['peak_rss_mb']:>7.1f} Mo" if result['peak_rss_mb'] is not None else ''
+    print(f"   {result['stage']:<28} {format_size(result['size']):>5} {rate} {throughput} {memory}  {latency}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mesure les performances des scripts sur données synthétiques')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f'Nombres d\'aides, ex. 1k,10k,100k,1m (défaut : {DEFAULT_SIZES})')
+    parser.add_argument('--stages', help=f"Étapes, séparées par des virgules (défaut : toutes) : {', '.join(STAGES)}")
+    parser.add_argument('--repeat', type=int, default=1, help='Exécutions par étape, médiane retenue (défaut : 1)')
+    parser.add_argument('--seed', type=int, default=SEED, help=f'Graine des données (défaut : {SEED})')
+    parser.add_argument('--workdir', default=DEFAULT_WORKDIR, help=f'Répertoire des données générées (défaut : {DEFAULT_WORKDIR})')
+    parser.add_argument('--failure-rate', type=float, default=0.02, help='Part de réponses 503 de l\'API locale (défaut : 0.02)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help=f'Fichier de référence (défaut : {DEFAULT_BASELINE})')
+    parser.add_argument('--save-baseline', action='store_true', help='Enregistre ces mesures comme nouvelle référence')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f'Écart toléré avant de signaler une régression (défaut : {DEFAULT_TOLERANCE})')
+    parser.add_argument('-o', '--output', help='Écrit les mesures détaillées en JSON')
+    args = parser.parse_args()
+
+    try:
+        sizes = [parse_size(size) for size in args.sizes.split(',')]
+        stages = args.stages.split(',') if args.stages else list(STAGES)
+        unknown = [stage for stage in stages if stage not in STAGES]
+        if unknown:
+            raise Exception(f"Étape(s) inconnue(s) : {', '.join(unknown)}")
+        baseline = None if args.save_baseline else load_baseline(args.baseline)
+
+        options = {'seed': args.seed, 'workdir': args.workdir, 'failure_rate': args.failure_rate}
+        results = []
+        for size in sizes:
+            files = prepare_files(args.workdir, size, args.seed)
+            print(f"📊 {format_size(size)} aides")
+            for stage in stages:
+                result = measure(stage, files, size, options, args.repeat)
+                _print_result(result)
+                results.append(result)
+    except Exception as e:
+        print(f"❌ Erreur: {e}")
+        sys.exit(1)
+
+    if args.output:
+        with atomic_open(args.output) as f:
+            json.dump({'python': sys.version.split()[0], 'results': results}, f, indent=2)
+        print(f"✅ Mesures écrites dans {args.output}")
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"✅ Référence enregistrée dans {args.baseline}")
+        return
+    if baseline is None:
+        print(f"❌ Aucune référence ({args.baseline}) : lancez avec --save-baseline pour en créer une")
+        sys.exit(1)
+    regressions, missing = compare(results, baseline, args.tolerance)
+    if missing:
+        print(f"⚠️ Absent de la référence, non comparé : {', '.join(missing)}")
+    if len(missing) == len(results):
+        print(f"❌ Aucune mesure comparable dans {args.baseline}")
+        sys.exit(1)
+    if regressions:
+        for key, metric, before, after in regressions:
+            print(f"❌ Régression {key} : {metric} {before} -> {after}")
+        sys.exit(1)
+    print(f"✅ Aucune régression par rapport à {args.baseline} (tolérance {args.tolerance:.0%})")
+
+
+if __name__ == '__main__':
+    main()
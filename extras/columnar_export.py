@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Exports colonnes des aides : Parquet / Arrow IPC (si pyarrow est installé)
+et NDJSON compressé (gzip, ou zstd si zstandard est installé) sans dépendance.
+
+Les listes (financeurs, catégories, publics...) restent de vraies listes au lieu
+d'être jointes par "; " comme dans le CSV. Les aides sont écrites par lots
+depuis le flux d'entrée : la mémoire ne dépend que de la taille d'un lot
+(un groupe de lignes Parquet regroupe plusieurs lots).
+Comme les autres sorties, le fichier n'apparaît qu'une fois complet (cf. atomic_files).
+
+Les colonnes typées acceptent aussi les nombres et booléens écrits en texte
+("164898", "80", "12,5", "true"). Une valeur non convertible ("80 %") est gardée
+telle quelle en NDJSON, et devient null en Parquet/Arrow : elle est alors comptée
+par colonne dans `meta['dropped']`.
+"""
+
+import json
+from collections import Counter
+from functools import partial
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pa = None
+
+from aid_schema import LIST_SCHEMA
+from atomic_files import atomic_open
+from export_sinks import NdjsonSink, export
+from sharding import DEFAULT_CHUNK_SIZE, map_chunks
+
+FORMATS = ('parquet', 'arrow', 'ndjson')
+COMPRESSIONS = ('none', 'gzip', 'zstd')
+EXTENSIONS = {'parquet': '.parquet', 'arrow': '.arrow', 'ndjson': '.ndjson'}
+# Lignes par groupe Parquet : des groupes trop petits alourdissent les métadonnées
+# et dégradent la compression et la lecture
+ROW_GROUP_SIZE = 50_000
+
+# Type de chaque colonne, les autres sont des chaînes
+COLUMN_TYPES = {
+    'id': 'int',
+    'financers': 'list', 'instructors': 'list', 'programs': 'list',
+    'categories': 'list', 'targeted_audiences': 'list', 'aid_types': 'list', 'destinations': 'list',
+    'is_call_for_project': 'bool', 'is_charged': 'bool',
+    'subvention_rate_lower_bound': 'float', 'subvention_rate_upper_bound': 'float',
+    'loan_amount': 'float', 'recoverable_advance_amount': 'float',
+}
+
+
+def default_compression(fmt):
+    """zstd pour Parquet/Arrow, gzip (toujours disponible) pour NDJSON"""
+    return 'gzip' if fmt == 'ndjson' else 'zstd'
+
+
+def output_suffix(fmt, compression='none'):
+    suffix = EXTENSIONS[fmt]
+    if fmt == 'ndjson' and compression == 'gzip':
+        suffix += '.gz'
+    elif fmt == 'ndjson' and compression == 'zstd':
+        suffix += '.zst'
+    return suffix
+
+
+BOOL_STRINGS = {'true': True, 'false': False, 'oui': True, 'non': False, '1': True, '0': False}
+INT64_RANGE = range(-2 ** 63, 2 ** 63)
+# Valeur d'une colonne typée qui n'a pas pu être convertie
+UNPARSED = object()
+
+
+def _coerce(kind, value):
+    """Valeur d'une colonne typée ; '' (champ absent) devient None, une valeur non convertible UNPARSED"""
+    if value is None or value == '':
+        return None
+    if kind == 'bool':
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str):
+            return BOOL_STRINGS.get(value.strip().lower(), UNPARSED)
+        return UNPARSED
+    if isinstance(value, bool):
+        return UNPARSED
+    if isinstance(value, str):
+        text = value.strip()
+        try:
+            value = int(text) if kind == 'int' else float(text.replace(',', '.'))
+        except ValueError:
+            return UNPARSED
+    if kind == 'int':
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return value if isinstance(value, int) and value in INT64_RANGE else UNPARSED
+    if kind == 'float':
+        return float(value) if isinstance(value, (int, float)) else UNPARSED
+    return value
+
+
+def _text(value):
+    """Valeur d'une colonne texte : les nombres, objets... sont convertis en chaîne"""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def _kinds():
+    return [COLUMN_TYPES.get(name, 'str') for name in LIST_SCHEMA.header]
+
+
+def records_chunk(aids, keep_raw=False):
+    """
+    Tranche d'aides -> (colonnes typées, valeurs non convertibles par colonne)
+    (exécuté dans un processus du pool). Avec `keep_raw`, une valeur non convertible
+    reste telle quelle au lieu de devenir None.
+    """
+    kinds = _kinds()
+    columns = [[] for _ in kinds]
+    unparsed = Counter()
+    for row in LIST_SCHEMA.rows(aids):
+        for name, column, kind, value in zip(LIST_SCHEMA.header, columns, kinds, row):
+            if kind == 'str':
+                value = _text(value)
+            elif kind == 'list':
+                value = [_text(item) for item in value]
+            else:
+                typed = _coerce(kind, value)
+                if typed is UNPARSED:
+                    unparsed[name] += 1
+                    typed = value if keep_raw else None
+                value = typed
+            column.append(value)
+    return columns, unparsed
+
+
+def arrow_schema():
+    if pa is None:
+        raise Exception("pyarrow est nécessaire pour les formats parquet et arrow (pip install pyarrow)")
+    types = {'int': pa.int64(), 'float': pa.float64(), 'bool': pa.bool_(),
+             'str': pa.string(), 'list': pa.list_(pa.string())}
+    return pa.schema([(name, types[kind]) for name, kind in zip(LIST_SCHEMA.header, _kinds())])
+
+
+def export_columnar(aids, output_file, fmt='parquet', compression='zstd',
+                    workers=1, chunk_size=DEFAULT_CHUNK_SIZE, meta=None):
+    """
+    Écrit les aides au format `fmt` par lots de `chunk_size`.
+    Renvoie le nombre d'aides écrites.
+    Si `meta` est fourni, il reçoit dans "unparsed" le nombre de valeurs non convertibles
+    par colonne, et dans "dropped" celles remplacées par null (Parquet/Arrow).
+    """
+    if fmt not in FORMATS:
+        raise Exception(f"Format inconnu : {fmt} (attendu : {', '.join(FORMATS)})")
+    meta = meta if meta is not None else {}
+    unparsed = meta.setdefault('unparsed', Counter())
+    dropped = meta.setdefault('dropped', Counter())
+    keep_raw = fmt == 'ndjson'
+    chunks = map_chunks(partial(records_chunk, keep_raw=keep_raw), aids, workers, chunk_size)
+
+    def batches():
+        for columns, chunk_unparsed in chunks:
+            unparsed.update(chunk_unparsed)
+            if not keep_raw:
+                dropped.update(chunk_unparsed)
+            yield columns
+
+    header = LIST_SCHEMA.header
+    written = 0
+
+    if fmt == 'ndjson':
+        records = (dict(zip(header, values)) for columns in batches() for values in zip(*columns))
+        return export(records, [NdjsonSink(output_file, compression)])
+
+    schema = arrow_schema()
+    codec = None if compression == 'none' else compression
+    if fmt == 'arrow' and codec == 'gzip':
+        raise Exception("Arrow IPC ne supporte pas gzip : utilisez --compression zstd ou none")
+    with atomic_open(output_file, 'wb') as f:
+        if fmt == 'parquet':
+            writer = pa.parquet.ParquetWriter(f, schema, compression=codec or 'none')
+        else:
+            writer = pa.ipc.new_file(f, schema, options=pa.ipc.IpcWriteOptions(compression=codec))
+        pending, pending_rows = [], 0
+        try:
+            for columns in batches():
+                batch = pa.record_batch([pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                                        schema=schema)
+                written += batch.num_rows
+                if fmt == 'arrow':
+                    writer.write(batch)
+                    continue
+                # Les lots sont regroupés pour former des groupes de lignes de taille raisonnable
+                pending.append(batch)
+                pending_rows += batch.num_rows
+                if pending_rows >= ROW_GROUP_SIZE:
+                    table = pa.Table.from_batches(pending, schema)
+                    writer.write_table(table.slice(0, ROW_GROUP_SIZE))
+                    # Le reste commence le groupe suivant
+                    pending = table.slice(ROW_GROUP_SIZE).to_batches()
+                    pending_rows -= ROW_GROUP_SIZE
+            if pending_rows:
+                writer.write_table(pa.Table.from_batches(pending, schema))
+        finally:
+            writer.close()
+    return written
@@ -1,36 +1,50 @@
+import argparse
+import io
 import json
 import csv
+import os
 
-def flatten_value(value):
+from aid_diff import discard_manifest, write_incremental_csv
+from aid_schema import RAW_SCHEMA
+# flatten_value reste importable depuis ce module
+from aid_schema import flatten_value  # noqa: F401
+from html_cleaner import default_cleaner
+from run_stats import RunStats, add_arguments as add_stats_arguments, profiling
+from sharding import DEFAULT_CHUNK_SIZE, map_chunks
+
+# Les colonnes sont décrites dans aid_schema.RAW_COLUMNS et compilées une seule fois
+FIELDNAMES = RAW_SCHEMA.header
+
+def _csv_writer(stream):
+    return csv.writer(stream, quoting=csv.QUOTE_MINIMAL)
+
+def format_chunk(items):
     """
-    Convertit une valeur pour l'écriture CSV.
-    Les listes sont jointes par '; '.
-    Les listes d'objets avec une clé 'name' sont jointes par leurs noms.
-    Les booléens sont convertis en chaînes.
-    Les valeurs None deviennent des chaînes vides.
+    Met en forme une tranche d'aides en texte CSV.
+    Exécuté dans un processus du pool quand --workers > 1.
     """
-    if isinstance(value, list):
-        if not value:
-            return ""
-        # Vérifier si c'est une liste d'objets avec une clé 'name' (comme financers_full, aid_types_full)
-        if all(isinstance(item, dict) and 'name' in item for item in value):
-            return "; ".join(str(item.get('name', '')) if item else '' for item in value)
-        # Sinon, joindre les éléments (en s'assurant qu'ils sont des chaînes)
-        return "; ".join(str(v) if v is not None else "" for v in value)
-    elif isinstance(value, bool):
-        return str(value)
-    elif value is None:
-        return ""
-    return str(value)
+    buffer = io.StringIO(newline='')
+    _csv_writer(buffer).writerows(RAW_SCHEMA.rows(items))
+    return len(items), buffer.getvalue()
 
-def convert_json_to_csv(json_file_path, csv_file_path):
+def convert_json_to_csv(json_file_path, csv_file_path, workers=1, chunk_size=DEFAULT_CHUNK_SIZE, incremental=False,
+                        stats=None):
     """
     Convertit un fichier JSON d'aides en fichier CSV.
+    Avec `workers` > 1, les aides sont aplaties par tranches de `chunk_size`
+    dans un pool de processus ; le fichier produit est identique.
+    Avec `incremental`, seules les aides ajoutées ou modifiées depuis la conversion
+    précédente sont aplaties, les autres lignes sont copiées (cf. aid_diff).
+    Avec `stats` (un run_stats.RunStats), chaque étape est chronométrée.
     """
+    stats = stats or RunStats('convert_json_to_csv', enabled=False)
+    cleaner = default_cleaner()
+    cleaner_before = {'seconds': cleaner.seconds, 'hits': cleaner.hits, 'misses': cleaner.misses}
     raw_json_content = None
     try:
-        with open(json_file_path, 'r', encoding='utf-8') as f_json:
+        with stats.stage('read'), open(json_file_path, 'r', encoding='utf-8') as f_json:
             raw_json_content = f_json.read()
+        stats.set('bytes_read', os.path.getsize(json_file_path))
     except FileNotFoundError:
         print(f"Erreur : Le fichier JSON '{json_file_path}' n'a pas été trouvé.")
         return
@@ -43,7 +57,9 @@ def convert_json_to_csv(json_file_path, csv_file_path):
     # Attention: cette approche est basique et peut ne pas fonctionner pour des JSON complexes ou très corrompus.
     import re
     # Supprimer les virgules avant une accolade fermante '}' ou un crochet fermant ']'
-    cleaned_json_content = re.sub(r',\s*([\}\]])', r'\1', raw_json_content)
+    with stats.stage('repair'):
+        cleaned_json_content = re.sub(r',\s*([\}\]])', r'\1', raw_json_content)
+    stats.set('repair_bytes', len(raw_json_content) - len(cleaned_json_content))
     
     # Tentative de suppression des virgules finales dans les listes/objets multilignes
     # Exemple: [ "a", "b", ] -> [ "a", "b" ]
@@ -52,7 +68,8 @@ def convert_json_to_csv(json_file_path, csv_file_path):
     # Une approche plus simple est de laisser json.loads tenter et d'afficher une erreur claire.
 
     try:
-        data = json.loads(cleaned_json_content)
+        with stats.stage('parse'):
+            data = json.loads(cleaned_json_content)
     except json.JSONDecodeError as e:
         print(f"Erreur : Impossible de décoder le JSON du fichier '{json_file_path}'.")
         print(f"Détail de l'erreur de parsing JSON : {e}")
@@ -70,81 +87,30 @@ def convert_json_to_csv(json_file_path, csv_file_path):
         print("Aucune aide trouvée dans le fichier JSON.")
         return
 
-    # Utiliser les clés du premier objet comme en-têtes CSV
-    # S'assurer d'avoir un ordre cohérent des colonnes
-    # Prendre l'union de toutes les clés de tous les objets pour être exhaustif
-    all_keys = set()
-    for item in results:
-        all_keys.update(item.keys())
-    
-    # Donner un ordre défini aux clés pour les colonnes CSV
-    # On peut utiliser la liste fournie par l'utilisateur si elle est disponible et pertinente
-    # ou simplement trier les clés pour la cohérence.
-    # Pour cet exemple, nous allons trier les clés par ordre alphabétique.
-    # Idéalement, utiliser une liste prédéfinie si l'ordre est important.
-    # fieldnames = sorted(list(all_keys))
-
-    # Utiliser la liste de champs fournie par l'utilisateur pour garantir l'ordre et l'exhaustivité souhaitée
-    # Si un champ listé ici n'est pas dans un item JSON, il apparaîtra comme une colonne vide pour cet item.
-    # Si un item JSON a des clés supplémentaires non listées ici, elles seront ignorées.
-    fieldnames = [
-        'id', 'name', 'name_initial', 'short_title', 'slug', 'url',
-        'financers', 'instructors', 'programs', 
-        'description', 'eligibility', # description_clean et eligibility_clean n'étaient pas dans le JSON fourni
-        'perimeter', 'perimeter_scale',
-        'categories', 'targeted_audiences', 'aid_types', 'destinations',
-        'is_call_for_project', 'is_charged',
-        'start_date', 'predeposit_date', 'submission_deadline',
-        'subvention_rate_lower_bound', 'subvention_rate_upper_bound', 'subvention_comment',
-        'loan_amount', 'recoverable_advance_amount',
-        'contact', 'recurrence', 'project_examples', # contact_clean n'était pas dans le JSON fourni
-        'origin_url', 'application_url',
-        'import_data_url', 'import_data_mention', 'import_share_licence', # Ajoutés depuis la liste utilisateur
-        'date_created', 'date_updated', 'project_references', 'european_aid', 'is_live', # Ajoutés depuis la liste utilisateur
-        # Les champs _full sont complexes et gérés par flatten_value, pas besoin de les lister explicitement ici
-        # si on veut toutes les clés du JSON, on peut revenir à `sorted(list(all_keys))`
-        # ou ajouter 'financers_full', 'instructors_full', 'aid_types_full' à cette liste.
-        # Pour l'instant, on se base sur les clés simples et flatten_value gère les listes/objets.
-    ]
-    
-    # S'assurer que toutes les clés des fieldnames existent, sinon DictWriter lèvera une erreur
-    # On va plutôt filtrer les fieldnames pour ne garder que ceux présents dans all_keys
-    # ou s'assurer que get() est utilisé avec une valeur par défaut pour les clés manquantes.
-    # L'approche avec item.get(key) dans la boucle est déjà robuste à cela.
-    # Cependant, pour DictWriter, tous les fieldnames doivent être valides.
-    # On va donc prendre l'intersection ou s'assurer que les clés sont bien celles attendues.
-    # Pour plus de robustesse, on peut utiliser les `all_keys` comme fieldnames,
-    # et si un ordre spécifique est requis, il faut le définir manuellement et s'assurer de sa validité.
-    # Pour cet exemple, nous allons utiliser une liste fixe de fieldnames et le DictWriter
-    # ignorera les champs du JSON non listés ici, et mettra des valeurs vides pour les champs listés mais absents du JSON.
-    # Pour être plus précis, on va utiliser les clés du premier item comme base, puis ajouter les autres.
-    # Mais la liste fournie par l'utilisateur est une meilleure source de vérité pour les colonnes souhaitées.
-
-    # On va s'assurer que les fieldnames utilisés par DictWriter sont ceux qui existent réellement dans les données
-    # ou ceux que l'on veut absolument voir (quitte à ce qu'ils soient vides).
-    # La liste fournie par l'utilisateur est une bonne base.
+    stats.set('records', len(results))
+    if incremental:
+        with stats.stage('format'):
+            diff = write_incremental_csv(results, csv_file_path, RAW_SCHEMA, _csv_writer)
+        stats.add_html_cleaner(cleaner, cleaner_before)
+        for status, count in diff.counts.items():
+            stats.set(f"incremental_{status}", count)
+        stats.set('bytes_written', os.path.getsize(csv_file_path))
+        print(f"Conversion incrémentale : {diff.summary()}")
+        print(f"Conversion réussie. Fichier CSV sauvegardé sous : {csv_file_path}")
+        return
 
     try:
-        with open(csv_file_path, 'w', newline='', encoding='utf-8') as f_csv:
-            # Utiliser extrasaction='ignore' pour ignorer les champs du JSON non dans fieldnames
-            # et restval='' pour mettre une chaîne vide pour les champs dans fieldnames mais absents du JSON
-            writer = csv.DictWriter(f_csv, fieldnames=fieldnames, quoting=csv.QUOTE_MINIMAL, extrasaction='ignore', restval='')
-            writer.writeheader()
-
-            for item in results:
-                # Préparer la ligne pour l'écriture, en aplatissant les valeurs complexes
-                row_to_write = {}
-                for key_in_item in item: # Itérer sur les clés de l'item JSON actuel
-                    if key_in_item in fieldnames: # Si la clé est dans nos colonnes CSV souhaitées
-                         row_to_write[key_in_item] = flatten_value(item.get(key_in_item))
-                    # Les clés de l'item non présentes dans fieldnames seront ignorées par extrasaction='ignore'
-                
-                # S'assurer que toutes les colonnes fieldnames sont présentes, même si vides
-                for fn_key in fieldnames:
-                    if fn_key not in row_to_write:
-                        row_to_write[fn_key] = '' # Valeur par défaut pour les colonnes manquantes
+        with stats.stage('write'), open(csv_file_path, 'w', newline='', encoding='utf-8') as f_csv:
+            _csv_writer(f_csv).writerow(FIELDNAMES)
 
-                writer.writerow(row_to_write)
+            # Les tranches reviennent dans l'ordre d'entrée, quel que soit le nombre de processus
+            for _, text in stats.timed(map_chunks(format_chunk, results, workers, chunk_size), 'format'):
+                with stats.stage('write'):
+                    f_csv.write(text)
+        # Le manifeste d'une conversion --incremental précédente ne décrit plus ce fichier
+        discard_manifest(csv_file_path)
+        stats.add_html_cleaner(cleaner, cleaner_before, workers)
+        stats.set('bytes_written', os.path.getsize(csv_file_path))
         print(f"Conversion réussie. Fichier CSV sauvegardé sous : {csv_file_path}")
     except IOError:
         print(f"Erreur : Impossible d'écrire dans le fichier CSV '{csv_file_path}'.")
@@ -153,12 +119,30 @@ if __name__ == '__main__':
     # Définir les chemins des fichiers d'entrée et de sortie
     # Le script s'attend à être exécuté depuis le répertoire 'extras'
     # ou que les chemins soient ajustés en conséquence.
-    json_input_path = 'aides.json'
-    csv_output_path = 'aides_converted.csv' # Nom différent pour éviter d'écraser le précédent
+    parser = argparse.ArgumentParser(description='Convertit un fichier JSON d\'aides en CSV')
+    parser.add_argument('json_input_path', nargs='?', default='aides.json', help='Fichier JSON source (défaut : aides.json)')
+    # Nom différent pour éviter d'écraser le précédent
+    parser.add_argument('csv_output_path', nargs='?', default='aides_converted.csv',
+                        help='Fichier CSV de sortie (défaut : aides_converted.csv)')
+    parser.add_argument('--workers', type=int, default=1, help='Nombre de processus de conversion (défaut : 1)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f'Aides par tranche envoyée à un processus (défaut : {DEFAULT_CHUNK_SIZE})')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Ne convertit que les aides ajoutées ou modifiées depuis la conversion précédente '
+                             '(manifeste <sortie>.manifest.json)')
+    add_stats_arguments(parser)
+    args = parser.parse_args()
+    stats = RunStats('convert_aides_to_csv', enabled=bool(args.stats))
+    json_input_path = args.json_input_path
+    csv_output_path = args.csv_output_path
 
     print(f"Début de la conversion de '{json_input_path}' en '{csv_output_path}'...")
     # Appeler la fonction de conversion
-    convert_json_to_csv(json_input_path, csv_output_path)
+    with profiling(stats, args.profile, args.tracemalloc):
+        convert_json_to_csv(json_input_path, csv_output_path, args.workers, args.chunk_size, args.incremental, stats)
+    stats.set('workers', args.workers)
+    if args.stats:
+        stats.write(args.stats)
 
     print("\nInstructions pour exécuter le script:")
     print(f"1. Assurez-vous que le fichier '{json_input_path}' est dans le même répertoire que ce script, ou ajustez le chemin.")
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Export en une seule passe d'un flux d'enregistrements vers plusieurs fichiers
+- tableau JSON indenté (comme json.dump(indent=2)) ou compact
+- NDJSON
+- CSV avec séparateur au choix
+chacun éventuellement compressé en gzip ou zstd (si zstandard est installé).
+
+Chaque sortie écrit dans un fichier temporaire via un tampon, renommé à la fin
+(cf. atomic_files) : une erreur en cours de route ne laisse aucun fichier partiel.
+Les enregistrements ne sont lus qu'une fois et jamais gardés en mémoire.
+
+Exemple :
+    export([...], [JsonArraySink('p.json'), CsvSink('p.csv.gz', ['id', 'name'], delimiter=';')])
+    python export_sinks.py adhoc_perimeters.json p.ndjson.zst p.csv --fields id,name,code
+"""
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import sys
+from abc import ABC, abstractmethod
+from contextlib import ExitStack, contextmanager
+from itertools import chain
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from aides_reader import iter_aids
+from atomic_files import atomic_open
+
+BUFFER_SIZE = 1024 * 1024
+COMPRESSION_SUFFIXES = {'.gz': 'gzip', '.zst': 'zstd'}
+
+
+def compression_of(path):
+    """'gzip' pour .gz, 'zstd' pour .zst, sinon 'none'"""
+    for suffix, compression in COMPRESSION_SUFFIXES.items():
+        if str(path).endswith(suffix):
+            return compression
+    return 'none'
+
+
+@contextmanager
+def _text_stream(raw, compression):
+    """Flux texte UTF-8 au-dessus du fichier binaire `raw`, compressé ou non ; `raw` reste ouvert"""
+    if compression == 'gzip':
+        # mtime=0 : deux exports identiques donnent des fichiers identiques
+        binary = gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6, mtime=0)
+    elif compression == 'zstd':
+        if zstandard is None:
+            raise Exception("zstandard est nécessaire pour la compression zstd (pip install zstandard)")
+        binary = zstandard.ZstdCompressor().stream_writer(raw, closefd=False)
+    elif compression == 'none':
+        binary = raw
+    else:
+        raise Exception(f"Compression inconnue : {compression}")
+    text = io.TextIOWrapper(binary, encoding='utf-8', newline='')
+    try:
+        yield text
+    finally:
+        text.flush()
+        text.detach()
+        if binary is not raw:
+            binary.close()
+
+
+class Sink(ABC):
+    """Sortie d'un export : ouverte par export(), reçoit chaque enregistrement"""
+
+    def __init__(self, path, compression=None, buffer_size=BUFFER_SIZE):
+        self.path = path
+        self.compression = compression or compression_of(path)
+        self.buffer_size = buffer_size
+        self.stream = None
+        self.count = 0
+
+    def open(self, stack):
+        raw = stack.enter_context(atomic_open(self.path, 'wb', buffering=self.buffer_size))
+        self.stream = stack.enter_context(_text_stream(raw, self.compression))
+        # Appelé avant la fermeture du flux : la fin du format est écrite avant le renommage
+        stack.push(self._exit)
+
+    def _exit(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.finish()
+
+    @abstractmethod
+    def write(self, record):
+        """Écrit un enregistrement dans la sortie"""
+
+    def finish(self):
+        pass
+
+
+class JsonArraySink(Sink):
+    """Tableau JSON ; indent=2 reproduit json.dump(records, f, indent=2, ensure_ascii=False)"""
+
+    def __init__(self, path, indent=2, **options):
+        super().__init__(path, **options)
+        self.indent = indent
+
+    def write(self, record):
+        if self.indent is None:
+            self.stream.write(('[' if not self.count else ',')
+                              + json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+        else:
+            pad = ' ' * self.indent
+            text = json.dumps(record, indent=self.indent, ensure_ascii=False)
+            self.stream.write(('[\n' if not self.count else ',\n') + pad + text.replace('\n', '\n' + pad))
+        self.count += 1
+
+    def finish(self):
+        if not self.count:
+            self.stream.write('[]')
+        else:
+            self.stream.write(']' if self.indent is None else '\n]')
+
+
+class NdjsonSink(Sink):
+    """Un objet JSON par ligne"""
+
+    def write(self, record):
+        self.stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.count += 1
+
+
+class CsvSink(Sink):
+    """CSV à colonnes fixes ; `row` transforme un enregistrement en liste de valeurs"""
+
+    def __init__(self, path, fieldnames, delimiter=',', row=None, **options):
+        super().__init__(path, **options)
+        self.fieldnames = list(fieldnames)
+        self.delimiter = delimiter
+        self.row = row or (lambda record: [record.get(key) for key in self.fieldnames])
+        self.writer = None
+
+    def open(self, stack):
+        super().open(stack)
+        self.writer = csv.writer(self.stream, delimiter=self.delimiter)
+        self.writer.writerow(self.fieldnames)
+
+    def write(self, record):
+        self.writer.writerow(self.row(record))
+        self.count += 1
+
+
+def sink_for_path(path, fieldnames=None, delimiter=',', indent=2, **options):
+    """Sortie déduite de l'extension : .json, .ndjson/.jsonl ou .csv, suivie de .gz/.zst"""
+    name = str(path)
+    for suffix in COMPRESSION_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    if name.endswith('.json'):
+        return JsonArraySink(path, indent=indent, **options)
+    if name.endswith(('.ndjson', '.jsonl')):
+        return NdjsonSink(path, **options)
+    if name.endswith('.csv'):
+        if not fieldnames:
+            raise Exception(f"Colonnes nécessaires pour la sortie CSV {path}")
+        return CsvSink(path, fieldnames, delimiter=delimiter, **options)
+    raise Exception(f"Extension non reconnue : {path} (.json, .ndjson, .jsonl, .csv, éventuellement .gz/.zst)")
+
+
+def export(records, sinks):
+    """Écrit chaque enregistrement dans toutes les sorties ; renvoie le nombre d'enregistrements"""
+    count = 0
+    with ExitStack() as stack:
+        for sink in sinks:
+            sink.open(stack)
+        for record in records:
+            for sink in sinks:
+                sink.write(record)
+            count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporte un fichier d'enregistrements JSON vers plusieurs formats en une passe")
+    parser.add_argument('input_file', help='Fichier JSON source (liste, pages, NDJSON...)')
+    parser.add_argument('outputs', nargs='+', help='Fichiers de sortie : .json, .ndjson, .jsonl, .csv (+ .gz/.zst)')
+    parser.add_argument('--fields', help='Colonnes CSV, séparées par des virgules (défaut : clés du premier enregistrement)')
+    parser.add_argument('--delimiter', default=',', help='Séparateur CSV (défaut : ,)')
+    parser.add_argument('--compact', action='store_true', help='Tableaux JSON sans indentation')
+    args = parser.parse_args()
+
+    try:
+        records = iter_aids(args.input_file)
+        fieldnames = args.fields.split(',') if args.fields else None
+        if fieldnames is None and any(isinstance(sink_for_path(path, ['-']), CsvSink) for path in args.outputs):
+            first = next(records, None)
+            fieldnames = list(first or {})
+            if first is not None:
+                records = chain([first], records)
+        sinks = [sink_for_path(path, fieldnames, args.delimiter, None if args.compact else 2) for path in args.outputs]
+        count = export(records, sinks)
+    except FileNotFoundError as e:
+        print(f"❌ Erreur: Fichier non trouvé: {e.filename}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"❌ Erreur: {e}")
+        sys.exit(1)
+    for path in args.outputs:
+        print(f"✅ Sauvegardé sous {path}")
+    print(f"📊 {count} enregistrement(s) exporté(s)")
+
+
+if __name__ == '__main__':
+    main()
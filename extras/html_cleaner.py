@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Nettoyage HTML -> texte pour les champs des aides (description, eligibility, contact)
+- expressions régulières compilées une fois, sans rappel Python par balise
+- les balises de bloc (<p>, <li>, <br>, <div>...) deviennent des séparateurs,
+  les balises en ligne (<strong>, <a>...) disparaissent sans couper les mots
+- mémo LRU indexé sur une empreinte du contenu : les blocs contact/éligibilité
+  répétés d'une aide à l'autre ne sont nettoyés qu'une fois
+"""
+
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from html import unescape
+
+MEMO_SIZE = 4096
+
+BLOCK_TAGS = (
+    'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt',
+    'figcaption', 'figure', 'footer', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header',
+    'hr', 'li', 'ol', 'p', 'pre', 'section', 'table', 'td', 'th', 'tr', 'ul',
+)
+
+# Commentaires et contenus de <script>/<style> : supprimés entièrement
+_DROP_RE = re.compile(r'<!--.*?-->|<(script|style)\b.*?</\1\s*>', re.DOTALL | re.IGNORECASE)
+# Balises de bloc, quelle que soit leur casse (<br>, <BR>, <Br>...) : remplacées par un espace
+_BLOCK_RE = re.compile(r'</?(?:' + '|'.join(BLOCK_TAGS) + r')\b[^>]*>', re.IGNORECASE)
+# Toute autre balise : supprimée
+_TAG_RE = re.compile(r'<[^>]+>')
+
+
+def _clean(text):
+    if '<' in text:
+        if '<!' in text or '<s' in text or '<S' in text:
+            text = _DROP_RE.sub('', text)
+        text = _TAG_RE.sub('', _BLOCK_RE.sub(' ', text))
+    # Les entités sont décodées après la suppression des balises,
+    # pour qu'un "&lt;b&gt;" reste du texte
+    if '&' in text:
+        text = unescape(text)
+    # split/join : bien plus rapide qu'un re.sub(r'\s+', ' ') sur chaque espace
+    return ' '.join(text.split())
+
+
+class HtmlCleaner:
+    """Nettoyeur avec mémo LRU ; une instance par processus suffit"""
+
+    def __init__(self, memo_size=MEMO_SIZE):
+        self.memo_size = memo_size
+        self.memo = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # Temps passé à nettoyer (hors mémo), relevé par --stats
+        self.seconds = 0.0
+
+    def clean(self, text):
+        """Nettoie le HTML et décode les entités"""
+        if not text:
+            return ""
+        if not isinstance(text, str):
+            text = str(text)
+        key = hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+        memo = self.memo
+        cleaned = memo.get(key)
+        if cleaned is not None:
+            memo.move_to_end(key)
+            self.hits += 1
+            return cleaned
+        self.misses += 1
+        started = time.perf_counter()
+        cleaned = _clean(text)
+        self.seconds += time.perf_counter() - started
+        memo[key] = cleaned
+        if len(memo) > self.memo_size:
+            memo.popitem(last=False)
+        return cleaned
+
+    def clean_column(self, values):
+        """Nettoie toute une colonne ; chaque valeur distincte n'est traitée qu'une fois"""
+        seen = {}
+        cleaned = []
+        for value in values:
+            result = seen.get(value)
+            if result is None:
+                result = seen[value] = self.clean(value)
+            cleaned.append(result)
+        return cleaned
+
+
+_default_cleaner = HtmlCleaner()
+
+
+def default_cleaner():
+    """Nettoyeur partagé par clean_html (compteurs hits/misses/seconds)"""
+    return _default_cleaner
+
+
+def clean_html(text):
+    """Nettoie le HTML et décode les entités (mémo partagé par le processus)"""
+    return _default_cleaner.clean(text)
+
+
+def clean_column(values):
+    """Version colonne de clean_html"""
+    return _default_cleaner.clean_column(values)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Cache HTTP sur disque pour les endpoints Aides-Territoires
+- clé : URL normalisée (paramètres triés, sans l'en-tête d'authentification)
+- corps des réponses stockés en fichiers, métadonnées dans un index SQLite
+- revalidation conditionnelle (If-None-Match / If-Modified-Since) une fois la durée de vie écoulée
+- durée de vie par endpoint, taille maximale avec éviction LRU
+- mode hors ligne (cache_only) : on ne sert que ce qui est en cache
+
+Utilisé par aides_harvester.AidesTerritoiresClient (option --cache-dir).
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from atomic_files import atomic_open
+
+DEFAULT_CACHE_DIR = '.http_cache'
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Les données de référence changent rarement, les aides plus souvent
+DEFAULT_TTLS = {
+    'perimeters': 7 * 24 * 3600,
+    'backers': 7 * 24 * 3600,
+    'backer-groups': 7 * 24 * 3600,
+    'aids': 6 * 3600,
+}
+DEFAULT_TTL = 3600
+
+
+def normalize_url(url, params=None):
+    """URL canonique : schéma et hôte en minuscules, paramètres triés"""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    for key, value in (params or {}).items():
+        values = value if isinstance(value, (list, tuple)) else [value]
+        query.extend((key, str(v)) for v in values)
+    query.sort()
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, urlencode(query), ''))
+
+
+def endpoint_of(url):
+    """Nom de l'endpoint d'après le chemin : /api/backer-groups/ -> backer-groups"""
+    segments = [segment for segment in urlsplit(url).path.split('/') if segment]
+    return segments[-1] if segments else ''
+
+
+class ResponseCache:
+    """Cache de réponses partagé entre fils d'exécution"""
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, ttls=None, cache_only=False):
+        self.directory = directory
+        self.bodies = os.path.join(directory, 'bodies')
+        os.makedirs(self.bodies, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.cache_only = cache_only
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(directory, 'index.sqlite'), check_same_thread=False)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL,
+                last_access REAL,
+                size INTEGER
+            )
+        """)
+        self.db.commit()
+
+    def _body_path(self, key):
+        return os.path.join(self.bodies, hashlib.sha256(key.encode('utf-8')).hexdigest())
+
+    def lookup(self, url, params=None):
+        """Renvoie l'entrée en cache (dictionnaire) ou None"""
+        key = normalize_url(url, params)
+        with self.lock:
+            row = self.db.execute(
+                "SELECT key, endpoint, etag, last_modified, stored_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        if not row:
+            return None
+        if not os.path.exists(self._body_path(key)):
+            self._forget(key)
+            return None
+        return dict(zip(('key', 'endpoint', 'etag', 'last_modified', 'stored_at'), row))
+
+    def is_fresh(self, entry):
+        ttl = self.ttls.get(entry['endpoint'], DEFAULT_TTL)
+        return time.time() - entry['stored_at'] < ttl
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def read(self, entry):
+        """
+        Corps de la réponse en cache ; marque l'entrée comme récemment utilisée.
+        Renvoie None si le corps a disparu entre-temps (éviction LRU par un autre fil) :
+        l'appelant traite l'entrée comme absente du cache.
+        """
+        try:
+            with open(self._body_path(entry['key']), 'rb') as f:
+                body = f.read()
+        except FileNotFoundError:
+            self._forget(entry['key'])
+            return None
+        with self.lock:
+            self.db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), entry['key']))
+            self.db.commit()
+        return body
+
+    def _forget(self, key):
+        """Supprime de l'index une entrée dont le corps n'existe plus"""
+        with self.lock:
+            if not os.path.exists(self._body_path(key)):
+                self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self.db.commit()
+
+    def revalidated(self, entry):
+        """Réponse 304 : l'entrée repart pour une durée de vie complète"""
+        now = time.time()
+        with self.lock:
+            self.db.execute("UPDATE entries SET stored_at = ?, last_access = ? WHERE key = ?",
+                            (now, now, entry['key']))
+            self.db.commit()
+        entry['stored_at'] = now
+
+    def store(self, url, params, body, headers):
+        key = normalize_url(url, params)
+        with atomic_open(self._body_path(key), 'wb') as f:
+            f.write(body)
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, endpoint_of(url), headers.get('ETag'), headers.get('Last-Modified'), now, now, len(body))
+            )
+            self.db.commit()
+            self._evict()
+
+    def _evict(self):
+        """Supprime les entrées les moins récemment utilisées au-delà de max_bytes"""
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self.db.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._body_path(key))
+            except FileNotFoundError:
+                pass
+            self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+        self.db.commit()
@@ -4,243 +4,231 @@ Convertisseur JSON vers CSV pour les aides Aides-Territoires
 Supporte les fichiers JSON partiels ou mal formatés
 """
 
+import io
 import json
 import csv
-import re
 import sys
 from pathlib import Path
-from html import unescape
 import argparse
+from functools import partial
+from itertools import chain
 
-def clean_html(text):
-    """Nettoie le HTML et décode les entités"""
-    if not text:
-        return ""
-    # Décode les entités HTML
-    text = unescape(text)
-    # Supprime les balises HTML basiques
-    text = re.sub(r'<[^>]+>', '', text)
-    # Nettoie les espaces multiples
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
+from aid_schema import CLEAN_BACKER_SCHEMA, CLEAN_SCHEMA
+from aid_diff import discard_manifest, write_incremental_csv
+from aides_reader import iter_aids, iter_aids_from_stream
+from atomic_files import atomic_open
+from backer_index import DEFAULT_INDEX, BackerIndex
+from columnar_export import COMPRESSIONS, FORMATS, default_compression, export_columnar, output_suffix
+from html_cleaner import default_cleaner
+from run_stats import RunStats, add_arguments as add_stats_arguments, profiling
+# clean_html et extract_list_items restent importables depuis ce module
+from aid_schema import extract_list_items  # noqa: F401
+from html_cleaner import clean_html  # noqa: F401
+from sharding import DEFAULT_CHUNK_SIZE, map_chunks
 
-def extract_list_items(items_list, key='name'):
-    """Extrait les éléments d'une liste et les joint par des virgules"""
-    if not items_list:
-        return ""
-    if isinstance(items_list[0], dict):
-        return "; ".join([item.get(key, '') for item in items_list])
-    else:
-        return "; ".join(items_list)
+def _report_skipped(meta):
+    """Affiche les zones ignorées par la lecture tolérante"""
+    skipped = meta.get('skipped') or []
+    if not skipped:
+        return
+    total = sum(end - start for start, end in skipped)
+    print(f"🔧 {len(skipped)} zone(s) corrompue(s) ignorée(s) ({total} octets)")
+    for start, end in skipped[:10]:
+        print(f"   ⚠️ octets {start}-{end}")
+    if len(skipped) > 10:
+        print(f"   ... et {len(skipped) - 10} autre(s)")
+
+def _report_unparsed(meta):
+    """Affiche les valeurs des colonnes typées qui n'ont pas pu être converties"""
+    unparsed = meta.get('unparsed')
+    if not unparsed:
+        return
+    outcome = 'remplacée(s) par null' if meta.get('dropped') else 'gardée(s) telle(s) quelle(s)'
+    print(f"⚠️ {sum(unparsed.values())} valeur(s) non convertible(s) {outcome} : "
+          + ', '.join(f"{column} ({count})" for column, count in unparsed.most_common()))
+
+def _parse_content(content):
+    """Lecture tolérante d'un contenu déjà en mémoire, en une seule passe"""
+    meta = {}
+    results = list(iter_aids_from_stream(io.StringIO(content), meta))
+    _report_skipped(meta)
+    return {"results": results, "count": meta.get('count', len(results)), "skipped": meta['skipped']}
 
 def parse_multiple_json_objects(content):
     """Parse plusieurs objets JSON séparés dans un même fichier"""
-    all_results = []
-    total_count = 0
-    
-    # Divise le contenu en objets JSON séparés
-    json_objects = []
-    brace_count = 0
-    current_obj = ""
-    
-    for char in content:
-        current_obj += char
-        if char == '{':
-            brace_count += 1
-        elif char == '}':
-            brace_count -= 1
-            if brace_count == 0 and current_obj.strip():
-                json_objects.append(current_obj.strip())
-                current_obj = ""
-    
-    # Parse chaque objet JSON
-    for obj_str in json_objects:
-        try:
-            obj = json.loads(obj_str)
-            if 'results' in obj:
-                all_results.extend(obj['results'])
-                total_count += obj.get('count', len(obj['results']))
-            elif isinstance(obj, list):
-                all_results.extend(obj)
-                total_count += len(obj)
-            else:
-                all_results.append(obj)
-                total_count += 1
-        except json.JSONDecodeError:
-            print(f"⚠️ Objet JSON ignoré (mal formaté): {obj_str[:100]}...")
-            continue
-    
-    return {"results": all_results, "count": total_count}
+    return _parse_content(content)
 
 def fix_json(content):
-    """Tente de réparer un JSON mal formaté"""
-    content = content.strip()
-    
-    # Vérifie s'il y a plusieurs objets JSON (erreur "Extra data")
-    if '}{' in content:
-        print("🔧 Détection de plusieurs objets JSON, traitement séparé...")
-        return parse_multiple_json_objects(content)
-    
-    # Si le contenu ne commence pas par {, essaie de trouver le début
-    if not content.startswith('{'):
-        match = re.search(r'\{.*', content, re.DOTALL)
-        if match:
-            content = match.group(0)
-    
-    # Si le JSON est tronqué, essaie de le compléter
-    if not content.endswith('}'):
-        # Compte les accolades ouvertes vs fermées
-        open_braces = content.count('{')
-        close_braces = content.count('}')
-        
-        # Ajoute les accolades manquantes
-        if open_braces > close_braces:
-            # Trouve la dernière position valide et ferme proprement
-            last_complete = content.rfind('"}')
-            if last_complete != -1:
-                content = content[:last_complete + 2]
-                content += ']}'  # Ferme results et l'objet principal
-    
-    return content
+    """
+    Répare un JSON mal formaté (tronqué, pages collées, virgules finales, déchets)
+    et renvoie directement les aides récupérées.
+    """
+    return _parse_content(content)
 
 def parse_json_file(filepath):
     """Parse le fichier JSON en gérant les erreurs"""
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Première tentative : JSON standard
-        try:
-            return json.loads(content)
-        except json.JSONDecodeError as e:
-            print(f"⚠️ JSON mal formaté: {str(e)}")
-            
-            # Vérifie si c'est le problème "Extra data" (plusieurs objets JSON)
-            if "Extra data" in str(e):
-                print("🔧 Détection de plusieurs objets JSON collés...")
-                return parse_multiple_json_objects(content)
-            
-            # Deuxième tentative : réparation automatique
-            print("🔧 Tentative de réparation automatique...")
-            fixed_content = fix_json(content)
-            
-            # Si fix_json a retourné un dictionnaire (cas multiples objets)
-            if isinstance(fixed_content, dict):
-                return fixed_content
-            
-            try:
-                return json.loads(fixed_content)
-            except json.JSONDecodeError as e2:
-                print(f"❌ Réparation échouée: {e2}")
-                
-                # Troisième tentative : extraction manuelle des résultats
-                print("🔧 Tentative d'extraction manuelle...")
-                results_match = re.search(r'"results":\s*\[(.*?)\]', content, re.DOTALL)
-                if results_match:
-                    results_str = '[' + results_match.group(1) + ']'
-                    try:
-                        results = json.loads(results_str)
-                        return {"results": results, "count": len(results)}
-                    except:
-                        pass
-                
-                raise Exception(f"Impossible de parser le fichier JSON: {e}")
-    
+        meta = {}
+        results = list(iter_aids(filepath, meta))
     except FileNotFoundError:
         raise Exception(f"Fichier non trouvé: {filepath}")
+    _report_skipped(meta)
+    return {"results": results, "count": meta.get('count', len(results)), "skipped": meta['skipped']}
 
-def convert_to_csv(json_data, output_file):
-    """Convertit les données JSON en CSV"""
+# Colonnes CSV, compilées une fois depuis le schéma déclaratif (cf. aid_schema.py)
+FIELDNAMES = CLEAN_SCHEMA.header
+
+def _csv_writer(stream):
+    return csv.writer(stream, delimiter=';')
+
+def format_chunk(aids, with_backers=False):
+    """Met en forme une tranche d'aides en texte CSV (exécuté dans un processus du pool)"""
+    schema = CLEAN_BACKER_SCHEMA if with_backers else CLEAN_SCHEMA
+    buffer = io.StringIO(newline='')
+    _csv_writer(buffer).writerows(schema.rows(aids))
+    return len(aids), buffer.getvalue()
+
+def convert_to_csv(json_data, output_file, meta=None, workers=1, chunk_size=DEFAULT_CHUNK_SIZE, backers=None,
+                   incremental=False, stats=None):
+    """
+    Convertit les données JSON en CSV.
+    `json_data` peut être un dictionnaire {"results": [...]}, une liste
+    ou un générateur d'aides (cf. aides_reader.iter_aids) consommé au fil de l'eau.
+    Avec `workers` > 1, les tranches de `chunk_size` aides sont aplaties et nettoyées
+    en parallèle ; le fichier produit est identique octet pour octet.
+    Avec `backers` (un backer_index.BackerIndex), les identifiants de porteur et de
+    groupe de chaque financeur sont ajoutés en fin de ligne.
+    Avec `incremental`, les lignes des aides inchangées depuis la conversion précédente
+    (cf. aid_diff, manifeste <sortie>.manifest.json) sont reprises du CSV existant.
+    Avec `stats` (un run_stats.RunStats), le temps passé à lire les aides, les mettre
+    en forme, nettoyer le HTML et écrire le fichier est mesuré séparément.
+    """
+    stats = stats or RunStats('convert_to_csv', enabled=False)
+    cleaner = default_cleaner()
+    cleaner_before = {'seconds': cleaner.seconds, 'hits': cleaner.hits, 'misses': cleaner.misses}
     
     # Extrait les résultats
-    if 'results' in json_data:
-        aids = json_data['results']
-        total_count = json_data.get('count', len(aids))
+    if isinstance(json_data, dict):
+        if 'results' in json_data:
+            aids = json_data['results']
+            meta = {'count': json_data.get('count', len(aids))}
+        else:
+            aids = [json_data]
     else:
-        # Si c'est directement une liste
-        aids = json_data if isinstance(json_data, list) else [json_data]
-        total_count = len(aids)
+        # Liste ou générateur d'aides
+        aids = json_data
     
-    if not aids:
+    aids = stats.timed(iter(aids), 'parse')
+    first = next(aids, None)
+    if first is None:
         raise Exception("Aucune aide trouvée dans le fichier JSON")
-    
-    print(f"📊 {len(aids)} aides trouvées (total: {total_count})")
-    
-    # Définit les colonnes CSV
-    fieldnames = [
-        'id', 'name', 'name_initial', 'short_title', 'slug', 'url',
-        'financers', 'instructors', 'programs', 
-        'description_clean', 'eligibility_clean',
-        'perimeter', 'perimeter_scale',
-        'categories', 'targeted_audiences', 'aid_types', 'destinations',
-        'is_call_for_project', 'is_charged',
-        'start_date', 'predeposit_date', 'submission_deadline',
-        'subvention_rate_lower_bound', 'subvention_rate_upper_bound',
-        'loan_amount', 'recoverable_advance_amount',
-        'contact_clean', 'origin_url', 'application_url'
-    ]
-    
-    # Écrit le CSV
-    with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames, delimiter=';')
-        writer.writeheader()
-        
-        for aid in aids:
-            row = {
-                'id': aid.get('id', ''),
-                'name': aid.get('name', ''),
-                'name_initial': aid.get('name_initial', ''),
-                'short_title': aid.get('short_title', ''),
-                'slug': aid.get('slug', ''),
-                'url': aid.get('url', ''),
-                'financers': extract_list_items(aid.get('financers', [])),
-                'instructors': extract_list_items(aid.get('instructors', [])),
-                'programs': extract_list_items(aid.get('programs', [])),
-                'description_clean': clean_html(aid.get('description', '')),
-                'eligibility_clean': clean_html(aid.get('eligibility', '')),
-                'perimeter': aid.get('perimeter', ''),
-                'perimeter_scale': aid.get('perimeter_scale', ''),
-                'categories': extract_list_items(aid.get('categories', [])),
-                'targeted_audiences': extract_list_items(aid.get('targeted_audiences', [])),
-                'aid_types': extract_list_items(aid.get('aid_types', [])),
-                'destinations': extract_list_items(aid.get('destinations', [])),
-                'is_call_for_project': aid.get('is_call_for_project', ''),
-                'is_charged': aid.get('is_charged', ''),
-                'start_date': aid.get('start_date', ''),
-                'predeposit_date': aid.get('predeposit_date', ''),
-                'submission_deadline': aid.get('submission_deadline', ''),
-                'subvention_rate_lower_bound': aid.get('subvention_rate_lower_bound', ''),
-                'subvention_rate_upper_bound': aid.get('subvention_rate_upper_bound', ''),
-                'loan_amount': aid.get('loan_amount', ''),
-                'recoverable_advance_amount': aid.get('recoverable_advance_amount', ''),
-                'contact_clean': clean_html(aid.get('contact', '')),
-                'origin_url': aid.get('origin_url', ''),
-                'application_url': aid.get('application_url', '')
-            }
-            writer.writerow(row)
-    
+    aids = chain([first], aids)
+    if backers is not None:
+        # Résolution dans le processus principal : l'index n'est pas copié dans chaque processus
+        aids = stats.timed(backers.enrich_all(aids), 'backers')
+    
+    schema = CLEAN_BACKER_SCHEMA if backers is not None else CLEAN_SCHEMA
+    if incremental:
+        # Seules les aides ajoutées ou modifiées sont remises en forme, dans ce processus
+        with stats.stage('format'):
+            diff = write_incremental_csv(aids, output_file, schema, _csv_writer)
+        written = sum(diff.counts[status] for status in ('added', 'modified', 'unchanged'))
+        for status, count in diff.counts.items():
+            stats.set(f"incremental_{status}", count)
+        print(f"🔁 Incrémental : {diff.summary()}")
+    else:
+        # Écrit le CSV
+        with stats.stage('write'), atomic_open(output_file, newline='') as csvfile:
+            _csv_writer(csvfile).writerow(schema.header)
+            
+            written = 0
+            format_func = partial(format_chunk, with_backers=backers is not None)
+            # Avec workers > 1, 'format' est l'attente des résultats du pool
+            for count, text in stats.timed(map_chunks(format_func, aids, workers, chunk_size), 'format'):
+                with stats.stage('write'):
+                    csvfile.write(text)
+                written += count
+        # Le manifeste d'une conversion --incremental précédente ne décrit plus ce fichier
+        discard_manifest(output_file)
+    # En incrémental, la remise en forme reste dans ce processus
+    stats.add_html_cleaner(cleaner, cleaner_before, 1 if incremental else workers)
+    stats.set('records_written', written)
+    stats.set('bytes_written', Path(output_file).stat().st_size)
+    
+    total_count = (meta or {}).get('count', written)
+    print(f"📊 {written} aides converties (total: {total_count})")
     print(f"✅ CSV créé: {output_file}")
 
 def main():
     parser = argparse.ArgumentParser(description='Convertit un JSON Aides-Territoires en CSV')
     parser.add_argument('input_file', help='Fichier JSON source')
     parser.add_argument('-o', '--output', help='Fichier CSV de sortie (optionnel)')
+    parser.add_argument('--format', choices=('csv',) + FORMATS, default='csv',
+                        help='Format de sortie : csv, ou colonnes avec listes conservées (parquet/arrow nécessitent pyarrow)')
+    parser.add_argument('--compression', choices=COMPRESSIONS,
+                        help='Compression des formats parquet/arrow/ndjson (défaut : zstd, gzip pour ndjson)')
+    parser.add_argument('--workers', type=int, default=1, help='Nombre de processus de conversion (défaut : 1)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f'Aides par tranche envoyée à un processus (défaut : {DEFAULT_CHUNK_SIZE})')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Ne remet en forme que les aides ajoutées ou modifiées depuis la conversion précédente '
+                             '(manifeste <sortie>.manifest.json) ; format csv uniquement')
+    parser.add_argument('--backers', nargs='?', const=DEFAULT_INDEX, metavar='INDEX',
+                        help=f'Ajoute les identifiants de porteur et de groupe des financeurs, '
+                             f'depuis un index de backer_index.py (défaut : {DEFAULT_INDEX}) ; format csv uniquement')
+    add_stats_arguments(parser)
     
     args = parser.parse_args()
+    stats = RunStats('json_to_csv_converter', enabled=bool(args.stats))
     
     # Génère le nom de sortie si non spécifié
+    compression = args.compression or default_compression(args.format)
     if args.output:
         output_file = args.output
     else:
         input_path = Path(args.input_file)
-        output_file = input_path.with_suffix('.csv')
+        suffix = '.csv' if args.format == 'csv' else output_suffix(args.format, compression)
+        output_file = input_path.with_suffix(suffix)
     
     try:
-        print(f"🔄 Lecture de {args.input_file}...")
-        json_data = parse_json_file(args.input_file)
+        if not Path(args.input_file).is_file():
+            raise Exception(f"Fichier non trouvé: {args.input_file}")
+        if args.incremental and args.format != 'csv':
+            raise Exception("--incremental n'est disponible que pour le format csv")
+        backers = None
+        if args.backers:
+            if args.format != 'csv':
+                raise Exception("--backers n'est disponible que pour le format csv")
+            if not Path(args.backers).is_file():
+                raise Exception(f"Index des porteurs non trouvé: {args.backers} (python backer_index.py build)")
+            backers = BackerIndex.load(args.backers)
         
+        print(f"🔄 Lecture en flux de {args.input_file}...")
         print(f"🔄 Conversion vers {output_file}...")
-        convert_to_csv(json_data, output_file)
+        # La lecture tolérante répare le fichier au fil de l'eau, sans seconde passe
+        meta = {}
+        with profiling(stats, args.profile, args.tracemalloc):
+            if args.format == 'csv':
+                convert_to_csv(iter_aids(args.input_file, meta), output_file, meta, args.workers, args.chunk_size,
+                               backers, args.incremental, stats)
+            else:
+                export_meta = {}
+                with stats.stage('export'):
+                    written = export_columnar(stats.timed(iter_aids(args.input_file, meta), 'parse'), output_file,
+                                              args.format, compression, args.workers, args.chunk_size, export_meta)
+                _report_unparsed(export_meta)
+                stats.set('unparsed_values', sum(export_meta['unparsed'].values()))
+                stats.set('dropped_values', sum(export_meta['dropped'].values()))
+                stats.set('records_written', written)
+                stats.set('bytes_written', Path(output_file).stat().st_size)
+                print(f"📊 {written} aides converties (total: {meta.get('count', written)})")
+                print(f"✅ Fichier {args.format} créé: {output_file}")
+        _report_skipped(meta)
+        stats.set('bytes_read', Path(args.input_file).stat().st_size)
+        stats.add_read_meta(meta)
+        stats.set('workers', args.workers)
+        if args.stats:
+            stats.write(args.stats)
         
         print("🎉 Conversion terminée avec succès !")
         
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Préparation des lots d'aides envoyés au LLM (webhook n8n, filterAidesPass1...)
+Au lieu des aides brutes (HTML, champs *_full, logos...) :
+- chaque aide est réduite aux champs utiles aux prompts, textes nettoyés
+  (cf. html_cleaner) et tronqués à `max_words` mots comme dans aidFinder.js
+- les aides dont le contenu réduit est identique à l'id et à l'URL près (fiches
+  dupliquées, aide répétée dans l'export) ne sont envoyées qu'une fois, sous l'id de
+  la première, les autres dans "duplicate_ids" : aucune candidate n'est perdue.
+  Les déclinaisons d'une aide sur des périmètres différents restent distinctes
+- dans un lot, un texte déjà présent est remplacé par un renvoi "(identique à l'aide N)"
+- les aides sont regroupées, dans l'ordre d'entrée, en lots sous un budget de
+  jetons estimés (tiktoken si installé, sinon ~4 octets par jeton) et d'octets ;
+  le budget s'applique à la ligne entière, enveloppe et contexte compris
+
+Sortie : un lot par ligne (JSONL), au format du payload de selectAidesWithN8N
+({job_id, batch_id, key_elements, projectContext, keywords, aides}) si --context est fourni.
+
+Exemple :
+    python payload_packer.py aides.json -o lots.jsonl --max-tokens 6000 --context projet.json
+"""
+
+import argparse
+import json
+import sys
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+from aides_reader import iter_aids
+from atomic_files import atomic_open
+from html_cleaner import clean_html
+
+DEFAULT_MAX_TOKENS = 6000
+DEFAULT_MAX_WORDS = 300
+BYTES_PER_TOKEN = 4
+CONTEXT_KEYS = ('key_elements', 'projectContext', 'keywords')
+TEXT_FIELDS = ('description', 'eligibility')
+# Séparateur des aides dans la liste "aides" (json.dumps par défaut), compté avec chacune
+ITEM_SEPARATOR = ', '
+# Numéro de lot et nombre de jetons les plus longs envisagés pour mesurer l'enveloppe
+ENVELOPE_PLACEHOLDER = 10 ** 9
+
+_encoding = None
+
+
+def estimate_tokens(text):
+    """Nombre de jetons : exact avec tiktoken, sinon estimé d'après la taille UTF-8"""
+    global _encoding
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding('o200k_base')
+        return len(_encoding.encode(text))
+    return -(-len(text.encode('utf-8')) // BYTES_PER_TOKEN)
+
+
+def _names(items):
+    return [item.get('name', '') if isinstance(item, dict) else item for item in items or []]
+
+
+def _truncate(text, max_words):
+    words = text.split()
+    if max_words and len(words) > max_words:
+        return ' '.join(words[:max_words]) + ' […]'
+    return text
+
+
+def slim_aid(aid, max_words=DEFAULT_MAX_WORDS):
+    """Champs utiles aux prompts ; les valeurs vides sont omises"""
+    slim = {
+        'name': aid.get('name'),
+        'url': aid.get('url'),
+        'financers': _names(aid.get('financers')),
+        'targeted_audiences': _names(aid.get('targeted_audiences')),
+        'aid_types': _names(aid.get('aid_types')),
+        'categories': _names(aid.get('categories')),
+        'perimeter': aid.get('perimeter'),
+        'submission_deadline': aid.get('submission_deadline'),
+        'subvention_rate_upper_bound': aid.get('subvention_rate_upper_bound'),
+        'is_call_for_project': aid.get('is_call_for_project'),
+    }
+    for field in TEXT_FIELDS:
+        slim[field] = _truncate(clean_html(aid.get(field)), max_words)
+    return {key: value for key, value in slim.items() if value not in (None, '', [])}
+
+
+def merge_duplicates(aids, max_words=DEFAULT_MAX_WORDS):
+    """
+    Réduit les aides et fusionne celles dont le contenu réduit est identique :
+    renvoie des entrées {"id": ..., **champs, "duplicate_ids": [...]} dans l'ordre de
+    première apparition ("duplicate_ids" seulement s'il y a des doublons).
+    Une aide répétée dans l'export (même id, même contenu) n'apparaît qu'une fois.
+    """
+    entries = {}
+    for aid in aids:
+        if aid.get('id') is None:
+            continue
+        slim = slim_aid(aid, max_words)
+        # L'URL contient le slug, propre à chaque déclinaison : elle ne compte pas
+        key = json.dumps({k: v for k, v in slim.items() if k != 'url'}, sort_keys=True, ensure_ascii=False)
+        entry = entries.get(key)
+        if entry is None:
+            entries[key] = {'id': aid['id'], **slim}
+        elif aid['id'] != entry['id'] and aid['id'] not in entry.get('duplicate_ids', ()):
+            entry.setdefault('duplicate_ids', []).append(aid['id'])
+    return list(entries.values())
+
+
+class BatchPacker:
+    """Regroupe des entrées en lots sous un budget de jetons et d'octets, dans l'ordre"""
+
+    def __init__(self, max_tokens=DEFAULT_MAX_TOKENS, max_bytes=None, max_aids=None):
+        self.max_tokens = max_tokens
+        self.max_bytes = max_bytes
+        self.max_aids = max_aids
+
+    def _render(self, entry, seen):
+        """Entrée telle qu'écrite dans le lot : textes déjà présents remplacés par un renvoi"""
+        rendered = dict(entry)
+        for field in TEXT_FIELDS:
+            text = rendered.get(field)
+            if text and text in seen:
+                rendered[field] = f"(identique à l'aide {seen[text]})"
+        return rendered
+
+    def pack(self, entries):
+        """
+        Génère des lots {"aides": [...], "tokens": ..., "bytes": ...}.
+        Une entrée dépassant à elle seule le budget forme un lot à part, signalé par "over_budget".
+        """
+        batch, seen, tokens, size = [], {}, 0, 0
+        for entry in entries:
+            rendered = self._render(entry, seen)
+            cost, length = self._cost(rendered)
+            full = batch and (
+                tokens + cost > self.max_tokens
+                or (self.max_bytes and size + length > self.max_bytes)
+                or (self.max_aids and len(batch) >= self.max_aids)
+            )
+            if full:
+                yield self._batch(batch, tokens, size)
+                batch, seen, tokens, size = [], {}, 0, 0
+                rendered = self._render(entry, seen)
+                cost, length = self._cost(rendered)
+            batch.append(rendered)
+            tokens += cost
+            size += length
+            for field in TEXT_FIELDS:
+                if entry.get(field):
+                    seen.setdefault(entry[field], entry['id'])
+        if batch:
+            yield self._batch(batch, tokens, size)
+
+    @staticmethod
+    def _cost(rendered):
+        """Jetons et octets d'une entrée dans la liste, séparateur compris"""
+        text = json.dumps(rendered, ensure_ascii=False) + ITEM_SEPARATOR
+        return estimate_tokens(text), len(text.encode('utf-8'))
+
+    def _batch(self, aides, tokens, size):
+        batch = {'aides': aides, 'tokens': tokens, 'bytes': size}
+        if tokens > self.max_tokens or (self.max_bytes and size > self.max_bytes):
+            batch['over_budget'] = True
+        return batch
+
+
+def render_payload(aides, batch_id, tokens, context=None, job_id=None):
+    """Ligne JSONL d'un lot, au format du payload de selectAidesWithN8N"""
+    payload = {'batch_id': batch_id, **(context or {}), 'aides': aides, 'estimated_tokens': tokens}
+    if job_id is not None:
+        payload = {'job_id': job_id, **payload}
+    return json.dumps(payload, ensure_ascii=False)
+
+
+def envelope_cost(context=None, job_id=None):
+    """Jetons et octets d'une ligne sans ses aides (job_id, batch_id, contexte, estimated_tokens)"""
+    text = render_payload([], ENVELOPE_PLACEHOLDER, ENVELOPE_PLACEHOLDER, context, job_id)
+    return estimate_tokens(text), len(text.encode('utf-8'))
+
+
+def load_ids(filepath):
+    """Ids retenus, dans l'ordre : un par ligne, liste JSON d'ids ou d'objets {"id": ...} (aid_search --json)"""
+    with open(filepath, encoding='utf-8') as f:
+        content = f.read().strip()
+    if content.startswith('['):
+        return [item['id'] if isinstance(item, dict) else item for item in json.loads(content)]
+    return [int(line) for line in content.split() if line.strip()]
+
+
+def select_aids(aids, ids):
+    """Aides dont l'id est dans `ids`, dans l'ordre de `ids` (classement d'aid_search...)"""
+    rank = {aid_id: position for position, aid_id in enumerate(ids)}
+    selected = [aid for aid in aids if aid.get('id') in rank]
+    selected.sort(key=lambda aid: rank[aid['id']])
+    return selected
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prépare des lots d'aides compacts pour les appels LLM / n8n")
+    parser.add_argument('input_file', help='Fichier JSON des aides')
+    parser.add_argument('-o', '--output', default='lots.jsonl', help='Fichier JSONL de sortie (défaut : lots.jsonl)')
+    parser.add_argument('--max-tokens', type=int, default=DEFAULT_MAX_TOKENS,
+                        help=f'Budget de jetons par lot (défaut : {DEFAULT_MAX_TOKENS})')
+    parser.add_argument('--max-bytes', type=int, help='Budget d\'octets par lot')
+    parser.add_argument('--max-aids', type=int, help='Nombre maximal d\'aides par lot')
+    parser.add_argument('--max-words', type=int, default=DEFAULT_MAX_WORDS,
+                        help=f'Mots gardés par description (défaut : {DEFAULT_MAX_WORDS}, 0 : tout)')
+    parser.add_argument('--ids-file', help='Ids à garder, dans l\'ordre (ex. sortie de aid_search.py --json)')
+    parser.add_argument('--context', help='JSON avec key_elements, projectContext et keywords, ajoutés à chaque lot')
+    parser.add_argument('--job-id', help='job_id ajouté à chaque lot')
+    args = parser.parse_args()
+
+    try:
+        context = {}
+        if args.context:
+            with open(args.context, encoding='utf-8') as f:
+                context = {key: value for key, value in json.load(f).items() if key in CONTEXT_KEYS}
+        aids = iter_aids(args.input_file)
+        if args.ids_file:
+            aids = select_aids(aids, load_ids(args.ids_file))
+
+        raw_count = raw_tokens = 0
+
+        def measured(aids):
+            nonlocal raw_count, raw_tokens
+            for aid in aids:
+                raw_count += 1
+                raw_tokens += estimate_tokens(json.dumps(aid, ensure_ascii=False))
+                yield aid
+
+        # L'enveloppe et le contexte, répétés sur chaque ligne, sont retirés du budget des aides
+        envelope_tokens, envelope_bytes = envelope_cost(context, args.job_id)
+        if envelope_tokens >= args.max_tokens or (args.max_bytes and envelope_bytes >= args.max_bytes):
+            raise Exception(f"Le contexte occupe à lui seul le budget d'un lot (~{envelope_tokens} jetons, "
+                            f"{envelope_bytes} octets)")
+        entries = merge_duplicates(measured(aids), args.max_words)
+        packer = BatchPacker(args.max_tokens - envelope_tokens,
+                             args.max_bytes and args.max_bytes - envelope_bytes, args.max_aids)
+        batches = packed_tokens = over_budget = 0
+        with atomic_open(args.output) as f:
+            for batch in packer.pack(entries):
+                batches += 1
+                tokens = batch['tokens'] + envelope_tokens
+                packed_tokens += tokens
+                over_budget += batch.get('over_budget', False)
+                f.write(render_payload(batch['aides'], batches, tokens, context, args.job_id) + '\n')
+    except FileNotFoundError as e:
+        print(f"❌ Erreur: Fichier non trouvé: {e.filename}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"❌ Erreur: {e}")
+        sys.exit(1)
+
+    print(f"📊 {raw_count} aides -> {len(entries)} entrées distinctes -> {batches} lot(s)")
+    print(f"   jetons estimés : {raw_tokens} bruts -> {packed_tokens} envoyés"
+          f" ({'tiktoken' if tiktoken is not None else f'~{BYTES_PER_TOKEN} octets/jeton'})")
+    if over_budget:
+        print(f"⚠️ {over_budget} lot(s) d'une seule aide dépassent le budget")
+    print(f"✅ Lots écrits dans {args.output}")
+
+
+if __name__ == '__main__':
+    main()
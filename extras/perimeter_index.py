@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+Index des périmètres (adhoc_perimeters.json produit par fetch_perimeters.py)
+- recherche exacte par code, code postal et identifiant ("108828-cc-sud-luberon-cotelub" ou "108828")
+- recherche par préfixe sur le nom/libellé, insensible aux accents et à la casse,
+  y compris en milieu de nom ("luberon" trouve "CC Sud-Luberon (COTELUB)")
+- recherche approchée par trigrammes (similarité de Dice, comme pg_trgm), pour les fautes de frappe :
+  chaque mot de la requête est comparé au mot le plus proche du nom ("marseile"
+  trouve "Aix-Marseille-Provence", "lubron" trouve "CC Sud-Luberon (COTELUB)")
+
+L'index est écrit dans un fichier binaire ouvert avec mmap : rien n'est
+décodé au démarrage, chaque recherche est une dichotomie sur des tables triées
+lues directement dans le fichier. Seuls les périmètres trouvés sont décodés ;
+la recherche approchée se calcule entièrement sur le vocabulaire des noms
+(mots normalisés et nombre de trigrammes de chacun, précalculés).
+
+Format du fichier :
+    en-tête  : MAGIC, version, nombre de sections
+    sommaire : (nom sur 16 octets, offset, longueur) par section
+    sections : alignées sur 8 octets
+        records.offsets / records.data : un JSON par périmètre
+        records.grams : nombre de trigrammes (mot par mot) du nom de chaque périmètre
+        word.grams : nombre de trigrammes de chaque mot du vocabulaire (table word)
+        <table>.koffsets / <table>.keys : clés UTF-8 triées
+        <table>.ranges / <table>.values : numéros des périmètres de chaque clé
+            (pour wgram : rangs dans la table word des mots contenant le trigramme)
+"""
+
+import argparse
+import csv
+import heapq
+import json
+import mmap
+import os
+import struct
+import sys
+import unicodedata
+from array import array
+from collections import Counter, defaultdict
+
+from atomic_files import atomic_open
+
+MAGIC = b'PERIIDX\x00'
+VERSION = 3
+_HEADER = struct.Struct('<8sII')
+_SECTION = struct.Struct('<16sQQ')
+TABLES = ('code', 'zipcode', 'id', 'name', 'word', 'wgram')
+# Seuil de la recherche approchée ; une requête courte a peu de trigrammes,
+# une seule faute y pèse plus lourd
+FUZZY_CUTOFF = 0.4
+SHORT_QUERY_CUTOFF = 0.3
+SHORT_QUERY_LENGTH = 6
+# En deçà, un mot du vocabulaire ne compte pas comme proche d'un mot de la requête
+# (un seul trigramme commun, comme "  d" pour "de" et "dijon") : les mots courants
+# de la requête ne parcourent pas tout le catalogue
+MIN_WORD_SIMILARITY = 0.25
+# Mots de liaison des noms de lieux, ignorés par la recherche approchée
+# sauf si la requête n'a rien d'autre ("pays de la loire" -> "pays", "loire")
+LINK_WORDS = frozenset('a au aux d de des du en et l la le les sur sous'.split())
+
+
+def normalize(text):
+    """Minuscules, sans accents, ponctuation remplacée par des espaces"""
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKD', str(text).lower())
+    text = ''.join(char if char.isalnum() else ' ' for char in text if not unicodedata.combining(char))
+    return ' '.join(text.split())
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def word_trigrams(text):
+    """Trigrammes de chaque mot, complété par des espaces comme dans pg_trgm"""
+    grams = set()
+    for word in text.split():
+        grams |= trigrams(word)
+    return grams
+
+
+def _name_keys(perimeter):
+    """Nom et libellé normalisés, et chacune de leurs fins de mots pour la recherche en milieu de nom"""
+    keys = set()
+    for value in (perimeter.get('name'), perimeter.get('text')):
+        words = normalize(value).split()
+        for i in range(len(words)):
+            keys.add(' '.join(words[i:]))
+    return keys
+
+
+def _fuzzy_name(perimeter):
+    return normalize(perimeter.get('name') or perimeter.get('text'))
+
+
+def load_perimeters(filepath):
+    """Lit un export JSON (liste de périmètres) ou CSV de fetch_perimeters.py"""
+    if filepath.endswith('.csv'):
+        with open(filepath, encoding='utf-8', newline='') as f:
+            return list(csv.DictReader(f))
+    with open(filepath, encoding='utf-8') as f:
+        return json.load(f)
+
+
+# --- Construction ---
+
+def _collect_tables(perimeters):
+    tables = {name: defaultdict(list) for name in TABLES}
+    for index, perimeter in enumerate(perimeters):
+        code = perimeter.get('code')
+        if code:
+            tables['code'][str(code)].append(index)
+        for zipcode in perimeter.get('zipcodes') or ():
+            tables['zipcode'][str(zipcode)].append(index)
+        slug_id = perimeter.get('id')
+        if slug_id:
+            slug_id = str(slug_id)
+            tables['id'][slug_id].append(index)
+            numeric = slug_id.split('-', 1)[0]
+            if numeric.isdigit() and numeric != slug_id:
+                tables['id'][numeric].append(index)
+        for key in _name_keys(perimeter):
+            tables['name'][key].append(index)
+        for word in _fuzzy_name(perimeter).split():
+            tables['word'][word].append(index)
+    return tables
+
+
+def _vocabulary_sections(tables):
+    """Trigrammes -> rangs des mots (table wgram) et nombre de trigrammes par mot"""
+    # Même ordre que _table_sections : les rangs sont ceux de la table word
+    words = sorted(tables['word'], key=lambda word: word.encode('utf-8'))
+    counts = array('I')
+    for position, word in enumerate(words):
+        grams = trigrams(word)
+        counts.append(len(grams))
+        for gram in grams:
+            tables['wgram'][gram].append(position)
+    return [('word.grams', counts.tobytes())]
+
+
+def _pad(data):
+    return data + b'\x00' * (-len(data) % 8)
+
+
+def _table_sections(name, mapping):
+    keys = sorted(key.encode('utf-8') for key in mapping)
+    koffsets = array('Q', [0])
+    ranges = array('Q', [0])
+    values = array('I')
+    for key in keys:
+        koffsets.append(koffsets[-1] + len(key))
+        values.extend(sorted(set(mapping[key.decode('utf-8')])))
+        ranges.append(len(values))
+    return [
+        (f'{name}.koffsets', koffsets.tobytes()),
+        (f'{name}.keys', b''.join(keys)),
+        (f'{name}.ranges', ranges.tobytes()),
+        (f'{name}.values', values.tobytes()),
+    ]
+
+
+def build_index(perimeters):
+    """Sérialise l'index ; renvoie les octets du fichier"""
+    records = [json.dumps(perimeter, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+               for perimeter in perimeters]
+    offsets = array('Q', [0])
+    for record in records:
+        offsets.append(offsets[-1] + len(record))
+    grams = array('I', (len(word_trigrams(_fuzzy_name(perimeter))) for perimeter in perimeters))
+    sections = [('records.offsets', offsets.tobytes()), ('records.data', b''.join(records)),
+                ('records.grams', grams.tobytes())]
+    tables = _collect_tables(perimeters)
+    sections.extend(_vocabulary_sections(tables))
+    for name, mapping in tables.items():
+        sections.extend(_table_sections(name, mapping))
+
+    position = _HEADER.size + _SECTION.size * len(sections)
+    position += -position % 8
+    directory = []
+    for name, data in sections:
+        directory.append(_SECTION.pack(name.encode('ascii'), position, len(data)))
+        position += len(_pad(data))
+    head = _HEADER.pack(MAGIC, VERSION, len(sections)) + b''.join(directory)
+    return _pad(head) + b''.join(_pad(data) for _, data in sections)
+
+
+def write_index(perimeters, path):
+    with atomic_open(path, 'wb') as f:
+        f.write(build_index(perimeters))
+
+
+# --- Lecture ---
+
+class _Table:
+    """Table triée clé -> numéros de périmètres, lue dans le mmap"""
+
+    def __init__(self, koffsets, keys, ranges, values):
+        self.koffsets = koffsets
+        self.keys = keys
+        self.ranges = ranges
+        self.values = values
+
+    def __len__(self):
+        return len(self.koffsets) - 1
+
+    def key(self, i):
+        return bytes(self.keys[self.koffsets[i]:self.koffsets[i + 1]])
+
+    def lower_bound(self, key):
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self.key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def entries(self, i):
+        return self.values[self.ranges[i]:self.ranges[i + 1]]
+
+    def find(self, key):
+        key = key.encode('utf-8')
+        i = self.lower_bound(key)
+        if i < len(self) and self.key(i) == key:
+            return list(self.entries(i))
+        return []
+
+    def prefix(self, prefix):
+        """Génère (clé, numéros) pour chaque clé commençant par `prefix`, dans l'ordre"""
+        prefix = prefix.encode('utf-8')
+        for i in range(self.lower_bound(prefix), len(self)):
+            key = self.key(i)
+            if not key.startswith(prefix):
+                return
+            yield key, self.entries(i)
+
+
+class PerimeterIndex:
+    """Index ouvert en mmap ; à fermer avec close() ou un bloc with"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mmap)
+        magic, version, count = _HEADER.unpack_from(self.mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self.view.release()
+            self.mmap.close()
+            raise ValueError(f"{path} n'est pas un index de périmètres (version {VERSION})")
+        # Toutes les vues sur le mmap sont gardées pour être libérées par close()
+        self._views = [self.view]
+        sections = {}
+        for i in range(count):
+            name, offset, length = _SECTION.unpack_from(self.mmap, _HEADER.size + i * _SECTION.size)
+            sections[name.rstrip(b'\x00').decode('ascii')] = self._slice(offset, length)
+        self.record_offsets = self._cast(sections['records.offsets'], 'Q')
+        self.records = sections['records.data']
+        self.grams = self._cast(sections['records.grams'], 'I')
+        self.word_grams = self._cast(sections['word.grams'], 'I')
+        self.tables = {
+            name: _Table(self._cast(sections[f'{name}.koffsets'], 'Q'), sections[f'{name}.keys'],
+                         self._cast(sections[f'{name}.ranges'], 'Q'), self._cast(sections[f'{name}.values'], 'I'))
+            for name in TABLES
+        }
+
+    @classmethod
+    def open(cls, path):
+        return cls(path)
+
+    def _slice(self, offset, length):
+        view = self.view[offset:offset + length]
+        self._views.append(view)
+        return view
+
+    def _cast(self, view, fmt):
+        view = view.cast(fmt)
+        self._views.append(view)
+        return view
+
+    def close(self):
+        # Les vues doivent être libérées avant de fermer le mmap
+        for view in reversed(self._views):
+            view.release()
+        self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.record_offsets) - 1
+
+    def __getitem__(self, index):
+        start, end = self.record_offsets[index], self.record_offsets[index + 1]
+        return json.loads(bytes(self.records[start:end]))
+
+    def _records(self, indices):
+        return [self[index] for index in indices]
+
+    # --- Recherches exactes ---
+
+    def by_code(self, code):
+        """Périmètre de code `code` (ex. '248400285', 'FRA-MET'), ou None"""
+        found = self.tables['code'].find(str(code))
+        return self[found[0]] if found else None
+
+    def by_zipcode(self, zipcode):
+        """Périmètres couvrant le code postal"""
+        return self._records(self.tables['zipcode'].find(str(zipcode)))
+
+    def by_id(self, perimeter_id):
+        """Périmètre par identifiant complet ou numérique, ou None"""
+        found = self.tables['id'].find(str(perimeter_id))
+        return self[found[0]] if found else None
+
+    # --- Recherches sur le nom ---
+
+    def search(self, prefix, limit=10):
+        """Périmètres dont le nom (ou un de ses mots) commence par `prefix`"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        found = []
+        for _, entries in self.tables['name'].prefix(prefix):
+            for index in entries:
+                if index not in found:
+                    found.append(index)
+            if len(found) >= limit:
+                break
+        return self._records(found[:limit])
+
+    def fuzzy(self, query, limit=10, cutoff=None):
+        """
+        Périmètres au nom proche de `query`, du plus proche au moins proche.
+        Score : pour chaque mot de la requête, similarité de Dice avec le mot le plus
+        proche du nom, en moyenne ; à égalité, le nom le plus court (en trigrammes).
+        Par défaut, le seuil est abaissé pour les requêtes courtes.
+        """
+        query = normalize(query)
+        if not query:
+            return []
+        if cutoff is None:
+            cutoff = SHORT_QUERY_CUTOFF if len(query) < SHORT_QUERY_LENGTH else FUZZY_CUTOFF
+        words, word_grams = self.tables['word'], self.tables['wgram']
+        query_words = [word for word in query.split() if word not in LINK_WORDS] or query.split()
+        totals = Counter()
+        for query_word in query_words:
+            grams = trigrams(query_word)
+            # Mots du vocabulaire partageant au moins un trigramme avec le mot de la requête
+            votes = Counter()
+            for gram in grams:
+                votes.update(word_grams.find(gram))
+            best = {}
+            for position, shared in votes.items():
+                similarity = 2 * shared / (len(grams) + self.word_grams[position])
+                if similarity < MIN_WORD_SIMILARITY:
+                    continue
+                for index in words.entries(position):
+                    if similarity > best.get(index, 0.0):
+                        best[index] = similarity
+            totals.update(best)
+        minimum = cutoff * len(query_words)
+        grams = self.grams
+        best = heapq.nsmallest(limit, ((-total, grams[index], index) for index, total in totals.items()
+                                       if total >= minimum))
+        return self._records([index for _, _, index in best])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Construit ou interroge l'index des périmètres")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build = subparsers.add_parser('build', help="Construit l'index depuis un export JSON ou CSV")
+    build.add_argument('input_file', nargs='?', default='adhoc_perimeters.json')
+    build.add_argument('-o', '--output', help="Fichier d'index (défaut : <entrée>.idx)")
+
+    query = subparsers.add_parser('query', help="Interroge un index")
+    query.add_argument('index_file', nargs='?', default='adhoc_perimeters.idx')
+    group = query.add_mutually_exclusive_group(required=True)
+    group.add_argument('--code')
+    group.add_argument('--zipcode')
+    group.add_argument('--id')
+    group.add_argument('--search', help='Préfixe du nom')
+    group.add_argument('--fuzzy', help='Nom approché')
+    query.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'build':
+            output = args.output or os.path.splitext(args.input_file)[0] + '.idx'
+            perimeters = load_perimeters(args.input_file)
+            write_index(perimeters, output)
+            print(f"✅ Index de {len(perimeters)} périmètres écrit dans {output} ({os.path.getsize(output)} octets)")
+            return
+
+        with PerimeterIndex(args.index_file) as index:
+            if args.code:
+                results = [index.by_code(args.code)]
+            elif args.zipcode:
+                results = index.by_zipcode(args.zipcode)
+            elif args.id:
+                results = [index.by_id(args.id)]
+            elif args.search:
+                results = index.search(args.search, args.limit)
+            else:
+                results = index.fuzzy(args.fuzzy, args.limit)
+            results = [result for result in results if result]
+            if not results:
+                print("❌ Aucun périmètre trouvé")
+                sys.exit(1)
+            for result in results:
+                print(f"{result.get('id')}\t{result.get('code') or ''}\t{result.get('name')}")
+    except FileNotFoundError as e:
+        print(f"❌ Erreur: Fichier non trouvé: {e.filename}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
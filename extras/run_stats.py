@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Mesures d'une exécution des scripts (option --stats / --profile des convertisseurs
+et de fetch_perimeters.py)
+
+- durée de chaque étape (lecture/analyse, remise en forme, nettoyage HTML, écriture,
+  requêtes HTTP...) : une étape imbriquée dans une autre n'est comptée qu'une fois,
+  ce qui permet de chronométrer séparément un générateur et son consommateur
+- compteurs : aides, octets lus et écrits, zones réparées, requêtes, reprises...
+- pic de mémoire résidente (processus et processus fils)
+- sortie JSON lisible par une machine (fichier, ou sortie d'erreur pour ne pas se
+  mêler aux messages du script) ; profil cProfile et instantané tracemalloc en option
+
+Exemple :
+    stats = RunStats('json_to_csv_converter')
+    with stats.stage('parse'):
+        ...
+    for aid in stats.timed(iter_aids(path), 'parse'):
+        ...
+    stats.write('conversion.stats.json')
+"""
+
+import cProfile
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from atomic_files import atomic_open
+
+TRACEMALLOC_TOP = 10
+
+
+def percentiles(values):
+    """p50/p95/p99 en millisecondes (rang le plus proche)"""
+    if not values:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None}
+    ordered = sorted(values)
+    last = len(ordered) - 1
+    return {f"p{rank}_ms": round(ordered[min(last, int(last * rank / 100 + 0.5))] * 1000, 3)
+            for rank in (50, 95, 99)}
+
+
+def peak_rss_mb(who=None):
+    """Pic de mémoire résidente en Mo, None si le module resource est absent (Windows)"""
+    if resource is None:
+        return None
+    # ru_maxrss : kilo-octets sous Linux, octets sous macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF if who is None else who).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class RunStats:
+    """Chronomètres d'étapes et compteurs d'une exécution ; inactif avec enabled=False"""
+
+    def __init__(self, script, enabled=True):
+        self.script = script
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self.started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        self.stages = {}       # nom -> [secondes, entrées]
+        self.counters = {}
+        self.details = {}
+        self._running = []     # pile des étapes en cours : [nom, reprise]
+
+    # --- Étapes ---
+
+    def _enter(self, name):
+        now = time.perf_counter()
+        if self._running:
+            # L'étape englobante est suspendue pendant l'étape imbriquée
+            parent = self._running[-1]
+            self._charge(parent[0], now - parent[1])
+        self._running.append([name, now])
+        self.stages.setdefault(name, [0.0, 0])[1] += 1
+
+    def _exit(self):
+        now = time.perf_counter()
+        name, resumed = self._running.pop()
+        self._charge(name, now - resumed)
+        if self._running:
+            self._running[-1][1] = now
+
+    def _charge(self, name, seconds):
+        self.stages[name][0] += seconds
+
+    def stage(self, name):
+        """Contexte chronométrant une étape"""
+        if not self.enabled:
+            return nullcontext()
+        return self._stage(name)
+
+    @contextmanager
+    def _stage(self, name):
+        self._enter(name)
+        try:
+            yield
+        finally:
+            self._exit()
+
+    def timed(self, iterable, name):
+        """
+        Itère sur `iterable` en comptant le temps passé à produire chaque élément dans `name`.
+        Renvoie toujours un itérateur, que les mesures soient actives ou non.
+        """
+        if not self.enabled:
+            return iter(iterable)
+        return self._timed(iterable, name)
+
+    def _timed(self, iterable, name):
+        iterator = iter(iterable)
+        while True:
+            self._enter(name)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self._exit()
+            yield item
+
+    def carve(self, parent, name, seconds, calls=0):
+        """Attribue à `name` une part du temps déjà compté dans `parent` (mesurée ailleurs)"""
+        if not self.enabled or parent not in self.stages or seconds <= 0:
+            return
+        seconds = min(seconds, self.stages[parent][0])
+        self.stages[parent][0] -= seconds
+        stage = self.stages.setdefault(name, [0.0, 0])
+        stage[0] += seconds
+        stage[1] += calls
+
+    # --- Compteurs ---
+
+    def count(self, name, value=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set(self, name, value):
+        if self.enabled:
+            self.counters[name] = value
+
+    def add_read_meta(self, meta):
+        """Pages, total annoncé et zones réparées rapportés par aides_reader"""
+        skipped = meta.get('skipped') or []
+        self.set('pages', meta.get('pages', 0))
+        if 'count' in meta:
+            self.set('announced_count', meta['count'])
+        self.set('repair_events', len(skipped))
+        self.set('repair_bytes', sum(end - start for start, end in skipped))
+
+    def add_html_cleaner(self, cleaner, before=None, workers=1):
+        """
+        Temps et mémo du nettoyeur HTML, retirés de l'étape 'format' qui l'englobe.
+        Avec `workers` > 1, le nettoyage a lieu dans les processus fils : l'étape
+        est signalée comme non mesurée plutôt que rapportée à zéro.
+        """
+        if not self.enabled:
+            return
+        if workers > 1:
+            self.details.setdefault('unavailable', {})['html_clean'] = \
+                f"nettoyage HTML dans les processus fils (--workers {workers}), compté dans 'format'"
+            return
+        before = before or {'seconds': 0.0, 'hits': 0, 'misses': 0}
+        cleaned = cleaner.misses - before['misses']
+        self.carve('format', 'html_clean', cleaner.seconds - before['seconds'], cleaned)
+        if cleaned or cleaner.hits > before['hits']:
+            self.set('html_memo_hits', cleaner.hits - before['hits'])
+            self.set('html_cleaned', cleaned)
+
+    def add_http_client(self, client):
+        """Requêtes, reprises, cache et latence par page d'un AidesTerritoiresClient"""
+        snapshot = client.stats_snapshot()
+        latencies = snapshot.pop('latencies')
+        for name, value in snapshot.items():
+            self.set(f"http_{name}", value)
+        self.details['http_latency'] = {**percentiles(latencies),
+                                        'max_ms': round(max(latencies) * 1000, 3) if latencies else None}
+
+    # --- Rapport ---
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            'script': self.script,
+            'argv': sys.argv[1:],
+            'started_at': self.started_at,
+            'elapsed_s': round(elapsed, 4),
+            'stages': {name: {'seconds': round(seconds, 4), 'calls': calls,
+                              'share': round(seconds / elapsed, 3) if elapsed else None}
+                       for name, (seconds, calls) in sorted(self.stages.items(), key=lambda item: -item[1][0])},
+            'counters': self.counters,
+            **self.details,
+            'peak_rss_mb': peak_rss_mb(),
+            'peak_rss_children_mb': peak_rss_mb(resource.RUSAGE_CHILDREN) if resource is not None else None,
+            'python': sys.version.split()[0],
+        }
+
+    def write(self, path):
+        """Écrit le rapport JSON dans `path`, ou sur la sortie d'erreur pour '-'"""
+        if not self.enabled:
+            return
+        text = json.dumps(self.report(), indent=2, ensure_ascii=False)
+        if path == '-':
+            # La sortie standard porte les messages du script : le JSON reste lisible à part
+            print(text, file=sys.stderr)
+            return
+        with atomic_open(path) as f:
+            f.write(text + '\n')
+        print(f"📊 Statistiques écrites dans {path}")
+
+
+@contextmanager
+def profiling(stats, profile_path=None, tracemalloc_path=None):
+    """
+    Profil cProfile (à lire avec pstats ou snakeviz) et instantané tracemalloc
+    (tracemalloc.Snapshot.load) de l'exécution ; les allocations principales et le
+    pic tracé sont aussi ajoutés aux statistiques.
+    """
+    profiler = cProfile.Profile() if profile_path else None
+    if tracemalloc_path:
+        tracemalloc.start()
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+            print(f"📊 Profil cProfile écrit dans {profile_path}")
+        if tracemalloc_path:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            snapshot.dump(tracemalloc_path)
+            stats.details['tracemalloc'] = {
+                'peak_mb': round(peak / (1024 * 1024), 1),
+                'top': [{'location': str(stat.traceback[0]), 'size_kb': round(stat.size / 1024, 1),
+                         'count': stat.count} for stat in snapshot.statistics('lineno')[:TRACEMALLOC_TOP]],
+            }
+            print(f"📊 Instantané tracemalloc écrit dans {tracemalloc_path}")
+
+
+def add_arguments(parser):
+    """Options communes --stats, --profile et --tracemalloc"""
+    parser.add_argument('--stats', metavar='FICHIER',
+                        help="Écrit les mesures de l'exécution en JSON (étapes, compteurs, mémoire) ; - : sortie d'erreur")
+    parser.add_argument('--profile', metavar='FICHIER', help='Enregistre un profil cProfile (pstats, snakeviz)')
+    parser.add_argument('--tracemalloc', metavar='FICHIER',
+                        help='Enregistre un instantané tracemalloc des allocations (ralentit l\'exécution)')
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Découpage d'un flux d'aides en tranches traitées par un pool de processus
+Les résultats sont rendus dans l'ordre d'entrée : la sortie est identique
+à celle d'un traitement sur un seul cœur.
+"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+def iter_chunks(items, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Découpe un itérable en listes de `chunk_size` éléments"""
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def map_chunks(func, items, workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Applique `func` (fonction de module, sérialisable) à chaque tranche de `items`
+    et génère les résultats dans l'ordre des tranches.
+    Au plus 2 x `workers` tranches sont en cours : la mémoire reste bornée
+    même si `items` est un générateur sur un très gros fichier.
+    """
+    chunks = iter_chunks(items, chunk_size)
+    if workers <= 1:
+        for chunk in chunks:
+            yield func(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(func, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
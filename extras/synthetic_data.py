@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+Données Aides-Territoires synthétiques, pour les mesures de performance (cf. benchmark.py)
+
+- aides, périmètres et porteurs générés avec une graine : mêmes paramètres,
+  mêmes fichiers, et les N premiers enregistrements ne dépendent pas du total
+- formes reprises d'aides-sample.json, adhoc_perimeters.json et all_backers.json
+  (descriptions HTML, listes de libellés, *_full, dates, taux...)
+- variantes de fichiers d'aides :
+    clean      : une page {"count", "next", "previous", "results": [...]}
+    pages      : pages de l'API collées les unes aux autres
+    ndjson     : une aide par ligne
+    corrupted  : pages collées, avec virgules finales, texte parasite entre les pages,
+                 aides abîmées et dernière page tronquée
+- petite API paginée locale (/connexion/, /perimeters/, /backers/, /aids/), avec
+  erreurs 503 et latence simulées, pour mesurer le moissonneur sans réseau
+
+Exemple :
+    python synthetic_data.py aids 100000 -o aides-100k.json --variant corrupted
+    python synthetic_data.py serve --perimeters 5000 --port 8765
+"""
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import islice
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from atomic_files import atomic_open
+from perimeter_index import normalize
+
+SEED = 1234
+PAGE_SIZE = 50
+VARIANTS = ('clean', 'pages', 'ndjson', 'corrupted')
+S3 = 'https://aides-territoires-prod.s3.fr-par.scw.cloud/aides-territoires-prod/backers'
+
+WORDS = """
+accompagnement action aménagement appel association bâtiment biodiversité cadre centre collectivité
+commerce commune communauté construction culture développement diagnostic durable eau école économie
+emploi énergie entreprise environnement équipement espace étude europe exploitation financement forêt
+formation habitat innovation investissement jeunesse logement mobilité modernisation numérique patrimoine
+paysage politique production programme projet protection qualité rénovation réseau restauration revitalisation
+rural santé service social solidarité sport territoire tourisme transition transport travaux urbain vélo village
+""".split()
+TITLES = (
+    "Financer {0} de {1}", "Soutenir les projets de {0} et de {1}", "Appel à projets {0} {1}",
+    "Accompagner {0} des territoires", "Aide à {0} pour {1}", "Fonds pour {0} et {1}",
+)
+AUDIENCES = (
+    'Commune', 'Intercommunalité / Pays', 'Département', 'Région', 'Association', 'Entreprise privée',
+    'Particulier', 'Agriculteur', 'Établissement public', 'Collectivité d\'outre-mer à statuts particuliers',
+)
+AID_TYPES = (
+    ('Subvention', 'Aide financière'), ('Prêt', 'Aide financière'), ('Avance récupérable', 'Aide financière'),
+    ('Ingénierie technique', 'Aide en ingénierie'), ('Ingénierie financière', 'Aide en ingénierie'),
+    ('Ingénierie Juridique / administrative', 'Aide en ingénierie'),
+)
+CATEGORIES = (
+    'Solidarités / lien social / Cohésion sociale et inclusion', 'Solidarités / lien social / Alimentation',
+    'Énergie / Environnement / Transition énergétique', 'Énergie / Environnement / Biodiversité',
+    'Mobilité / transports / Mobilité pour tous', 'Mobilité / transports / Modes actifs : vélo, marche…',
+    'Urbanisme / Logement / Aménagement / Revitalisation', 'Culture / Sport / Patrimoine',
+    'Développement économique / production et consommation / Commerces et services',
+    'Eau et milieux aquatiques / Eau potable', 'Numérique / Inclusion numérique', 'Santé / Accès aux soins',
+)
+DESTINATIONS = ('Dépenses d’investissement', 'Dépenses de fonctionnement')
+STEPS = ('Réflexion / conception', 'Mise en œuvre / réalisation', 'Usage / valorisation')
+SCALES = ('Pays', 'Région', 'Département', 'Intercommunalité', 'Commune', 'Ad-hoc')
+RECURRENCES = ('Ponctuelle', 'Permanente', 'Récurrente')
+GROUPS = (
+    (2, 'Conseil régional (CR)'), (3, 'Conseil départemental (CD)'), (48, 'ADEME - GENERIQUE'),
+    (73, 'Commission européenne'), (11, 'Agence de l\'eau'), (20, 'Ministère - GENERIQUE'),
+    (31, 'Banque des Territoires'), (40, 'Fondation'),
+)
+BACKER_KINDS = ('Conseil régional', 'Conseil départemental', 'Agence', 'Fondation', 'Association', 'Syndicat mixte')
+PLACES = (
+    'Luberon', 'Calavon', 'Vercors', 'Morvan', 'Bretagne', 'Occitanie', 'Auvergne', 'Jura', 'Vosges',
+    'Bourgogne', 'Normandie', 'Provence', 'Alsace', 'Ardèche', 'Cévennes', 'Landes', 'Savoie', 'Artois',
+)
+GARBAGE = (
+    'HTTP/1.1 502 Bad Gateway\n', '<html><body>Erreur temporaire</body></html>\n', '\x00\x00\x00',
+    '// page suivante\n', 'undefined\n',
+)
+
+
+def slugify(text):
+    return '-'.join(normalize(text).split())
+
+
+class SyntheticData:
+    """Générateurs d'enregistrements à graine fixe"""
+
+    def __init__(self, seed=SEED):
+        self.seed = seed
+
+    def _rng(self, kind):
+        return random.Random(f"{self.seed}-{kind}")
+
+    # --- Textes ---
+
+    @staticmethod
+    def _sentence(rng, words=12):
+        text = ' '.join(rng.choice(WORDS) for _ in range(words))
+        return text[0].upper() + text[1:] + '.'
+
+    def _html(self, rng, paragraphs):
+        """Description HTML dans le style des exports : paragraphes, listes, gras, entités"""
+        parts = []
+        for _ in range(paragraphs):
+            kind = rng.random()
+            if kind < 0.6:
+                parts.append(f"<p>{self._sentence(rng, rng.randint(15, 45))}&nbsp;</p>")
+            elif kind < 0.85:
+                items = ''.join(f"<li>{self._sentence(rng, rng.randint(4, 12))}</li>" for _ in range(rng.randint(2, 6)))
+                parts.append(f"<ul>{items}</ul>")
+            else:
+                parts.append(f"<p><strong>{self._sentence(rng, 6)}</strong> {self._sentence(rng, 20)} "
+                             f"&amp; <a href=\"https://example.org/{rng.randint(1, 999)}\">en savoir plus</a></p>")
+        return ''.join(parts)
+
+    # --- Porteurs ---
+
+    def _backer_name(self, rng, index):
+        return f"{rng.choice(BACKER_KINDS)} {rng.choice(PLACES)} {index}"
+
+    def backers(self, count):
+        """Porteurs comme all_backers.json"""
+        rng = self._rng('backers')
+        for index in range(count):
+            name = self._backer_name(rng, index)
+            slug = slugify(name)
+            group_id, group_name = rng.choice(GROUPS)
+            yield {
+                'id': f"{index + 1}-{slug}",
+                'slug': slug,
+                'text': name,
+                'perimeter': rng.choice(('France', 'Europe', rng.choice(PLACES))),
+                'logo': f"{S3}/{slug}_logo.png" if rng.random() < 0.7 else None,
+                'group': {'id': group_id, 'name': group_name},
+            }
+
+    # --- Périmètres ---
+
+    def perimeters(self, count):
+        """Périmètres comme adhoc_perimeters.json"""
+        rng = self._rng('perimeters')
+        for index in range(count):
+            name = f"{rng.choice(('CC', 'CA', 'Syndicat', 'PNR', 'Pays'))} {rng.choice(PLACES)}-{rng.choice(PLACES)} {index}"
+            scale = rng.choice(SCALES)
+            yield {
+                'id': f"{100000 + index}-{slugify(name)}",
+                'text': f"{name} ({scale})",
+                'name': name,
+                'scale': scale,
+                'zipcodes': [f"{rng.randint(1, 95):02d}{rng.randint(0, 999):03d}" for _ in range(rng.randint(0, 3))],
+                'code': str(rng.randint(200000000, 259999999)),
+            }
+
+    # --- Aides ---
+
+    def _date(self, rng, year_from=2023, year_to=2026):
+        return f"{rng.randint(year_from, year_to)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+
+    def aids(self, count):
+        """Aides comme aides-sample.json (résultats de /aids/)"""
+        rng = self._rng('aids')
+        for index in range(count):
+            aid_id = 100000 + index
+            name = rng.choice(TITLES).format(rng.choice(WORDS), rng.choice(WORDS))
+            slug = f"{slugify(name)}-{aid_id}"
+            financers = [self._backer_name(rng, rng.randint(0, 1999)) for _ in range(rng.randint(1, 3))]
+            aid_types = rng.sample(AID_TYPES, rng.randint(1, 3))
+            lower = rng.choice((None, 10, 20, 30)) if rng.random() < 0.4 else None
+            upper = rng.choice((None, 50, 70, 80, 100)) if rng.random() < 0.5 else None
+            created = f"{self._date(rng, 2021, 2025)}T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00+00:00"
+            yield {
+                'id': aid_id,
+                'slug': slug,
+                'url': f"/aides/{slug}/",
+                'name': name,
+                'name_initial': name if rng.random() < 0.5 else self._sentence(rng, 8),
+                'short_title': None,
+                'financers': financers,
+                'financers_full': [{'id': rng.randint(1, 3000), 'name': financer,
+                                    'logo': f"{S3}/{slugify(financer)}_logo.png"} for financer in financers],
+                'instructors': financers[:1] if rng.random() < 0.3 else [],
+                'instructors_full': [],
+                'programs': [f"Programme {rng.choice(PLACES)}"] if rng.random() < 0.3 else [],
+                'description': self._html(rng, rng.randint(2, 8)),
+                'eligibility': self._html(rng, rng.randint(0, 3)),
+                'perimeter': rng.choice(('France', 'Europe', f"Région {rng.choice(PLACES)}", rng.choice(PLACES))),
+                'perimeter_scale': rng.choice(SCALES),
+                'mobilization_steps': rng.sample(STEPS, rng.randint(1, 3)),
+                'origin_url': f"https://example.org/{slug}",
+                'categories': rng.sample(CATEGORIES, rng.randint(1, 4)),
+                'is_call_for_project': rng.random() < 0.3,
+                'application_url': f"https://example.org/{slug}/depot" if rng.random() < 0.6 else None,
+                'targeted_audiences': rng.sample(AUDIENCES, rng.randint(1, 4)),
+                'aid_types': [aid_type for aid_type, _ in aid_types],
+                'aid_types_full': [{'id': AID_TYPES.index((aid_type, group)) + 1, 'name': aid_type,
+                                    'group': {'id': 1 if group == 'Aide financière' else 2, 'name': group}}
+                                   for aid_type, group in aid_types],
+                'is_charged': rng.random() < 0.1,
+                'destinations': rng.sample(DESTINATIONS, rng.randint(0, 2)),
+                'start_date': self._date(rng) if rng.random() < 0.5 else None,
+                'predeposit_date': self._date(rng) if rng.random() < 0.1 else None,
+                'submission_deadline': self._date(rng) if rng.random() < 0.6 else None,
+                'subvention_rate_lower_bound': lower,
+                'subvention_rate_upper_bound': upper,
+                'subvention_comment': self._sentence(rng, 10) if rng.random() < 0.2 else None,
+                'loan_amount': rng.randint(1, 100) * 1000 if rng.random() < 0.05 else None,
+                'recoverable_advance_amount': None,
+                'contact': self._html(rng, 1),
+                'recurrence': rng.choice(RECURRENCES),
+                'project_examples': self._html(rng, rng.randint(0, 2)),
+                'import_data_url': None,
+                'import_data_mention': None,
+                'import_share_licence': None,
+                'date_created': created,
+                'date_updated': created,
+                'project_references': [self._sentence(rng, 5)[:-1] for _ in range(rng.randint(0, 2))],
+                'european_aid': rng.choice((None, None, None, 'Sectorielle', 'Organismes')),
+                'is_live': rng.random() < 0.9,
+            }
+
+
+# --- Fichiers ---
+
+def _pages(aids, count, page_size):
+    """Pages successives {"count", "next", "previous", "results"} comme renvoyées par /aids/"""
+    last = (count + page_size - 1) // page_size
+    for page in range(1, last + 1):
+        results = list(islice(aids, page_size))
+        yield {
+            'count': count,
+            'next': f"https://aides-territoires.beta.gouv.fr/api/aids/?page={page + 1}" if page < last else None,
+            'previous': f"https://aides-territoires.beta.gouv.fr/api/aids/?page={page - 1}" if page > 1 else None,
+            'results': results,
+        }
+
+
+def _corrupt_page(rng, page):
+    """Page abîmée comme celles recollées à la main : virgules finales, aide cassée"""
+    text = json.dumps(page, ensure_ascii=False, indent=1)
+    damage = rng.random()
+    if damage < 0.3:
+        # Virgule finale avant la fin de la liste des résultats
+        head, sep, tail = text.rpartition('\n ]')
+        text = head + ',' + sep + tail
+    elif damage < 0.5 and page['results']:
+        # Une aide perd un guillemet : seule cette aide doit être ignorée
+        position = text.find('"description"', rng.randint(0, len(text) // 2))
+        if position >= 0:
+            text = text[:position] + text[position + 1:]
+    return text
+
+
+def write_aids(path, count, seed=SEED, variant='clean', page_size=PAGE_SIZE):
+    """Écrit `count` aides synthétiques, en flux ; renvoie {"records", "bytes"}"""
+    if variant not in VARIANTS:
+        raise Exception(f"Variante inconnue : {variant} ({', '.join(VARIANTS)})")
+    aids = SyntheticData(seed).aids(count)
+    rng = random.Random(f"{seed}-corruption")
+    last = (count + page_size - 1) // page_size
+    with atomic_open(path) as f:
+        if variant == 'ndjson':
+            for aid in aids:
+                f.write(json.dumps(aid, ensure_ascii=False) + '\n')
+        elif variant == 'clean':
+            # Une seule page
+            f.write(json.dumps({'count': count, 'next': None, 'previous': None})[:-1] + ', "results": [')
+            for position, aid in enumerate(aids):
+                f.write((',\n' if position else '\n') + json.dumps(aid, ensure_ascii=False))
+            f.write('\n]}\n')
+        else:
+            for position, page in enumerate(_pages(aids, count, page_size)):
+                if variant == 'pages':
+                    f.write(json.dumps(page, ensure_ascii=False) + '\n')
+                    continue
+                text = _corrupt_page(rng, page)
+                if position == last - 1 and last > 1:
+                    # Téléchargement interrompu au milieu de la dernière page
+                    text = text[:len(text) * 2 // 3]
+                elif rng.random() < 0.2:
+                    text += rng.choice(GARBAGE)
+                f.write(text + ('' if rng.random() < 0.5 else '\n'))
+    return {'records': count, 'bytes': os.path.getsize(path)}
+
+
+def write_records(path, records):
+    """Liste JSON indentée, comme adhoc_perimeters.json ; renvoie {"records", "bytes"}"""
+    count = 0
+    with atomic_open(path) as f:
+        f.write('[')
+        for record in records:
+            f.write((',\n' if count else '\n') + json.dumps(record, indent=2, ensure_ascii=False))
+            count += 1
+        f.write('\n]' if count else ']')
+    return {'records': count, 'bytes': os.path.getsize(path)}
+
+
+# --- API locale ---
+
+class StubApi:
+    """
+    API paginée locale, sur le modèle d'Aides-Territoires : POST /connexion/ donne
+    un token, les GET paginés exigent le bearer. `failure_rate` renvoie des 503
+    (Retry-After: 0), `latency` retarde chaque réponse.
+    """
+
+    def __init__(self, records, page_size=PAGE_SIZE, failure_rate=0.0, latency=0.0, seed=SEED, port=0):
+        self.records = {f"/{endpoint}/": list(values) for endpoint, values in records.items()}
+        self.page_size = page_size
+        self.failure_rate = failure_rate
+        self.latency = latency
+        self.rng = random.Random(f"{seed}-api")
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body=None, headers=None):
+                data = json.dumps(body).encode('utf-8') if body is not None else b''
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                if urlparse(self.path).path != '/connexion/':
+                    return self._send(404, {'detail': 'Not found'})
+                self._send(200, {'token': 'stub-token'})
+
+            def do_GET(self):
+                with api.lock:
+                    api.requests += 1
+                    failing = api.rng.random() < api.failure_rate
+                    if failing:
+                        api.failures += 1
+                if api.latency:
+                    time.sleep(api.latency)
+                url = urlparse(self.path)
+                records = api.records.get(url.path)
+                if records is None:
+                    return self._send(404, {'detail': 'Not found'})
+                if self.headers.get('Authorization') != 'Bearer stub-token':
+                    return self._send(401, {'detail': 'Token invalide'})
+                if failing:
+                    return self._send(503, {'detail': 'Service indisponible'}, {'Retry-After': '0'})
+                query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                page = int(query.get('page', 1))
+                start = (page - 1) * api.page_size
+                if page < 1 or (start >= len(records) and page > 1):
+                    return self._send(404, {'detail': 'Page invalide'})
+
+                def link(number):
+                    return f"{api.base_url}{url.path}?{urlencode({**query, 'page': number})}"
+
+                self._send(200, {
+                    'count': len(records),
+                    'next': link(page + 1) if start + api.page_size < len(records) else None,
+                    'previous': link(page - 1) if page > 1 else None,
+                    'results': records[start:start + api.page_size],
+                })
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Génère des données Aides-Territoires synthétiques')
+    parser.add_argument('--seed', type=int, default=SEED, help=f'Graine (défaut : {SEED})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    aids = subparsers.add_parser('aids', help="Fichier d'aides")
+    aids.add_argument('count', type=int)
+    aids.add_argument('-o', '--output', default='aides-synthetiques.json')
+    aids.add_argument('--variant', choices=VARIANTS, default='clean')
+    aids.add_argument('--page-size', type=int, default=PAGE_SIZE)
+
+    for kind in ('perimeters', 'backers'):
+        records = subparsers.add_parser(kind, help=f"Liste de {'périmètres' if kind == 'perimeters' else 'porteurs'}")
+        records.add_argument('count', type=int)
+        records.add_argument('-o', '--output', default=f'{kind}-synthetiques.json')
+
+    serve = subparsers.add_parser('serve', help='Lance l\'API paginée locale')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--aids', type=int, default=1000, help='Nombre d\'aides servies')
+    serve.add_argument('--perimeters', type=int, default=1000, help='Nombre de périmètres servis')
+    serve.add_argument('--backers', type=int, default=1000, help='Nombre de porteurs servis')
+    serve.add_argument('--page-size', type=int, default=PAGE_SIZE)
+    serve.add_argument('--failure-rate', type=float, default=0.0, help='Part de réponses 503')
+    serve.add_argument('--latency', type=float, default=0.0, help='Latence ajoutée par requête, en secondes')
+    args = parser.parse_args()
+
+    data = SyntheticData(args.seed)
+    try:
+        if args.command == 'aids':
+            written = write_aids(args.output, args.count, args.seed, args.variant, args.page_size)
+        elif args.command in ('perimeters', 'backers'):
+            written = write_records(args.output, getattr(data, args.command)(args.count))
+        else:
+            api = StubApi({'aids': data.aids(args.aids), 'perimeters': data.perimeters(args.perimeters),
+                           'backers': data.backers(args.backers)},
+                          args.page_size, args.failure_rate, args.latency, args.seed, args.port)
+            print(f"🔄 API locale sur {api.base_url} (Ctrl+C pour arrêter)")
+            print(f"   python aides_harvester.py perimeters --base-url {api.base_url} --no-cache "
+                  f"(AIDES_TERRITOIRES_API_KEY quelconque)")
+            try:
+                api.server.serve_forever()
+            except KeyboardInterrupt:
+                api.server.server_close()
+            return
+    except Exception as e:
+        print(f"❌ Erreur: {e}")
+        raise SystemExit(1)
+    print(f"✅ {written['records']} enregistrements ({written['bytes'] / 1e6:.1f} Mo) écrits dans {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Les scripts d'extras s'importent entre eux comme modules voisins
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
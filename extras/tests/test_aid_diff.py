@@ -0,0 +1,47 @@
+import csv
+import io
+
+from aid_diff import manifest_path_for, write_incremental_csv
+from aid_schema import CLEAN_SCHEMA
+
+
+def _writer(stream):
+    return csv.writer(stream, delimiter=';')
+
+
+def _aids(count, start=1):
+    return [{'id': aid_id, 'name': f"Aide {aid_id}", 'description': f"<p>Texte {aid_id}</p>"}
+            for aid_id in range(start, start + count)]
+
+
+def _full_csv(aids):
+    buffer = io.StringIO(newline='')
+    writer = _writer(buffer)
+    writer.writerow(CLEAN_SCHEMA.header)
+    writer.writerows(CLEAN_SCHEMA.rows(aids))
+    return buffer.getvalue().encode('utf-8')
+
+
+def test_incremental_matches_full_conversion(tmp_path):
+    output = tmp_path / 'aides.csv'
+    aids = _aids(50)
+    write_incremental_csv(aids, str(output), CLEAN_SCHEMA, _writer)
+    aids[3]['name'] = 'Modifiée'
+    diff = write_incremental_csv(aids[::-1], str(output), CLEAN_SCHEMA, _writer)
+    assert diff.counts['modified'] == 1 and diff.counts['unchanged'] == 49
+    assert output.read_bytes() == _full_csv(aids[::-1])
+
+
+def test_replaced_output_is_not_reused(tmp_path):
+    output = tmp_path / 'aides.csv'
+    aids = _aids(50)
+    write_incremental_csv(aids, str(output), CLEAN_SCHEMA, _writer)
+    # Conversion complète d'un autre export vers la même sortie, manifeste laissé en place
+    output.write_bytes(_full_csv(_aids(10, start=1000)))
+    assert (tmp_path / 'aides.csv.manifest.json').exists()
+    write_incremental_csv(aids[::-1], str(output), CLEAN_SCHEMA, _writer)
+    assert output.read_bytes() == _full_csv(aids[::-1])
+
+
+def test_manifest_path():
+    assert manifest_path_for('x.csv') == 'x.csv.manifest.json'
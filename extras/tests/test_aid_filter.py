@@ -0,0 +1,31 @@
+import pytest
+
+import aid_filter
+from aid_filter import AidFilter
+from aid_store import AidStore
+
+AIDS = [
+    {'id': '12', 'targeted_audiences': ['Commune'], 'is_call_for_project': True},
+    {'id': 13, 'targeted_audiences': ['Commune', 'EPCI'], 'is_call_for_project': False},
+    {'id': 14, 'targeted_audiences': ['Association'], 'subvention_rate_upper_bound': 80},
+]
+
+
+@pytest.mark.parametrize('with_numpy', [True, False])
+def test_select_returns_ids_of_any_type(monkeypatch, with_numpy):
+    if not with_numpy:
+        monkeypatch.setattr(aid_filter, 'np', None)
+    elif aid_filter.np is None:
+        pytest.skip('numpy absent')
+    engine = AidFilter(AidStore.from_aids(AIDS))
+    assert engine.select({'field': 'targeted_audiences', 'in': ['commune']}) == ['12', 13]
+    assert engine.select({'field': 'is_call_for_project', 'eq': True}) == ['12']
+    assert engine.select({'field': 'subvention_rate_upper_bound', 'gte': 50}) == [14]
+
+
+def test_store_get_finds_ids_of_any_type():
+    store = AidStore.from_aids(AIDS)
+    assert store.ids() == ['12', 13, 14]
+    assert store.get('12')['targeted_audiences'] == ['Commune']
+    assert store.get(13)['id'] == 13
+    assert store.get(12) is None
@@ -0,0 +1,63 @@
+import pytest
+
+from aid_schema import (CLEAN_SCHEMA, LIST_SCHEMA, RAW_SCHEMA, Column, compile_schema, extract_list_items,
+                        flatten_value)
+
+AID = {
+    'id': 7,
+    'name': 'Aide vélo',
+    'financers': [{'id': 1, 'name': 'Région'}, {'id': 2, 'name': 'Ademe'}],
+    'categories': ['Mobilité', 'Vélo'],
+    'description': '<p>Texte <strong>gras</strong></p>',
+    'is_call_for_project': False,
+    'subvention_rate_upper_bound': None,
+    'project_examples': ['a', None, 3],
+}
+
+
+def test_unknown_transform_is_refused():
+    with pytest.raises(ValueError, match='inconnue'):
+        compile_schema([Column('id', 'id', 'value'), Column('x', 'x', 'majuscules')])
+
+
+def test_clean_row():
+    row = dict(zip(CLEAN_SCHEMA.header, CLEAN_SCHEMA.row(AID)))
+    assert row['id'] == 7
+    assert row['financers'] == 'Région; Ademe'
+    assert row['categories'] == 'Mobilité; Vélo'
+    assert row['description_clean'] == 'Texte gras'
+    assert row['is_call_for_project'] is False
+    # Champ absent : cellule vide ; valeur None : écrite vide par csv.writer
+    assert row['short_title'] == ''
+    assert row['subvention_rate_upper_bound'] is None
+    assert row['programs'] == ''
+
+
+def test_raw_row_flattens_lists_only():
+    row = dict(zip(RAW_SCHEMA.header, RAW_SCHEMA.row(AID)))
+    assert row['financers'] == 'Région; Ademe'
+    assert row['project_examples'] == 'a; ; 3'
+    assert row['description'] == AID['description']
+    assert row['is_call_for_project'] is False
+    assert row['subvention_rate_upper_bound'] is None
+    assert row['short_title'] is None
+
+
+def test_list_schema_keeps_lists():
+    row = dict(zip(LIST_SCHEMA.header, LIST_SCHEMA.row(AID)))
+    assert row['financers'] == ['Région', 'Ademe']
+    assert row['programs'] == []
+    assert LIST_SCHEMA.header == CLEAN_SCHEMA.header
+
+
+def test_rows_matches_row():
+    aids = [AID, {'id': 8}]
+    assert list(CLEAN_SCHEMA.rows(aids)) == [CLEAN_SCHEMA.row(aid) for aid in aids]
+
+
+def test_helpers():
+    assert extract_list_items([]) == ''
+    assert extract_list_items(['a', 'b']) == 'a; b'
+    assert flatten_value([{'name': 'x'}, {'name': 'y'}]) == 'x; y'
+    assert flatten_value(True) == 'True'
+    assert flatten_value(None) == ''
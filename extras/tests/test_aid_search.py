@@ -0,0 +1,20 @@
+import aid_search
+from aid_search import AidSearchIndex, analyze
+
+
+def test_analyze_stems_each_distinct_word_once():
+    aid_search._term.cache_clear()
+    terms = analyze("Rénovation énergétique des bâtiments ; rénovation des écoles")
+    assert terms[0] == terms[3]
+    assert 'des' not in terms
+    info = aid_search._term.cache_info()
+    assert info.misses == 5 and info.hits == 2
+
+
+def test_search_finds_indexed_aid(tmp_path):
+    index = AidSearchIndex(str(tmp_path / 'search.sqlite'))
+    index.add_many([
+        {'id': 1, 'name': 'Rénovation énergétique des écoles', 'description': 'Isolation des bâtiments'},
+        {'id': 2, 'name': 'Voirie communale', 'description': 'Réfection des routes'},
+    ])
+    assert [aid_id for aid_id, _, _ in index.search('rénover bâtiment')] == [1]
@@ -0,0 +1,28 @@
+from aid_store import FIELDS, AidStore
+
+
+def test_mixed_types_round_trip():
+    aids = [
+        {'id': 1, 'name': 'Aide', 'subvention_rate_upper_bound': 80, 'is_charged': False,
+         'financers': ['Région'], 'extra': {'a': 1}},
+        {'id': '164898', 'subvention_rate_upper_bound': '50 %', 'loan_amount': 1000.5,
+         'is_call_for_project': 'oui', 'is_charged': None},
+        {'id': True, 'recoverable_advance_amount': [1, 2], 'is_live': 1},
+        {'id': 4, 'subvention_rate_upper_bound': 50.0, 'loan_amount': 2 ** 60 + 1,
+         'perimeter': {'id': '70973-auvergne-rhone-alpes', 'name': 'Auvergne-Rhône-Alpes'},
+         'recurrence': ['Permanente'], 'categories': 'Mobilité', 'programs': [{'name': 'Fonds vert'}],
+         'financers_full': {'id': 1, 'name': 'Ademe'}},
+    ]
+    store = AidStore.from_aids(aids)
+    for index, aid in enumerate(aids):
+        stored = store[index].to_dict()
+        assert set(stored) == FIELDS | set(aid)
+        assert {field: stored[field] for field in aid} == aid
+        assert [type(stored[field]) for field in aid] == [type(value) for value in aid.values()]
+
+
+def test_typed_values_are_read_through_views():
+    store = AidStore.from_aids([{'id': '7', 'subvention_rate_upper_bound': 'n/c'}, {'id': 8}])
+    assert store[0]['id'] == '7'
+    assert store[0].subvention_rate_upper_bound == 'n/c'
+    assert store.get(8)['id'] == 8
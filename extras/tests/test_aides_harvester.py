@@ -0,0 +1,123 @@
+import os
+
+import pytest
+
+from aides_harvester import AidesTerritoiresClient, HarvestError, PageJournal
+from http_cache import ResponseCache
+from synthetic_data import StubApi, SyntheticData
+
+PAGE_SIZE = 20
+
+
+@pytest.fixture(scope='module')
+def perimeters():
+    return list(SyntheticData(7).perimeters(230))
+
+
+def make_client(api, **options):
+    return AidesTerritoiresClient(base_url=api.base_url, api_key='cle-de-test', rate=0, backoff=0, **options)
+
+
+def test_fetch_all_keeps_page_order(perimeters):
+    with StubApi({'perimeters': perimeters}, PAGE_SIZE) as api:
+        client = make_client(api, workers=4)
+        assert client.fetch_all('perimeters') == perimeters
+        assert api.requests == 12
+
+
+def test_retries_fetch_every_page(perimeters):
+    with StubApi({'perimeters': perimeters}, PAGE_SIZE, failure_rate=0.3) as api:
+        client = make_client(api, workers=4, retries=20)
+        assert client.fetch_all('perimeters') == perimeters
+        stats = client.stats_snapshot()
+        assert api.failures > 0
+        assert stats['retries'] == api.failures
+        assert stats['requests'] == api.requests
+
+
+def test_exhausted_retries_raise(perimeters):
+    with StubApi({'perimeters': perimeters}, PAGE_SIZE, failure_rate=1.0) as api:
+        client = make_client(api, retries=2)
+        with pytest.raises(HarvestError):
+            client.fetch_all('perimeters')
+        assert api.requests == 3
+
+
+def test_expired_token_is_refreshed_once(perimeters):
+    with StubApi({'perimeters': perimeters}, PAGE_SIZE) as api:
+        client = make_client(api)
+        client.get_token()
+        client._token = 'token-expire'
+        assert client.fetch_all('perimeters') == perimeters
+        assert client.stats_snapshot()['token_refreshes'] == 1
+
+
+def test_warm_cache_makes_no_request(tmp_path, perimeters):
+    with StubApi({'perimeters': perimeters}, PAGE_SIZE) as api:
+        cold = make_client(api, cache=ResponseCache(str(tmp_path)))
+        assert cold.fetch_all('perimeters') == perimeters
+        requests_made = api.requests
+
+        warm = make_client(api, cache=ResponseCache(str(tmp_path)))
+        assert warm.fetch_all('perimeters') == perimeters
+        assert api.requests == requests_made
+        stats = warm.stats_snapshot()
+        assert stats['requests'] == 0
+        assert stats['cache_hits'] == 12
+
+
+def test_cache_only_raises_on_miss(tmp_path, perimeters):
+    with StubApi({'perimeters': perimeters}, PAGE_SIZE) as api:
+        client = make_client(api, cache=ResponseCache(str(tmp_path), cache_only=True))
+        with pytest.raises(HarvestError):
+            client.fetch_all('perimeters')
+        assert api.requests == 0
+
+
+# --- Journal de reprise ---
+
+def test_resume_skips_journaled_pages(tmp_path, perimeters):
+    journal_path = str(tmp_path / 'perimeters.journal')
+    with StubApi({'perimeters': perimeters}, PAGE_SIZE) as api:
+        client = make_client(api, workers=1)
+        records = client.iter_records('perimeters', journal_path=journal_path)
+        # Interruption au milieu de la page 4 : les pages 1 à 4 sont journalisées
+        first = [next(records) for _ in range(3 * PAGE_SIZE + 1)]
+        records.close()
+        requests_made = api.requests
+
+        resumed = make_client(api).fetch_all('perimeters', journal_path=journal_path)
+        assert first == perimeters[:len(first)]
+        assert resumed == perimeters
+        assert api.requests - requests_made == 12 - 4
+
+
+def test_resume_of_a_complete_journal_makes_no_request(tmp_path, perimeters):
+    journal_path = str(tmp_path / 'perimeters.journal')
+    with StubApi({'perimeters': perimeters}, PAGE_SIZE) as api:
+        make_client(api).fetch_all('perimeters', journal_path=journal_path)
+        requests_made = api.requests
+        assert make_client(api).fetch_all('perimeters', journal_path=journal_path) == perimeters
+        assert api.requests == requests_made
+
+
+def test_truncated_journal_line_is_dropped(tmp_path):
+    journal_path = str(tmp_path / 'aids.journal')
+    journal = PageJournal(journal_path, 'aids', {'categories': ['a', 'b']})
+    assert journal.load() == []
+    journal.append(1, 'https://example.org/aids/?page=1', [{'id': 1}], True)
+    journal.append(2, 'https://example.org/aids/?page=2', [{'id': 2}], True)
+    size = os.path.getsize(journal_path)
+    with open(journal_path, 'a', encoding='utf-8') as f:
+        f.write('{"page": 3, "url": "https://exa')
+
+    pages = PageJournal(journal_path, 'aids', {'categories': ['a', 'b']}).load()
+    assert [page['records'] for page in pages] == [[{'id': 1}], [{'id': 2}]]
+    assert os.path.getsize(journal_path) == size
+
+
+def test_journal_of_another_request_is_refused(tmp_path):
+    journal_path = str(tmp_path / 'aids.journal')
+    PageJournal(journal_path, 'aids', {'page_size': 10}).load()
+    with pytest.raises(HarvestError):
+        PageJournal(journal_path, 'aids', {'page_size': 20}).load()
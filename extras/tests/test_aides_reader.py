@@ -0,0 +1,23 @@
+import io
+
+import pytest
+
+from aides_reader import iter_aids_from_stream
+
+
+def _ids(text):
+    meta = {}
+    return [aid['id'] for aid in iter_aids_from_stream(io.StringIO(text), meta)]
+
+
+@pytest.mark.parametrize('text', [
+    '{"results":[{"id":1,},{"id":2},],}',
+    '[{"id":1,"x":2},{"id":2,"x":[1,2,]}]',
+    '[{"id":1}{"id":2}]',
+])
+def test_syntax_errors_near_end_of_file_are_repaired(text):
+    assert _ids(text) == [1, 2]
+
+
+def test_truncated_aid_is_dropped():
+    assert _ids('[{"id":1},{"id":2,"x":[1,') == [1]
@@ -0,0 +1,66 @@
+import pytest
+
+from backer_index import BackerIndex, build_index, write_index
+
+BACKERS = [
+    {'id': '22-ademe', 'text': 'ADEME', 'group': {'id': 5, 'name': 'ADEME - GENERIQUE'}},
+    {'id': '31-ademe-direction-regionale-corse', 'text': 'Ademe — Direction régionale — Corse',
+     'group': {'id': 5, 'name': 'ADEME - GENERIQUE'}},
+    {'id': '40-mission-interministerielle', 'text': 'Mission interministérielle (MIQCP)', 'group': None},
+    {'id': '41-homonyme', 'text': 'ADEME', 'group': None},
+    {'id': 'sans-identifiant', 'text': 'Ignoré'},
+]
+
+
+@pytest.fixture
+def index():
+    return BackerIndex(build_index(BACKERS, {9: 'Régions - GENERIQUE'}))
+
+
+def test_resolve_normalized_names(index):
+    backer = index.resolve('ADEME - Direction regionale - Corse')
+    assert (backer.backer_id, backer.slug_id, backer.group_id, backer.group_name) == \
+        (31, '31-ademe-direction-regionale-corse', 5, 'ADEME - GENERIQUE')
+    assert index.resolve('Ignoré') is None
+
+
+def test_homonyms_keep_the_smallest_id(index):
+    assert index.resolve('ademe').backer_id == 22
+    assert build_index(BACKERS)['ambiguous'] == 1
+
+
+def test_aliases(index):
+    assert index.resolve('MIQCP').backer_id == 40
+    assert index.resolve('mission-interministerielle').backer_id == 40
+    # Groupe générique : le porteur du même nom dans le groupe, sinon le groupe seul
+    assert index.resolve('ADEME - GENERIQUE').backer_id == 22
+    region = index.resolve('Régions - GENERIQUE')
+    assert (region.backer_id, region.group_id, region.group_name) == (None, 9, 'Régions - GENERIQUE')
+
+
+def test_by_id(index):
+    assert index.by_id('22-ademe').name == 'ADEME'
+    assert index.by_id(31).group_id == 5
+    assert index.by_id(999) is None
+
+
+def test_enrich_prefers_financers_full(index):
+    aid = {
+        'financers': ['ADEME', 'Inconnu', 'MIQCP'],
+        'financers_full': [{'id': 31, 'name': 'ADEME'}, {'id': 999, 'name': 'Inconnu'}],
+    }
+    index.enrich(aid)
+    assert aid['financer_backer_ids'] == ['31', '', '40']
+    assert aid['financer_group_ids'] == ['5', '', '']
+
+
+def test_enrich_without_financers(index):
+    assert list(index.enrich_all([{'id': 1}])) == [{'id': 1, 'financer_backer_ids': [], 'financer_group_ids': []}]
+
+
+def test_index_round_trip(tmp_path, index):
+    path = str(tmp_path / 'backers_index.json')
+    write_index(build_index(BACKERS, {9: 'Régions - GENERIQUE'}), path)
+    loaded = BackerIndex.load(path)
+    assert loaded.resolve('miqcp') == index.resolve('miqcp')
+    assert loaded.groups == index.groups
@@ -0,0 +1,30 @@
+import pytest
+
+from benchmark import DEFAULT_BASELINE, STAGES, compare, load_baseline, measure, prepare_files
+
+
+def _result(stage, size, **metrics):
+    return {'stage': stage, 'size': size, 'records_per_s': 1000.0, 'p95_ms': 10.0, 'peak_rss_mb': 50.0, **metrics}
+
+
+def test_committed_baseline_covers_every_stage():
+    baseline = load_baseline(DEFAULT_BASELINE)
+    for stage in STAGES:
+        assert f"{stage}@1k" in baseline
+        assert f"{stage}@10k" in baseline
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    baseline = {'convert_to_csv@1k': {'records_per_s': 1000.0, 'p95_ms': 10.0, 'peak_rss_mb': 50.0}}
+    results = [_result('convert_to_csv', 1000, records_per_s=700.0, p95_ms=12.0), _result('fix_json', 1000)]
+    regressions, missing = compare(results, baseline, tolerance=0.25)
+    assert regressions == [('convert_to_csv@1k', 'records_per_s', 1000.0, 700.0)]
+    assert missing == ['fix_json@1k']
+
+
+@pytest.mark.parametrize('stage', ['convert_to_csv_list', 'convert_to_csv_dict'])
+def test_convert_to_csv_loaded_input_stages(tmp_path, stage):
+    files = prepare_files(str(tmp_path), 50, 1234)
+    result = measure(stage, files, 50, {'seed': 1234, 'workdir': str(tmp_path), 'failure_rate': 0})
+    assert result['records'] == 50
+    assert result['bytes_written'] > 0
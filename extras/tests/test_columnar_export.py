@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+import columnar_export
+from columnar_export import export_columnar
+
+pq = pytest.importorskip('pyarrow.parquet')
+
+
+def test_parquet_accepts_non_string_values_and_groups_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(columnar_export, 'ROW_GROUP_SIZE', 4)
+    aids = [{'id': i, 'name': f'Aide {i}'} for i in range(10)]
+    aids[0]['name'] = 42
+    aids[1]['perimeter'] = {'id': 1, 'name': 'France'}
+    output = tmp_path / 'aides.parquet'
+    assert export_columnar(aids, output, 'parquet', 'none', chunk_size=3) == 10
+    parquet = pq.ParquetFile(output)
+    assert [parquet.metadata.row_group(i).num_rows for i in range(parquet.num_row_groups)] == [4, 4, 2]
+    table = parquet.read()
+    assert table['name'][0].as_py() == '42'
+    assert table['perimeter'][1].as_py() == '{"id": 1, "name": "France"}'
+
+
+def _mistyped_aids():
+    return [
+        {'id': '164898', 'subvention_rate_upper_bound': '80', 'loan_amount': '12,5', 'is_charged': 'true'},
+        {'id': 2, 'subvention_rate_upper_bound': '80 %', 'is_charged': 'peut-être'},
+    ]
+
+
+def test_parquet_parses_numeric_strings_and_counts_dropped(tmp_path):
+    output = tmp_path / 'aides.parquet'
+    meta = {}
+    export_columnar(_mistyped_aids(), output, 'parquet', 'none', meta=meta)
+    table = pq.read_table(output).to_pylist()
+    assert table[0]['id'] == 164898
+    assert table[0]['subvention_rate_upper_bound'] == 80.0
+    assert table[0]['loan_amount'] == 12.5
+    assert table[0]['is_charged'] is True
+    assert table[1]['subvention_rate_upper_bound'] is None
+    assert meta['dropped'] == {'subvention_rate_upper_bound': 1, 'is_charged': 1}
+
+
+def test_ndjson_keeps_unparsed_values(tmp_path):
+    output = tmp_path / 'aides.ndjson'
+    meta = {}
+    export_columnar(_mistyped_aids(), output, 'ndjson', 'none', meta=meta)
+    records = [json.loads(line) for line in output.read_text(encoding='utf-8').splitlines()]
+    assert records[0]['id'] == 164898
+    assert records[1]['subvention_rate_upper_bound'] == '80 %'
+    assert meta['unparsed'] == {'subvention_rate_upper_bound': 1, 'is_charged': 1}
+    assert not meta['dropped']
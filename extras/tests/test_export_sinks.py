@@ -0,0 +1,100 @@
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+import fetch_perimeters
+from aides_harvester import AidesTerritoiresClient
+from export_sinks import CsvSink, JsonArraySink, NdjsonSink, Sink, export, sink_for_path
+from synthetic_data import StubApi, SyntheticData
+
+RECORDS = [{'id': 1, 'name': 'Périmètre', 'tags': ['a', 'b'], 'parent': {'id': 2}}, {'id': 3, 'name': None}]
+
+
+class Failure(Exception):
+    pass
+
+
+def _failing(records):
+    yield from records
+    raise Failure()
+
+
+@pytest.mark.parametrize('records', [RECORDS, []], ids=['records', 'empty'])
+def test_json_array_matches_json_dump(tmp_path, records):
+    path = tmp_path / 'out.json'
+    export(iter(records), [JsonArraySink(str(path))])
+    assert path.read_text(encoding='utf-8') == json.dumps(records, indent=2, ensure_ascii=False)
+
+
+def test_compact_json_array(tmp_path):
+    path = tmp_path / 'out.json'
+    export(RECORDS, [JsonArraySink(str(path), indent=None)])
+    assert path.read_text(encoding='utf-8') == json.dumps(RECORDS, ensure_ascii=False, separators=(',', ':'))
+
+
+def test_single_pass_to_every_sink(tmp_path):
+    paths = [tmp_path / name for name in ('out.json.gz', 'out.ndjson', 'out.csv')]
+    sinks = [sink_for_path(str(paths[0])), sink_for_path(str(paths[1])),
+             sink_for_path(str(paths[2]), ['id', 'name'], delimiter=';')]
+    assert export(iter(RECORDS), sinks) == 2
+
+    assert json.loads(gzip.decompress(paths[0].read_bytes())) == RECORDS
+    assert [json.loads(line) for line in paths[1].read_text(encoding='utf-8').splitlines()] == RECORDS
+    with open(paths[2], encoding='utf-8', newline='') as f:
+        assert list(csv.reader(f, delimiter=';')) == [['id', 'name'], ['1', 'Périmètre'], ['3', '']]
+
+
+def test_gzip_output_is_reproducible(tmp_path):
+    first, second = tmp_path / 'a.ndjson.gz', tmp_path / 'b.ndjson.gz'
+    export(RECORDS, [NdjsonSink(str(first))])
+    export(RECORDS, [NdjsonSink(str(second))])
+    assert first.read_bytes() == second.read_bytes()
+
+
+def test_zstd_output(tmp_path):
+    zstandard = pytest.importorskip('zstandard')
+    path = tmp_path / 'out.ndjson.zst'
+    export(RECORDS, [sink_for_path(str(path))])
+    reader = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(path.read_bytes()))
+    assert [json.loads(line) for line in io.TextIOWrapper(reader, encoding='utf-8')] == RECORDS
+
+
+def test_error_leaves_no_partial_file(tmp_path):
+    new, existing = tmp_path / 'new.json', tmp_path / 'existing.csv'
+    existing.write_text('ancien contenu', encoding='utf-8')
+    with pytest.raises(Failure):
+        export(_failing(RECORDS), [JsonArraySink(str(new)), CsvSink(str(existing), ['id'])])
+    assert not new.exists()
+    assert existing.read_text(encoding='utf-8') == 'ancien contenu'
+    assert [path.name for path in tmp_path.iterdir()] == ['existing.csv']
+
+
+def test_sink_is_abstract(tmp_path):
+    with pytest.raises(TypeError):
+        Sink(str(tmp_path / 'out.txt'))
+
+
+def test_unknown_extension_and_missing_csv_fields(tmp_path):
+    with pytest.raises(Exception, match='Extension'):
+        sink_for_path(str(tmp_path / 'out.xml'))
+    with pytest.raises(Exception, match='Colonnes'):
+        sink_for_path(str(tmp_path / 'out.csv.gz'))
+
+
+def test_fetch_perimeters_streams_pages_into_the_sinks(tmp_path):
+    perimeters = list(SyntheticData(3).perimeters(75))
+    json_path, csv_path = str(tmp_path / 'p.json'), str(tmp_path / 'p.csv')
+    with StubApi({'perimeters': perimeters}, 20) as api:
+        client = AidesTerritoiresClient(base_url=api.base_url, api_key='cle-de-test', rate=0, backoff=0)
+        records = fetch_perimeters.iter_adhoc_perimeters(client, str(tmp_path / 'p.journal'))
+        assert fetch_perimeters.save_all(records, json_path, csv_path) == 75
+        assert api.requests == 4
+    with open(json_path, encoding='utf-8') as f:
+        assert json.load(f) == perimeters
+    with open(csv_path, encoding='utf-8', newline='') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == fetch_perimeters.CSV_FIELDS
+    assert [row[0] for row in rows[1:]] == [str(perimeter['id']) for perimeter in perimeters]
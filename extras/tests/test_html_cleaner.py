@@ -0,0 +1,7 @@
+from html_cleaner import HtmlCleaner
+
+
+def test_block_tags_in_any_case_separate_words():
+    cleaner = HtmlCleaner()
+    assert cleaner.clean('Ligne<Br>suivante<Li>point</Li><DIV>bloc</div>') == 'Ligne suivante point bloc'
+    assert cleaner.clean('<p>mot<strong>collé</strong></p>') == 'motcollé'
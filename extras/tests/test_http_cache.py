@@ -0,0 +1,18 @@
+import os
+
+from http_cache import ResponseCache
+
+URL = 'https://example.org/api/aids/'
+
+
+def test_evicted_body_is_a_cache_miss(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.store(URL, {'page': 1}, b'{"results": []}', {'ETag': '"v1"'})
+    entry = cache.lookup(URL, {'page': 1})
+    assert cache.read(entry) == b'{"results": []}'
+
+    # Éviction par un autre fil entre lookup() et read()
+    os.remove(cache._body_path(entry['key']))
+    assert cache.read(entry) is None
+    assert cache.lookup(URL, {'page': 1}) is None
+    assert cache.db.execute("SELECT COUNT(*) FROM entries").fetchone()[0] == 0
@@ -0,0 +1,43 @@
+import csv
+
+import pytest
+
+from json_to_csv_converter import FIELDNAMES, convert_to_csv, fix_json, parse_json_file
+from run_stats import RunStats
+
+AIDS = [{'id': 1, 'name': 'Aide 1', 'description': '<p>Texte</p>'}, {'id': 2, 'name': 'Aide 2'}]
+
+
+def _rows(path):
+    with open(path, encoding='utf-8', newline='') as f:
+        return list(csv.reader(f, delimiter=';'))
+
+
+@pytest.mark.parametrize('make_input', [
+    lambda: {'results': AIDS, 'count': 2},
+    lambda: list(AIDS),
+    lambda: iter(AIDS),
+    lambda: fix_json('{"results": [{"id": 1, "name": "Aide 1", "description": "<p>Texte</p>"}, '
+                     '{"id": 2, "name": "Aide 2"},]}'),
+], ids=['dict', 'list', 'iterator', 'fix_json'])
+@pytest.mark.parametrize('stats', [None, RunStats('test', enabled=False), RunStats('test')], ids=['none', 'off', 'on'])
+def test_convert_accepts_every_input_shape(tmp_path, make_input, stats):
+    output = tmp_path / 'aides.csv'
+    convert_to_csv(make_input(), output, stats=stats)
+    rows = _rows(output)
+    assert rows[0] == FIELDNAMES
+    assert [row[0] for row in rows[1:]] == ['1', '2']
+    assert rows[1][FIELDNAMES.index('description_clean')] == 'Texte'
+
+
+def test_convert_parsed_file(tmp_path):
+    source = tmp_path / 'aides.json'
+    source.write_text('[{"id": 1, "name": "Aide 1"}, {"id": 2, "name": "Aide 2"}]', encoding='utf-8')
+    output = tmp_path / 'aides.csv'
+    convert_to_csv(parse_json_file(str(source)), output)
+    assert len(_rows(output)) == 3
+
+
+def test_timed_always_returns_an_iterator():
+    assert next(RunStats('test', enabled=False).timed([1, 2], 'parse')) == 1
+    assert next(RunStats('test').timed([1, 2], 'parse')) == 1
@@ -0,0 +1,50 @@
+from payload_packer import BatchPacker, merge_duplicates
+
+
+def _aid(aid_id, name='Aide', description='<p>Texte</p>'):
+    return {'id': aid_id, 'name': name, 'url': f'/aides/{aid_id}/', 'description': description}
+
+
+def test_every_packed_entry_has_an_id():
+    aids = [_aid(1), _aid(2), _aid(3, name='Autre'), _aid(1)]
+    entries = merge_duplicates(aids)
+    batches = list(BatchPacker(max_tokens=50).pack(entries))
+    packed = [entry for batch in batches for entry in batch['aides']]
+    assert [entry['id'] for entry in packed] == [1, 3]
+    assert packed[0]['duplicate_ids'] == [2]
+    assert 'duplicate_ids' not in packed[1]
+
+
+def test_repeated_text_refers_to_aid_id():
+    entries = merge_duplicates([_aid(1), _aid(2, name='Autre')])
+    batch, = BatchPacker(max_tokens=1000).pack(entries)
+    assert batch['aides'][1]['description'] == "(identique à l'aide 1)"
+
+
+def test_written_lines_fit_the_budget(tmp_path, monkeypatch):
+    import json
+    import sys
+
+    import payload_packer
+    monkeypatch.setattr(payload_packer, 'tiktoken', None)
+    aids = [_aid(i, name=f'Aide {i}', description=f'<p>Description numéro {i} ' + 'mot ' * (i % 40) + '</p>')
+            for i in range(1, 200)]
+    source, output, context = tmp_path / 'aides.json', tmp_path / 'lots.jsonl', tmp_path / 'projet.json'
+    source.write_text(json.dumps(aids), encoding='utf-8')
+    context.write_text(json.dumps({'key_elements': 'Rénovation ' * 50, 'projectContext': 'Commune rurale ' * 40,
+                                   'keywords': ['énergie', 'bâtiment'], 'ignored': 'x' * 1000}), encoding='utf-8')
+    monkeypatch.setattr(sys, 'argv', ['payload_packer.py', str(source), '-o', str(output), '--max-tokens', '900',
+                                      '--max-bytes', '3600', '--context', str(context), '--job-id', 'job-42'])
+    payload_packer.main()
+
+    lines = output.read_text(encoding='utf-8').splitlines()
+    assert len(lines) > 1
+    ids = []
+    for number, line in enumerate(lines, 1):
+        payload = json.loads(line)
+        assert payload['job_id'] == 'job-42' and payload['batch_id'] == number
+        assert 'ignored' not in payload
+        assert payload_packer.estimate_tokens(line) <= payload['estimated_tokens'] <= 900
+        assert len(line.encode('utf-8')) <= 3600
+        ids.extend(entry['id'] for entry in payload['aides'])
+    assert ids == list(range(1, 200))
@@ -0,0 +1,57 @@
+import pytest
+
+from perimeter_index import PerimeterIndex, write_index
+
+PERIMETERS = [
+    {'id': '1-cc-sud-luberon', 'name': 'CC Sud-Luberon (COTELUB)', 'code': '248400285', 'scale': 'adhoc'},
+    {'id': '2-scot-aix-marseille', 'name': 'SCOT Métropole Aix-Marseille-Provence', 'scale': 'adhoc'},
+    {'id': '3-marseille', 'name': 'Marseille', 'code': '13055', 'zipcodes': ['13001'], 'scale': 'commune'},
+    {'id': '4-bretagne', 'name': 'Bretagne', 'code': '53', 'scale': 'region'},
+    {'id': '5-pnr-luberon', 'name': 'PNR du Luberon (Parc naturel régional)', 'scale': 'adhoc'},
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = tmp_path / 'perimeters.idx'
+    write_index(PERIMETERS, path)
+    with PerimeterIndex(path) as index:
+        yield index
+
+
+def _names(results):
+    return [result['name'] for result in results]
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('marseile', ['Marseille', 'SCOT Métropole Aix-Marseille-Provence']),
+    ('lubron', ['CC Sud-Luberon (COTELUB)', 'PNR du Luberon (Parc naturel régional)']),
+    ('sud lubron', ['CC Sud-Luberon (COTELUB)']),
+    ('cotelub', ['CC Sud-Luberon (COTELUB)']),
+    ('bretgne', ['Bretagne']),
+])
+def test_fuzzy_finds_misspelled_words(index, query, expected):
+    assert _names(index.fuzzy(query, limit=len(expected))) == expected
+
+
+def test_fuzzy_without_match(index):
+    assert index.fuzzy('xyzzy') == []
+
+
+def test_exact_lookups(index):
+    assert index.by_code('13055')['name'] == 'Marseille'
+    assert _names(index.by_zipcode('13001')) == ['Marseille']
+    assert index.by_id('1')['name'] == 'CC Sud-Luberon (COTELUB)'
+    assert _names(index.search('luberon')) == ['CC Sud-Luberon (COTELUB)', 'PNR du Luberon (Parc naturel régional)']
+
+
+def test_fuzzy_decodes_only_returned_records(index, monkeypatch):
+    decoded = []
+    original = PerimeterIndex.__getitem__
+    monkeypatch.setattr(PerimeterIndex, '__getitem__', lambda self, i: decoded.append(i) or original(self, i))
+    assert _names(index.fuzzy('luberon', limit=1)) == ['CC Sud-Luberon (COTELUB)']
+    assert len(decoded) == 1
+
+
+def test_fuzzy_ignores_link_words(index):
+    assert _names(index.fuzzy('parc du lubron', limit=1)) == ['PNR du Luberon (Parc naturel régional)']
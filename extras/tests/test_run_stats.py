@@ -0,0 +1,118 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import run_stats
+from json_to_csv_converter import convert_to_csv
+from run_stats import RunStats, percentiles
+
+
+class Clock:
+    """perf_counter piloté par le test"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(run_stats.time, 'perf_counter', clock)
+    return clock
+
+
+def _seconds(stats):
+    return {name: seconds for name, (seconds, _) in stats.stages.items()}
+
+
+def test_nested_stage_is_counted_once(clock):
+    stats = RunStats('test')
+    with stats.stage('write'):
+        clock.now += 1
+        with stats.stage('format'):
+            clock.now += 2
+        clock.now += 3
+    assert _seconds(stats) == {'write': 4, 'format': 2}
+    assert stats.stages['write'][1] == stats.stages['format'][1] == 1
+
+
+def test_timed_charges_the_producer_only(clock):
+    stats = RunStats('test')
+
+    def produce():
+        for item in range(3):
+            clock.now += 1
+            yield item
+
+    with stats.stage('write'):
+        for _ in stats.timed(produce(), 'parse'):
+            clock.now += 10
+    assert _seconds(stats) == {'write': 30, 'parse': 3}
+    assert stats.stages['parse'][1] == 4
+
+
+def test_carve_moves_time_out_of_the_parent(clock):
+    stats = RunStats('test')
+    with stats.stage('format'):
+        clock.now += 5
+    stats.carve('format', 'html_clean', 2, calls=7)
+    stats.carve('format', 'html_clean', 10)
+    assert _seconds(stats) == {'format': 0, 'html_clean': 5}
+    assert stats.stages['html_clean'][1] == 7
+
+
+def test_disabled_stats_record_nothing(capsys):
+    stats = RunStats('test', enabled=False)
+    with stats.stage('parse'):
+        stats.count('records')
+    assert list(stats.timed([1, 2], 'parse')) == [1, 2]
+    stats.write('-')
+    assert stats.stages == stats.counters == {}
+    assert capsys.readouterr() == ('', '')
+
+
+def test_html_cleaner_with_workers_is_unmeasured():
+    stats = RunStats('test')
+    cleaner = SimpleNamespace(seconds=1.0, hits=3, misses=4)
+    stats.add_html_cleaner(cleaner, workers=4)
+    assert 'html_clean' not in stats.stages
+    assert 'html_clean' in stats.details['unavailable']
+
+
+def test_write_dash_goes_to_stderr(capsys):
+    stats = RunStats('test')
+    stats.set('records', 2)
+    stats.write('-')
+    out, err = capsys.readouterr()
+    assert out == ''
+    assert json.loads(err)['counters'] == {'records': 2}
+
+
+def test_write_file(tmp_path):
+    path = tmp_path / 'stats.json'
+    stats = RunStats('test')
+    with stats.stage('parse'):
+        pass
+    stats.write(str(path))
+    report = json.loads(path.read_text(encoding='utf-8'))
+    assert report['script'] == 'test'
+    assert set(report['stages']) == {'parse'}
+
+
+def test_percentiles():
+    assert percentiles([]) == {'p50_ms': None, 'p95_ms': None, 'p99_ms': None}
+    assert percentiles([i / 1000 for i in range(1, 101)]) == {'p50_ms': 51.0, 'p95_ms': 95.0, 'p99_ms': 99.0}
+
+
+def test_converter_stages(tmp_path):
+    stats = RunStats('convert_to_csv')
+    aids = [{'id': index, 'description': f"<p>Mesure {index}</p>"} for index in range(5)]
+    convert_to_csv(iter(aids), tmp_path / 'aides.csv', stats=stats)
+    assert {'parse', 'format', 'write', 'html_clean'} <= set(stats.stages)
+    assert stats.counters['records_written'] == 5
+    assert stats.counters['html_cleaned'] == 5
+    assert stats.counters['bytes_written'] == (tmp_path / 'aides.csv').stat().st_size
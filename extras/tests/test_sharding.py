@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+from convert_aides_to_csv import convert_json_to_csv
+from json_to_csv_converter import convert_to_csv
+from sharding import iter_chunks, map_chunks
+from synthetic_data import SyntheticData
+
+
+@pytest.fixture(scope='module')
+def aids():
+    return list(SyntheticData(11).aids(230))
+
+
+def test_iter_chunks_keeps_the_remainder():
+    assert [len(chunk) for chunk in iter_chunks(range(12), 5)] == [5, 5, 2]
+    assert list(iter_chunks([], 5)) == []
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_map_chunks_preserves_order(workers):
+    assert list(map_chunks(sum, iter(range(1000)), workers, 7)) == [sum(chunk) for chunk in iter_chunks(range(1000), 7)]
+
+
+def test_convert_to_csv_workers_output_is_identical(tmp_path, aids):
+    single, sharded = tmp_path / 'single.csv', tmp_path / 'sharded.csv'
+    convert_to_csv(list(aids), single)
+    convert_to_csv(iter(aids), sharded, workers=2, chunk_size=25)
+    assert sharded.read_bytes() == single.read_bytes()
+
+
+def test_convert_json_to_csv_workers_output_is_identical(tmp_path, aids):
+    source = tmp_path / 'aides.json'
+    source.write_text(json.dumps({'count': len(aids), 'results': aids}, ensure_ascii=False), encoding='utf-8')
+    single, sharded = tmp_path / 'single.csv', tmp_path / 'sharded.csv'
+    convert_json_to_csv(str(source), str(single))
+    convert_json_to_csv(str(source), str(sharded), workers=2, chunk_size=25)
+    assert sharded.read_bytes() == single.read_bytes()